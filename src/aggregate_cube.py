@@ -0,0 +1,205 @@
+"""
+CSAPX Project 1: Movie
+
+In this project we worked with datasets from the IMDB website. We got
+experience reading in the data and using various structures and collections in Python to
+store, organize and efficiently query for different kinds of information relating to the movies
+and their ratings.
+
+***                                                                                                                 ***
+    This module contains the aggregate cube of the STATS query. For every title type, start year and genre (and for
+    every title type and start year over all genres) the cube keeps the number of movies, the number of rated movies,
+    the sum of their average ratings, their total votes and a histogram of the runtimes. It is built with one pass over
+    the movies and one over the ratings, kept up to date by adding and subtracting the movies that change, and the
+    statistics of a range of years are rolled up from the cells of its years without looking at a single movie.
+***                                                                                                                 ***
+
+author: Miguel Reyes
+date: 09/26/21
+"""
+import math
+from decimal import Decimal
+
+"""
+ALL_GENRES:
+    genre of a STATS query over every genre - its cells count every movie once, whatever its number of genres
+"""
+ALL_GENRES = "ALL"
+
+"""
+PERCENTILES:
+    runtime percentiles of a STATS line
+"""
+PERCENTILES = (25, 50, 75, 90)
+
+
+class Aggregate:
+    """
+    Statistics of a group of movies.
+
+    movies(int): number of movies
+    rated(int): number of rated movies
+    rating_total(Decimal): sum of the avg_rating of the rated movies - exact, so the statistics don't depend on the
+                           order movies were added and subtracted in
+    votes(int): total num_votes of the rated movies
+    runtimes(dict): runtime in minutes -> number of movies - movies without a runtime (0) are left out
+    """
+
+    def __init__(self):
+        self.movies = 0
+        self.rated = 0
+        self.rating_total = Decimal(0)
+        self.votes = 0
+        self.runtimes = dict()
+
+    def add(self, runtime: int, rating, sign: int = 1) -> None:
+        """
+        Function to add (or subtract when sign is -1) a movie.
+
+        :param runtime: runtime_minutes of the movie as an int
+        :param rating: Rating object of the movie or None if it has no rating
+        :param sign: 1 to add the movie, -1 to subtract it
+        :return: None
+        """
+        self.movies += sign
+        if runtime > 0:
+            count = self.runtimes.get(runtime, 0) + sign
+            if count == 0:
+                del self.runtimes[runtime]
+            else:
+                self.runtimes[runtime] = count
+        if rating is not None:
+            self.rated += sign
+            self.rating_total += sign * Decimal(rating.avg_rating)
+            self.votes += sign * rating.votes
+
+    def merge(self, other) -> None:
+        """
+        Function to add the movies of another Aggregate object.
+        """
+        self.movies += other.movies
+        self.rated += other.rated
+        self.rating_total += other.rating_total
+        self.votes += other.votes
+        for runtime, count in other.runtimes.items():
+            self.runtimes[runtime] = self.runtimes.get(runtime, 0) + count
+
+    def average_rating(self):
+        """
+        :return: average avg_rating of the rated movies as a Decimal or None if no movie is rated
+        """
+        if self.rated == 0:
+            return None
+        return self.rating_total / self.rated
+
+    def percentiles(self, percents=PERCENTILES) -> list:
+        """
+        :param percents: increasing percents of the movies - e.g. 50 for the median
+        :return: list of the smallest runtime of at least percent percent of the movies with a runtime (nearest rank)
+                 for every percent, with one pass over the sorted runtimes - None if no movie has a runtime
+        """
+        total = sum(self.runtimes.values())
+        found = list()
+        seen = 0
+        runtimes = iter(sorted(self.runtimes.items()))
+        for percent in percents:
+            rank = max(math.ceil(percent * total / 100), 1)
+            while seen < rank and total > 0:
+                runtime, count = next(runtimes)
+                seen += count
+            found.append(runtime if total > 0 else None)
+        return found
+
+
+def cell_genres(genres: str) -> tuple:
+    """
+    :param genres: comma separated genres of a movie
+    :return: genres of the cells of the movie - every genre once and None for the cell over all genres
+    """
+    return tuple(dict.fromkeys(genres.split(","))) + (None,)
+
+
+def cell_keys(movie) -> list:
+    """
+    :param movie: Movie object
+    :return: keys of the cells of the movie - one for every genre of the movie and one over all genres
+    """
+    year = int(movie.start_year)
+    return [(movie.title_type, year, genre) for genre in cell_genres(movie.genres)]
+
+
+def add_movie(cube: dict, movie, rating, sign: int = 1) -> None:
+    """
+    Function to add (or subtract when sign is -1) a movie to the cells of its keys. Cells without movies are deleted,
+    so a cube that had movies subtracted is the same as a cube built from the remaining movies.
+
+    :param cube: aggregate cube from build_cube
+    :param movie: Movie object or None (nothing is added)
+    :param rating: Rating object of the movie or None if it has no rating
+    :param sign: 1 to add the movie, -1 to subtract it
+    :return: None
+    """
+    if movie is None:
+        return
+    runtime = int(movie.runtime_minutes)
+    for key in cell_keys(movie):
+        cell = cube.get(key)
+        if cell is None:
+            cell = cube[key] = Aggregate()
+        cell.add(runtime, rating, sign)
+        if cell.movies == 0:
+            del cube[key]
+
+
+def build_cube(movies: dict, ratings: dict) -> dict:
+    """
+    Function to build the aggregate cube - one pass over the movies and one over the ratings.
+
+    :param movies: dictionary of Movie objects
+    :param ratings: dictionary of Rating objects
+    :return: dictionary of (title_type, start_year as an int, genre or None for all genres) -> Aggregate object
+    """
+    cube = dict()
+    genre_lists = dict()  # genres string -> cell genres, most movies share their genres with many others
+    for movie in movies.values():
+        genres = genre_lists.get(movie.genres)
+        if genres is None:
+            genres = genre_lists[movie.genres] = cell_genres(movie.genres)
+        year = int(movie.start_year)
+        runtime = int(movie.runtime_minutes)
+        for genre in genres:
+            key = (movie.title_type, year, genre)
+            cell = cube.get(key)
+            if cell is None:
+                cell = cube[key] = Aggregate()
+            cell.movies += 1
+            if runtime > 0:
+                cell.runtimes[runtime] = cell.runtimes.get(runtime, 0) + 1
+    for rating in ratings.values():
+        movie = rating.movie
+        average = Decimal(rating.avg_rating)
+        for genre in genre_lists[movie.genres]:
+            cell = cube[(movie.title_type, rating.year, genre)]
+            cell.rated += 1
+            cell.rating_total += average
+            cell.votes += rating.votes
+    return cube
+
+
+def genre_key(genre: str):
+    """
+    :param genre: genre of a STATS query
+    :return: genre of the cells of the query - None for ALL_GENRES
+    """
+    return None if genre == ALL_GENRES else genre
+
+
+def rollup(rows) -> Aggregate:
+    """
+    :param rows: iterable of (year, Aggregate object)
+    :return: Aggregate object of the movies of every row
+    """
+    total = Aggregate()
+    for year, cell in rows:
+        total.merge(cell)
+    return total
@@ -0,0 +1,161 @@
+"""
+CSAPX Project 1: Movie
+
+In this project we worked with datasets from the IMDB website. We got
+experience reading in the data and using various structures and collections in Python to
+store, organize and efficiently query for different kinds of information relating to the movies
+and their ratings.
+
+***                                                                                                                 ***
+    This module contains the batch query planner. Instead of running every query line on its own, the whole query
+    stream is read first and every query that has to scan the datasets (because its index was not built) is grouped
+    with the other scans of the same title type. All the movie scans are then answered by a single pass over the
+    movies and all the rating scans by a single pass over the ratings, and the results are printed in the original
+    query order with the same output as one query at a time.
+***                                                                                                                 ***
+
+author: Miguel Reyes
+date: 09/26/21
+"""
+import io
+import sys
+import numpy_backend
+import partitioned_scan
+import queries
+import result_cache
+from query_processor import describe, execute_query, parse_query, run_query
+from timeit import default_timer as timer
+
+
+def movie_predicate(query: tuple, movie_indexes):
+    """
+    :param query: tuple of the query values
+    :param movie_indexes: Indexes object
+    :return: function(Movie) -> bool that is True for the movies (of the query title type) the query keeps, or None
+             if the query does not scan the movies
+    """
+    query_type = query[0]
+    if movie_indexes.columns is not None and query_type in numpy_backend.QUERY_TYPES:  # answered by the numpy backend
+        return None
+    if partitioned_scan.answers(query, movie_indexes):  # scanned by the scan pool
+        return None
+    if query_type == "CONTAINS" and movie_indexes.contains is None:
+        words = query[2]
+        return lambda movie: words in movie.primary_title
+    if query_type == "YEAR_AND_GENRE" and movie_indexes.year_and_genre is None:
+        year, genre = query[2], query[3]
+        return lambda movie: year == movie.start_year and genre in movie.genres.split(",")
+    if query_type == "RUNTIME" and movie_indexes.runtime is None:
+        min_mins, max_mins = int(query[2]), int(query[3])
+        return lambda movie: min_mins <= int(movie.runtime_minutes) <= max_mins
+    return None
+
+
+def rating_predicate(query: tuple, movie_indexes):
+    """
+    :param query: tuple of the query values
+    :param movie_indexes: Indexes object
+    :return: function(Movie, Rating) -> bool that is True for the ratings (of the query title type) the query keeps,
+             or None if the query does not scan the ratings
+    """
+    query_type = query[0]
+    if movie_indexes.columns is not None and query_type in numpy_backend.QUERY_TYPES:  # answered by the numpy backend
+        return None
+    if query_type == "MOST_VOTES" and movie_indexes.most_votes is None:
+        return lambda movie, rating: True
+    if query_type == "TOP" and movie_indexes.top is None:
+        start_year, end_year = int(query[3]), int(query[4])
+        return lambda movie, rating: rating.votes >= 1000 and start_year <= rating.year <= end_year
+    return None
+
+
+def process_batch(lines: list, movies: dict, ratings: dict, movie_indexes,
+                  cache: result_cache.ResultCache = None) -> None:
+    """
+    Function to process every query line of a batch. The time of a shared pass is split evenly between the queries
+    of the pass and added to their own elapsed time. With a result cache, queries that are cached (or repeat an
+    earlier query of the batch) are not planned into a pass, they are answered from the cache.
+
+    :param lines: query lines
+    :param movies: dictionary of Movie objects
+    :param ratings: dictionary of Rating objects
+    :param movie_indexes: Indexes object
+    :param cache: ResultCache object - every query runs when None
+    :return: None
+    """
+    batch = [query for query in map(parse_query, lines) if query is not None]
+    if cache is not None:
+        cache.validate(movies, ratings)
+        planned = set()  # normalized queries that are cached or already planned
+    matches = [None] * len(batch)  # position -> dictionary of the movies or ratings its query keeps
+    shared_time = [0.0] * len(batch)  # position -> share of the time of the pass its query was answered by
+
+    movie_scans = dict()  # title_type -> list of (position, predicate)
+    rating_scans = dict()
+    for position, query in enumerate(batch):
+        if cache is not None:
+            key = result_cache.normalize(query)
+            if key in cache or key in planned:
+                continue
+            planned.add(key)
+        predicate = movie_predicate(query, movie_indexes)
+        if predicate is not None:
+            movie_scans.setdefault(query[1], list()).append((position, predicate))
+            continue
+        predicate = rating_predicate(query, movie_indexes)
+        if predicate is not None:
+            rating_scans.setdefault(query[1], list()).append((position, predicate))
+
+    if len(movie_scans) > 0:
+        start = timer()
+        for group in movie_scans.values():
+            for position, predicate in group:
+                matches[position] = dict()
+        for movie in queries.scan_movies(movies, movie_scans):  # one pass over the movies for every movie scan
+            group = movie_scans.get(movie.title_type)
+            if group is None:
+                continue
+            for position, predicate in group:
+                if predicate(movie):
+                    matches[position][movie.tconst] = movie
+        share = (timer() - start) / sum(len(group) for group in movie_scans.values())
+        for group in movie_scans.values():
+            for position, predicate in group:
+                shared_time[position] = share
+
+    if len(rating_scans) > 0:
+        start = timer()
+        for group in rating_scans.values():
+            for position, predicate in group:
+                matches[position] = dict()
+        for tconst, rating in ratings.items():  # one pass over the ratings for every rating scan
+            movie = rating.movie
+            group = rating_scans.get(movie.title_type)
+            if group is None:
+                continue
+            for position, predicate in group:
+                if predicate(movie, rating):
+                    matches[position][tconst] = rating
+        share = (timer() - start) / sum(len(group) for group in rating_scans.values())
+        for group in rating_scans.values():
+            for position, predicate in group:
+                shared_time[position] = share
+
+    for position, query in enumerate(batch):
+        print(describe(query))
+        start = timer()
+        if matches[position] is None:  # answered by its index (or a LOOKUP) or the cache
+            execute_query(query, movies, ratings, movie_indexes, cache)
+        else:
+            out = io.StringIO() if cache is not None else None
+            if query[0] in ("MOST_VOTES", "TOP"):  # only sorts the ratings it keeps
+                run_query(query, movies, matches[position], movie_indexes, out)
+            else:  # only filters and sorts the movies it keeps
+                run_query(query, matches[position], ratings, movie_indexes, out)
+            if out is not None:
+                cache.misses += 1
+                cache.put(result_cache.normalize(query), out.getvalue())
+                sys.stdout.write(out.getvalue())
+        elapsed = timer() - start + shared_time[position]
+        print("elapsed time (s):", elapsed, "\n")
+        sys.stdout.flush()
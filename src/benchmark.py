@@ -0,0 +1,233 @@
+"""
+CSAPX Project 1: Movie
+
+In this project we worked with datasets from the IMDB website. We got
+experience reading in the data and using various structures and collections in Python to
+store, organize and efficiently query for different kinds of information relating to the movies
+and their ratings.
+
+***                                                                                                                 ***
+    This module is the benchmark suite - it times loading the datasets and every query of the input/*.txt files,
+    reports the p50/p99 latency of every query type and the peak resident memory, and checks the query output
+    against the reference output in output/small (small datasets) or output/large (title datasets) so a performance
+    change can't silently change the results. Synthetic datasets of any size come from generate_dataset.py.
+
+    e.g. python src/benchmark.py small
+         python src/benchmark.py --rows 1000000 --columnar
+***                                                                                                                 ***
+
+author: Miguel Reyes
+date: 09/26/21
+"""
+import argparse
+import glob
+import io
+import json
+import os
+import sys
+import columnar
+import generate_dataset
+import indexes
+import movies_and_ratings
+import query_processor
+from timeit import default_timer as timer
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+
+def percentile(latencies: list, percent: float) -> float:
+    """
+    :param latencies: list of latencies
+    :param percent: percentile wanted - e.g. 50 or 99
+    :return: the nearest rank percentile of the latencies
+    """
+    ordered = sorted(latencies)
+    rank = max(1, -(-len(ordered) * percent // 100))  # ceiling of len * percent / 100
+    return ordered[int(rank) - 1]
+
+
+def peak_rss_mib() -> float:
+    """
+    :return: peak resident memory of this process in MiB (0 when it can't be measured)
+    """
+    if resource is None:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":  # bytes on macOS, KiB on Linux
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+
+def read_reference(path: str) -> dict:
+    """
+    Function to read a reference output file into the output of every query it processed.
+
+    :param path: path of the reference output file
+    :return: dictionary of "processing:" line -> list of output lines
+    """
+    reference = dict()
+    output = None
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.rstrip("\n")
+            if line.startswith("processing:"):
+                output = reference[line] = list()
+            elif line.startswith("elapsed time (s):"):
+                output = None
+            elif output is not None:
+                output.append(line)
+    return reference
+
+
+def reference_path(dataset: str, input_name: str) -> str:
+    """
+    :param dataset: "small", "title" or the name of a generated dataset
+    :param input_name: name of the input file - e.g. "top"
+    :return: path of the reference output of the input file or None if there is none
+    """
+    if dataset == "small":
+        path = "output/small/" + input_name + "-small-out.txt"
+    elif dataset == "title":
+        path = "output/large/" + input_name + "-out.txt"
+    else:
+        return None
+    return path if os.path.exists(path) else None
+
+
+def load(dataset: str, use_columnar: bool, build: bool) -> tuple:
+    """
+    Function to load the datasets, timing every step.
+
+    :param dataset: "small", "title" or the name of a generated dataset
+    :param use_columnar: store the datasets in the columnar store
+    :param build: build the secondary indexes
+    :return: tuple(movies, ratings, Indexes object, dictionary of step -> seconds)
+    """
+    timings = dict()
+    start = timer()
+    if use_columnar:
+        movies = columnar.read_columnar_movie_dataset(dataset + ".basics")
+    else:
+        movies = movies_and_ratings.read_movie_dataset(dataset + ".basics")
+    timings["load movies"] = timer() - start
+    start = timer()
+    if use_columnar:
+        ratings = columnar.read_columnar_rating_dataset(dataset + ".ratings", movies)
+    else:
+        ratings = movies_and_ratings.read_rating_dataset(dataset + ".ratings", movies)
+    timings["load ratings"] = timer() - start
+    start = timer()
+    movie_indexes = indexes.build_indexes(movies, ratings) if build else indexes.Indexes()
+    timings["build indexes"] = timer() - start
+    return movies, ratings, movie_indexes, timings
+
+
+def run_benchmark(dataset: str, repeat: int, use_columnar: bool, build: bool) -> dict:
+    """
+    Function to benchmark the datasets with every query of the input/*.txt files.
+
+    :param dataset: "small", "title" or the name of a generated dataset
+    :param repeat: number of times every query runs
+    :param use_columnar: store the datasets in the columnar store
+    :param build: build the secondary indexes
+    :return: dictionary of the results
+    """
+    movies, ratings, movie_indexes, timings = load(dataset, use_columnar, build)
+    latencies = dict()  # query type -> list of seconds
+    checked = 0
+    mismatches = list()
+    for input_path in sorted(glob.glob("input/*.txt")):
+        input_name = os.path.basename(input_path)[:-len(".txt")]
+        path = reference_path(dataset, input_name)
+        reference = read_reference(path) if path is not None else None
+        with open(input_path, encoding="utf-8") as f:
+            batch = [query for query in map(query_processor.parse_query, f) if query is not None]
+        for query in batch:
+            for i in range(repeat):
+                out = io.StringIO()
+                start = timer()
+                query_processor.run_query(query, movies, ratings, movie_indexes, out)
+                latencies.setdefault(query[0], list()).append(timer() - start)
+            if reference is not None and query_processor.describe(query) in reference:
+                checked += 1
+                if out.getvalue().splitlines() != reference[query_processor.describe(query)]:
+                    mismatches.append(input_name + ": " + query_processor.describe(query))
+
+    return {
+        "dataset": dataset,
+        "movies": len(movies),
+        "ratings": len(ratings),
+        "load": timings,
+        "queries": {query_type: {"count": len(values), "p50": percentile(values, 50), "p99": percentile(values, 99)}
+                    for query_type, values in latencies.items()},
+        "peak_rss_mib": peak_rss_mib(),
+        "checked": checked,
+        "mismatches": mismatches,
+    }
+
+
+def report(results: dict) -> None:
+    """
+    Function to print the results of a benchmark.
+
+    :param results: dictionary of the results - returned from the run_benchmark function
+    :return: None
+    """
+    print("dataset: " + results["dataset"] + " (" + str(results["movies"]) + " movies, " +
+          str(results["ratings"]) + " ratings)")
+    for step, seconds in results["load"].items():
+        print("\t%-16s %10.3f s" % (step + ":", seconds))
+    for query_type, latency in sorted(results["queries"].items()):
+        print("\t%-16s %6d runs  p50 %10.3f ms  p99 %10.3f ms" % (query_type + ":", latency["count"],
+                                                                  latency["p50"] * 1000, latency["p99"] * 1000))
+    print("\tpeak RSS:        %10.1f MiB" % results["peak_rss_mib"])
+    if results["checked"] == 0:
+        print("\treference check: no reference output for this dataset")
+    elif len(results["mismatches"]) == 0:
+        print("\treference check: " + str(results["checked"]) + " queries match")
+    else:
+        print("\treference check: " + str(len(results["mismatches"])) + " of " + str(results["checked"]) +
+              " queries DIFFER")
+        for mismatch in results["mismatches"]:
+            print("\t\t" + mismatch)
+
+
+def main():
+    """
+    Main function - runs the benchmark and exits with status 1 when some query output differs from its reference.
+
+    :return: None
+    """
+    parser = argparse.ArgumentParser(description="Benchmark loading and querying the movies and ratings datasets.")
+    parser.add_argument("dataset", nargs="?", default="small",
+                        help="\"small\", \"title\" or the name of datasets in data/ (default small)")
+    parser.add_argument("--rows", type=int,
+                        help="benchmark generated datasets of this many titles (generated when missing)")
+    parser.add_argument("--repeat", type=int, default=5, help="number of times every query runs (default 5)")
+    parser.add_argument("--columnar", action="store_true", help="store the datasets in the columnar store")
+    parser.add_argument("--no-indexes", dest="indexes", action="store_false", help="do not build the indexes")
+    parser.add_argument("--json", metavar="PATH", help="also write the results as JSON to PATH")
+    arguments = parser.parse_args()
+
+    dataset = arguments.dataset
+    if arguments.rows is not None:
+        dataset = "bench" + str(arguments.rows)
+        if not os.path.exists(movies_and_ratings.dataset_path(dataset + ".basics")):
+            print("generating data/" + dataset + ".basics.tsv and data/" + dataset + ".ratings.tsv...")
+            generate_dataset.generate(arguments.rows, "data/" + dataset + ".basics.tsv",
+                                      "data/" + dataset + ".ratings.tsv")
+
+    results = run_benchmark(dataset, arguments.repeat, arguments.columnar, arguments.indexes)
+    report(results)
+    if arguments.json is not None:
+        with open(arguments.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if len(results["mismatches"]) > 0:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+CSAPX Project 1: Movie
+
+In this project we worked with datasets from the IMDB website. We got
+experience reading in the data and using various structures and collections in Python to
+store, organize and efficiently query for different kinds of information relating to the movies
+and their ratings.
+
+***                                                                                                                 ***
+    This module is the thin client of the query server - it sends the query lines of standard input to the server
+    and prints the answers, the same way movies_main.py reads queries from standard input.
+
+    e.g. python src/client.py 127.0.0.1:8765 < input/top.txt
+***                                                                                                                 ***
+
+author: Miguel Reyes
+date: 09/26/21
+"""
+import socket
+import sys
+import threading
+from server import parse_address
+
+
+def connect(address: str) -> socket.socket:
+    """
+    :param address: "HOST:PORT" or "unix:PATH"
+    :return: socket connected to the server
+    """
+    kind, *location = parse_address(address)
+    if kind == "unix":
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.connect(location[0])
+        return connection
+    return socket.create_connection((location[0], location[1]))
+
+
+def send_queries(connection: socket.socket, queries) -> None:
+    """
+    Function to send every query line and then close the sending side of the connection so the server knows there
+    are no more queries.
+
+    :param connection: socket connected to the server
+    :param queries: binary file of query lines
+    :return: None
+    """
+    for line in queries:
+        connection.sendall(line)
+    connection.shutdown(socket.SHUT_WR)
+
+
+def main():
+    """
+    Main function - the address of the server is the only command line argument.
+
+    :return: None
+    """
+    if len(sys.argv) != 2:
+        print("usage: python client.py HOST:PORT|unix:PATH < queries", file=sys.stderr)
+        sys.exit(2)
+    with connect(sys.argv[1]) as connection:
+        sender = threading.Thread(target=send_queries, args=(connection, sys.stdin.buffer), daemon=True)
+        sender.start()  # answers are read while queries are still being sent so neither side blocks the other
+        while True:
+            answer = connection.recv(1 << 16)
+            if not answer:
+                break
+            sys.stdout.buffer.write(answer)
+        sender.join()
+    sys.stdout.flush()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,470 @@
+"""
+CSAPX Project 1: Movie
+
+In this project we worked with datasets from the IMDB website. We got
+experience reading in the data and using various structures and collections in Python to
+store, organize and efficiently query for different kinds of information relating to the movies
+and their ratings.
+
+***                                                                                                                 ***
+    This module contains the columnar store - an alternative to the dictionaries of Movie and Rating objects where
+    every field variable is kept in its own array and every movie is addressed by a row id. Repeated title types and
+    genres are dictionary encoded and numeric fields are stored as integers/floats, the store hands back Movie and
+    Rating objects (views) on demand so the functions in queries.py work unchanged. The tconsts are kept as integer
+    keys (the number after "tt") - in row order and as a sorted array of keys with their row ids, which also
+    resolves a whole list of tconsts with one sorted merge pass (see ColumnStore.find_rows).
+***                                                                                                                 ***
+
+author: Miguel Reyes
+date: 09/26/21
+"""
+import heapq
+from array import array
+from bisect import bisect_left
+from collections.abc import Mapping
+from movies_and_ratings import Movie, RatedMovie, open_dataset, parse_movie_line, parse_rating_line
+
+"""
+NO_KEY:
+    key of a tconst that does not have the "tt" + zero padded number form of the datasets - such tconsts are kept as
+    strings
+"""
+NO_KEY = 0xFFFFFFFF
+
+"""
+MERGE_SIZE:
+    minimum number of keys added out of order that are kept in a dictionary before they are merged into the sorted
+    keys (the dictionary may grow to the number of sorted keys, so a shuffled dataset is merged O(log n) times)
+"""
+MERGE_SIZE = 1024
+
+
+def tconst_key(tconst: str) -> int:
+    """
+    :param tconst: unique identifier - e.g. "tt0033467"
+    :return: the number of the tconst - e.g. 33467, or NO_KEY if the tconst would not be formatted back the same
+    """
+    try:
+        key = int(tconst[2:])
+    except ValueError:
+        return NO_KEY
+    if 0 <= key < NO_KEY and "tt%07d" % key == tconst:
+        return key
+    return NO_KEY
+
+
+class TconstKeys:
+    """
+    The tconst of each row (a sequence like a list of tconsts) kept as integer keys.
+
+    keys(array): key of each rows tconst - NO_KEY if the tconst has no key
+    irregular(dict): row id -> tconst of the rows whose tconst has no key
+    """
+
+    def __init__(self, tconsts=()):
+        self.keys = array("I")
+        self.irregular = dict()
+        for tconst in tconsts:
+            self.append(tconst)
+
+    def append(self, tconst: str) -> None:
+        key = tconst_key(tconst)
+        if key == NO_KEY:
+            self.irregular[len(self.keys)] = tconst
+        self.keys.append(key)
+
+    def __getitem__(self, row: int) -> str:
+        key = self.keys[row]
+        if key == NO_KEY:
+            return self.irregular[row % len(self.keys)]
+        return "tt%07d" % key
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def __iter__(self):
+        return map(self.__getitem__, range(len(self.keys)))
+
+
+class TconstRows(Mapping):
+    """
+    A dictionary of tconst -> row id kept as a sorted array of tconst keys and a parallel array of row ids. The
+    datasets are sorted by tconst so keys are nearly always added in order, the ones that are not wait in a small
+    dictionary until they are merged into the arrays.
+
+    keys(array): sorted tconst keys
+    rows(array): row id of each key
+    pending(dict): key -> row id of the keys added out of order and not merged yet
+    irregular(dict): tconst -> row id of the tconsts that have no key
+    """
+
+    def __init__(self, tconsts=()):
+        self.keys = array("I")
+        self.rows = array("I")
+        self.pending = dict()
+        self.irregular = dict()
+        for row, tconst in enumerate(tconsts):
+            self.add(tconst, row)
+
+    def add(self, tconst: str, row: int) -> None:
+        """
+        Function to add a tconst that is not in the dictionary yet.
+
+        :param tconst: unique identifier
+        :param row: row id of the tconst
+        :return: None
+        """
+        key = tconst_key(tconst)
+        if key == NO_KEY:
+            self.irregular[tconst] = row
+        elif len(self.keys) == 0 or key > self.keys[-1]:
+            self.keys.append(key)
+            self.rows.append(row)
+        else:
+            self.pending[key] = row
+            if len(self.pending) > max(MERGE_SIZE, len(self.keys)):
+                self.merge()
+
+    def merge(self) -> None:
+        """
+        Function to merge the pending keys into the sorted arrays.
+        """
+        keys = array("I")
+        rows = array("I")
+        for key, row in heapq.merge(zip(self.keys, self.rows), sorted(self.pending.items())):
+            keys.append(key)
+            rows.append(row)
+        self.keys = keys
+        self.rows = rows
+        self.pending = dict()
+
+    def find(self, key: int, start: int = 0):
+        """
+        :param key: tconst key
+        :param start: position in the sorted keys the key can't be before
+        :return: tuple(row id of the key or None, position of the key in the sorted keys)
+        """
+        position = bisect_left(self.keys, key, start)
+        if position < len(self.keys) and self.keys[position] == key:
+            return self.rows[position], position
+        return self.pending.get(key), position
+
+    def get(self, tconst: str, default=None):
+        key = tconst_key(tconst)
+        if key == NO_KEY:
+            return self.irregular.get(tconst, default)
+        row = self.find(key)[0]
+        return default if row is None else row
+
+    def __getitem__(self, tconst: str) -> int:
+        row = self.get(tconst)
+        if row is None:
+            raise KeyError(tconst)
+        return row
+
+    def __contains__(self, tconst) -> bool:
+        return self.get(tconst) is not None
+
+    def __iter__(self):
+        yield from ("tt%07d" % key for key in self.keys)
+        yield from ("tt%07d" % key for key in self.pending)
+        yield from self.irregular
+
+    def __len__(self) -> int:
+        return len(self.keys) + len(self.pending) + len(self.irregular)
+
+    def find_all(self, tconsts: list) -> list:
+        """
+        Function to resolve a list of tconsts with one sorted merge pass - the keys of the tconsts are sorted and every
+        key is searched for from the position of the key before it.
+
+        :param tconsts: list of tconsts
+        :return: list of the row id (or None) of every tconst, in the order of tconsts
+        """
+        found = [None] * len(tconsts)
+        wanted = list()
+        for i, tconst in enumerate(tconsts):
+            key = tconst_key(tconst)
+            if key == NO_KEY:
+                found[i] = self.irregular.get(tconst)
+            else:
+                wanted.append((key, i))
+        wanted.sort()
+        position = 0
+        for key, i in wanted:
+            found[i], position = self.find(key, position)
+        return found
+
+
+class ColumnStore:
+    """
+    Column arrays for every Movie and Rating field variable, row i of every column belongs to the same movie.
+
+    tconsts(TconstKeys): tconst of each row
+    rows(TconstRows): tconst -> row id
+    title_type_codes(array): code of each rows title_type - index into title_types
+    primary_titles(list): primary_title of each row
+    start_years(array): start_year of each row as an int
+    runtime_minutes(array): runtime_minutes of each row as an int
+    genre_codes(array): code of each rows genres - index into genres
+    avg_ratings(array): avg_rating of each row as a float (0.0 if the row has no rating)
+    num_votes(array): num_votes of each row as an int (0 if the row has no rating)
+    rated(bytearray): 1 if the row has a rating otherwise 0
+    rating_rows(array): row ids of the rated rows in the order they appear in the ratings dataset
+    """
+
+    def __init__(self):
+        self.tconsts = TconstKeys()
+        self.rows = TconstRows()
+        self.title_type_codes = array("B")
+        self.title_types = list()
+        self._title_type_lookup = dict()
+        self.primary_titles = list()
+        self.start_years = array("H")
+        self.runtime_minutes = array("I")
+        self.genre_codes = array("H")
+        self.genres = list()
+        self._genres_lookup = dict()
+        self.avg_ratings = array("d")
+        self.num_votes = array("I")
+        self.rated = bytearray()
+        self.rating_rows = array("I")
+
+    def __len__(self) -> int:
+        return len(self.tconsts)
+
+    @staticmethod
+    def _encode(value: str, values: list, lookup: dict) -> int:
+        """
+        Dictionary encodes value - every distinct value is stored once in values and rows only keep its code.
+
+        :param value: value to encode
+        :param values: list of distinct values - code -> value
+        :param lookup: dictionary of distinct values - value -> code
+        :return: code of value
+        """
+        code = lookup.get(value)
+        if code is None:
+            code = len(values)
+            values.append(value)
+            lookup[value] = code
+        return code
+
+    def add_movie(self, tconst: str, title_type: str, primary_title: str, start_year: str, runtime_minutes: str,
+                  genres: str) -> int:
+        """
+        Function to store a movie in the columns. Like a dictionary, a tconst that is already stored keeps its row and
+        has its field variables replaced.
+
+        :return: row id of the movie
+        """
+        title_type_code = self._encode(title_type, self.title_types, self._title_type_lookup)
+        genre_code = self._encode(genres, self.genres, self._genres_lookup)
+        row = self.rows.get(tconst)
+        if row is None:
+            row = len(self.tconsts)
+            self.rows.add(tconst, row)
+            self.tconsts.append(tconst)
+            self.title_type_codes.append(title_type_code)
+            self.primary_titles.append(primary_title)
+            self.start_years.append(int(start_year))
+            self.runtime_minutes.append(int(runtime_minutes))
+            self.genre_codes.append(genre_code)
+            self.avg_ratings.append(0.0)
+            self.num_votes.append(0)
+            self.rated.append(0)
+        else:
+            self.title_type_codes[row] = title_type_code
+            self.primary_titles[row] = primary_title
+            self.start_years[row] = int(start_year)
+            self.runtime_minutes[row] = int(runtime_minutes)
+            self.genre_codes[row] = genre_code
+        return row
+
+    def add_rating(self, row: int, avg_rating: str, num_votes: str):
+        """
+        Function to store the rating of the movie at row.
+
+        :param row: row id of the rated movie
+        :param avg_rating: Movie average rating
+        :param num_votes: Movie number of votes
+        :return: None
+        """
+        if not self.rated[row]:
+            self.rated[row] = 1
+            self.rating_rows.append(row)
+        self.avg_ratings[row] = float(avg_rating)
+        self.num_votes[row] = int(num_votes)
+
+    def remove_ratings(self, rows: set) -> None:
+        """
+        Function to delete the ratings of the movies at rows - the other ratings keep their order.
+
+        :param rows: set of row ids of rated movies
+        :return: None
+        """
+        for row in rows:
+            self.rated[row] = 0
+            self.avg_ratings[row] = 0.0
+            self.num_votes[row] = 0
+        self.rating_rows = array("I", (row for row in self.rating_rows if row not in rows))
+
+    def select_rows(self, kept: list) -> None:
+        """
+        Function to keep only the movies (and their ratings) at the rows of kept, in the order of kept - deletes and
+        reorders movies in a single pass over the columns. The movies get new row ids, the ratings keep their order.
+
+        :param kept: list of row ids
+        :return: None
+        """
+        new_rows = array("i", [-1]) * len(self.tconsts)
+        for new_row, row in enumerate(kept):
+            new_rows[row] = new_row
+        self.tconsts = TconstKeys([self.tconsts[row] for row in kept])
+        self.rows = TconstRows(self.tconsts)
+        self.title_type_codes = array("B", (self.title_type_codes[row] for row in kept))
+        self.primary_titles = [self.primary_titles[row] for row in kept]
+        self.start_years = array("H", (self.start_years[row] for row in kept))
+        self.runtime_minutes = array("I", (self.runtime_minutes[row] for row in kept))
+        self.genre_codes = array("H", (self.genre_codes[row] for row in kept))
+        self.avg_ratings = array("d", (self.avg_ratings[row] for row in kept))
+        self.num_votes = array("I", (self.num_votes[row] for row in kept))
+        self.rated = bytearray(self.rated[row] for row in kept)
+        self.rating_rows = array("I", (new_rows[row] for row in self.rating_rows if new_rows[row] >= 0))
+
+    def find_rows(self, tconsts: list) -> list:
+        """
+        :param tconsts: list of tconsts
+        :return: list of the row id (or None) of every tconst, in the order of tconsts - resolved with one sorted merge
+                 pass over the tconst keys
+        """
+        if isinstance(self.rows, TconstRows):
+            return self.rows.find_all(tconsts)
+        return [self.rows.get(tconst) for tconst in tconsts]  # e.g. the rows of a shared dataset file
+
+    def title_type(self, row: int) -> str:
+        return self.title_types[self.title_type_codes[row]]
+
+    def movie(self, row: int) -> Movie:
+        """
+        :param row: row id
+        :return: Movie object (view) of the row
+        """
+        return Movie(self.tconsts[row], self.title_types[self.title_type_codes[row]], self.primary_titles[row],
+                     str(self.start_years[row]), str(self.runtime_minutes[row]),
+                     self.genres[self.genre_codes[row]])
+
+    def rating(self, row: int) -> RatedMovie:
+        """
+        :param row: row id of a rated movie
+        :return: RatedMovie object (view) of the row
+        """
+        avg_rating = self.avg_ratings[row]
+        num_votes = self.num_votes[row]
+        return RatedMovie(self.tconsts[row], str(avg_rating), str(num_votes), self.movie(row), avg_rating, num_votes,
+                          self.start_years[row])
+
+
+class ColumnarMovies(Mapping):
+    """A read only dictionary of tconst -> Movie object backed by a ColumnStore."""
+
+    def __init__(self, store: ColumnStore):
+        self.store = store
+
+    def __getitem__(self, tconst: str) -> Movie:
+        return self.store.movie(self.store.rows[tconst])
+
+    def __contains__(self, tconst) -> bool:
+        return tconst in self.store.rows
+
+    def __iter__(self):
+        return iter(self.store.tconsts)
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+    def values(self):
+        return map(self.store.movie, range(len(self.store)))
+
+    def values_of_types(self, title_types, start: int = 0, end: int = None):
+        """
+        :param title_types: collection of title types
+        :param start: first row scanned
+        :param end: row after the last row scanned - the last row of the store when None
+        :return: generator of the Movie objects of the title types, in dataset order - the title type codes of the rows
+                 are compared, so the Movie objects of the other rows are never built
+        """
+        store = self.store
+        codes = {code for code, title_type in enumerate(store.title_types) if title_type in title_types}
+        title_type_codes = store.title_type_codes
+        for row in range(start, len(store) if end is None else end):
+            if title_type_codes[row] in codes:
+                yield store.movie(row)
+
+
+class ColumnarRatings(Mapping):
+    """A read only dictionary of tconst -> RatedMovie object backed by a ColumnStore, in ratings dataset order."""
+
+    def __init__(self, store: ColumnStore):
+        self.store = store
+
+    def __getitem__(self, tconst: str) -> RatedMovie:
+        row = self.store.rows[tconst]
+        if not self.store.rated[row]:
+            raise KeyError(tconst)
+        return self.store.rating(row)
+
+    def __contains__(self, tconst) -> bool:
+        row = self.store.rows.get(tconst)
+        return row is not None and self.store.rated[row] == 1
+
+    def __iter__(self):
+        tconsts = self.store.tconsts
+        return (tconsts[row] for row in self.store.rating_rows)
+
+    def __len__(self) -> int:
+        return len(self.store.rating_rows)
+
+    def values(self):
+        return map(self.store.rating, self.store.rating_rows)
+
+
+def read_columnar_movie_dataset(filename: str) -> ColumnarMovies:
+    """
+    Function to read in file and store its content into the columns of a ColumnStore - same rules as
+    movies_and_ratings.read_movie_dataset.
+
+    :param filename: The file name we're reading in
+    :return: dictionary(view) whose values are Movie objects
+    """
+    store = ColumnStore()
+    with open_dataset(filename) as f:
+        next(f)  # skips header line
+        for line in f:
+            data_fields = parse_movie_line(line)
+            if data_fields is None:
+                continue
+            store.add_movie(*data_fields)
+
+    return ColumnarMovies(store)
+
+
+def read_columnar_rating_dataset(filename: str, movies: ColumnarMovies) -> ColumnarRatings:
+    """
+    Function to read in a file and store its content into the rating columns of the movies ColumnStore - same rules as
+    movies_and_ratings.read_rating_dataset.
+
+    :param filename: The file name we're reading in
+    :param movies: dictionary(view) of Movie objects - returned from the read_columnar_movie_dataset function
+    :return: dictionary(view) whose values are Rating objects
+    """
+    store = movies.store
+    with open_dataset(filename) as f:
+        next(f)  # skips header line
+        for line in f:
+            data_fields = parse_rating_line(line)
+            row = store.rows.get(data_fields[0])
+            if row is not None:  # We only want to store ratings of movies we have
+                store.add_rating(row, data_fields[1], data_fields[2])
+
+    return ColumnarRatings(store)
@@ -0,0 +1,145 @@
+"""
+CSAPX Project 1: Movie
+
+In this project we worked with datasets from the IMDB website. We got
+experience reading in the data and using various structures and collections in Python to
+store, organize and efficiently query for different kinds of information relating to the movies
+and their ratings.
+
+***                                                                                                                 ***
+    This module generates synthetic datasets shaped like the IMDB title.basics and title.ratings datasets - same
+    columns, a similar mix of title types, start years, runtimes, genres, ratings and a long tail of votes. The same
+    number of rows and seed always generate the same files, so benchmarks are repeatable.
+
+    e.g. python src/generate_dataset.py 1000000   (writes data/bench1000000.basics.tsv and .ratings.tsv)
+***                                                                                                                 ***
+
+author: Miguel Reyes
+date: 09/26/21
+"""
+import argparse
+import random
+
+"""
+TITLE_TYPES:
+    title type -> (share of the titles, minimum runtime, typical runtime, maximum runtime)
+"""
+TITLE_TYPES = {
+    "tvEpisode": (0.68, 5, 30, 120),
+    "short": (0.10, 1, 10, 45),
+    "movie": (0.07, 40, 95, 300),
+    "video": (0.030, 10, 70, 200),
+    "tvSeries": (0.027, 10, 45, 120),
+    "tvMovie": (0.017, 40, 85, 200),
+    "tvMiniSeries": (0.005, 30, 300, 900),
+    "tvSpecial": (0.004, 20, 60, 180),
+    "videoGame": (0.004, 1, 10, 60),
+    "tvShort": (0.003, 1, 8, 30),
+}
+
+"""
+GENRES:
+    genre -> relative weight
+"""
+GENRES = {
+    "Drama": 30, "Comedy": 24, "Documentary": 14, "Talk-Show": 8, "Romance": 7, "Family": 7, "Action": 7,
+    "Animation": 7, "Crime": 6, "Adventure": 6, "Reality-TV": 6, "Music": 5, "Thriller": 4, "Mystery": 4,
+    "Fantasy": 4, "History": 3, "Horror": 3, "Game-Show": 3, "Biography": 2, "Sci-Fi": 2, "Sport": 2, "News": 2,
+    "Short": 2, "Musical": 1, "War": 1, "Western": 1, "Film-Noir": 0.2, "Adult": 0.5,
+}
+
+WORDS = ("The", "A", "of", "and", "Love", "Night", "Day", "Man", "Woman", "Big", "Little", "Last", "First", "Dark",
+         "City", "Story", "Life", "World", "House", "Girl", "Boy", "King", "Queen", "War", "Star", "Dream", "Return",
+         "Blue", "Red", "Road", "Home", "Heart", "Time", "Secret", "Game", "Avengers", "Lebowski", "Philadelphia",
+         "Starman", "Episode", "Part", "Christmas", "Summer", "Winter", "Shadow", "Fire", "Water", "Death", "Ghost")
+
+
+def weighted_choice(rng: random.Random, choices: list, cumulative_weights: list):
+    return rng.choices(choices, cum_weights=cumulative_weights)[0]
+
+
+def generate_title(rng: random.Random) -> str:
+    """
+    :param rng: random number generator
+    :return: primary title of 1 to 5 words
+    """
+    return " ".join(rng.choice(WORDS) for _ in range(rng.choice((1, 2, 2, 3, 3, 3, 4, 5))))
+
+
+def generate(rows: int, basics_path: str, ratings_path: str, seed: int = 2021) -> None:
+    """
+    Function to write a basics dataset of rows titles and a ratings dataset for about a quarter of them (IMDB rates
+    far fewer titles than it lists).
+
+    :param rows: number of titles
+    :param basics_path: path of the basics dataset to write
+    :param ratings_path: path of the ratings dataset to write
+    :param seed: seed of the random number generator
+    :return: None
+    """
+    rng = random.Random(seed)
+    title_types = list(TITLE_TYPES)
+    title_type_weights = list()
+    total = 0.0
+    for title_type in title_types:
+        total += TITLE_TYPES[title_type][0]
+        title_type_weights.append(total)
+    genres = list(GENRES)
+    genre_weights = list()
+    total = 0.0
+    for genre in genres:
+        total += GENRES[genre]
+        genre_weights.append(total)
+
+    with open(basics_path, "w", encoding="utf-8") as basics, open(ratings_path, "w", encoding="utf-8") as ratings:
+        basics.write("tconst\ttitleType\tprimaryTitle\toriginalTitle\tisAdult\tstartYear\tendYear\truntimeMinutes\t"
+                     "genres\n")
+        ratings.write("tconst\taverageRating\tnumVotes\n")
+        for i in range(1, rows + 1):
+            tconst = "tt%07d" % i
+            title_type = weighted_choice(rng, title_types, title_type_weights)
+            primary_title = generate_title(rng)
+            is_adult = "1" if rng.random() < 0.02 else "0"
+            if rng.random() < 0.03:
+                start_year = "\\N"
+            else:
+                start_year = str(min(2021, int(2021 - rng.expovariate(1 / 18))))  # most titles are recent
+            end_year = str(int(start_year) + rng.randint(0, 10)) if title_type == "tvSeries" and \
+                start_year != "\\N" else "\\N"
+            _, minimum, typical, maximum = TITLE_TYPES[title_type]
+            if rng.random() < 0.3:
+                runtime_minutes = "\\N"
+            else:
+                runtime_minutes = str(min(maximum, max(minimum, int(rng.lognormvariate(0, 0.4) * typical))))
+            if rng.random() < 0.05:
+                genre_list = "\\N"
+            else:
+                genre_list = ",".join(sorted({weighted_choice(rng, genres, genre_weights)
+                                              for _ in range(rng.choice((1, 1, 2, 3)))}))
+            basics.write("\t".join((tconst, title_type, primary_title, primary_title, is_adult, start_year, end_year,
+                                    runtime_minutes, genre_list)) + "\n")
+
+            if rng.random() < 0.25:
+                num_votes = int(5 * rng.paretovariate(0.9))
+                avg_rating = min(10.0, max(1.0, rng.gauss(6.6, 1.3)))
+                ratings.write(tconst + "\t" + "%.1f" % avg_rating + "\t" + str(num_votes) + "\n")
+
+
+def main():
+    """
+    Main function - generates data/{name}.basics.tsv and data/{name}.ratings.tsv.
+
+    :return: None
+    """
+    parser = argparse.ArgumentParser(description="Generate synthetic IMDB shaped basics and ratings datasets.")
+    parser.add_argument("rows", type=int, help="number of titles - e.g. 100000, 1000000 or 10000000")
+    parser.add_argument("--name", help="file name of the datasets (default bench{rows})")
+    parser.add_argument("--seed", type=int, default=2021, help="seed of the random number generator")
+    arguments = parser.parse_args()
+    name = arguments.name or "bench" + str(arguments.rows)
+    generate(arguments.rows, "data/" + name + ".basics.tsv", "data/" + name + ".ratings.tsv", arguments.seed)
+    print("wrote data/" + name + ".basics.tsv and data/" + name + ".ratings.tsv")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,559 @@
+"""
+CSAPX Project 1: Movie
+
+In this project we worked with datasets from the IMDB website. We got
+experience reading in the data and using various structures and collections in Python to
+store, organize and efficiently query for different kinds of information relating to the movies
+and their ratings.
+
+***                                                                                                                 ***
+    This module contains the secondary indexes that are built once when the datasets are loaded. Each index
+    maps the query parameters straight to the tconsts of the matching movies, already in the order the query displays
+    them, so the query functions only touch the movies they print instead of scanning every movie.
+***                                                                                                                 ***
+
+author: Miguel Reyes
+date: 09/26/21
+"""
+import bisect
+import collections
+import operator
+from array import array
+from dataclasses import dataclass, field
+import aggregate_cube
+import render
+
+"""
+Indexes:
+    year_and_genre(dict): (title_type, start_year, genre) -> list of tconsts sorted by primary_title
+    runtime(dict): title_type -> (array of negated runtimes, list of tconsts) sorted by descending runtime, then
+                   ascending primary_title
+    most_votes(dict): title_type -> list of rated tconsts sorted by descending num_votes, then ascending primary_title
+    top(dict): (title_type, start_year as an int) -> list of tconsts with at least 1000 votes sorted by descending
+               avg_rating, then descending num_votes, then ascending primary_title
+    contains(dict): title_type -> (list of tconsts in dataset order, dictionary of trigram -> array of positions in
+                    that list) - the tconst of a movie deleted by update_indexes is replaced with None until the
+                    positions of its title type are compacted
+    stats(dict): (title_type, start_year as an int, genre or None for all genres) -> Aggregate object of the movies
+                 (see aggregate_cube.py)
+    columns(NumpyColumns): column arrays of the numpy backend (see numpy_backend.py) or None
+    scan_pool(ScanPool): process pool of the partitioned scans (see partitioned_scan.py) or None
+    lines(LineCache): formatted movie lines by tconst, filled as movies are displayed
+"""
+
+"""
+QUERY_INDEXES:
+    query types that have a secondary index
+"""
+QUERY_INDEXES = ("YEAR_AND_GENRE", "RUNTIME", "MOST_VOTES", "TOP", "CONTAINS", "STATS")
+
+"""
+COMPACT_FRACTION:
+    fraction of the positions of a title type in the CONTAINS index that can belong to deleted movies before the
+    positions of the title type are compacted
+"""
+COMPACT_FRACTION = 0.5
+
+
+@dataclass
+class Indexes:
+    """A dataclass to hold the secondary indexes - an index is None when it has not been built."""
+    year_and_genre: dict = None
+    runtime: dict = None
+    most_votes: dict = None
+    top: dict = None
+    contains: dict = None
+    stats: dict = None
+    columns: object = None
+    scan_pool: object = None
+    lines: render.LineCache = field(default_factory=render.LineCache)
+
+
+def build_year_and_genre_index(movies: dict) -> dict:
+    """
+    Function to build the YEAR_AND_GENRE index. Every movie is added once for each genre in its comma separated genres,
+    so genres are matched as whole words. Posting lists are sorted by ascending primary_title, movies with the same
+    primary_title stay in the order they appear in the dataset.
+
+    :param movies: dictionary of Movie objects
+    :return: dictionary of (title_type, start_year, genre) -> list of tconsts
+    """
+    index = dict()
+    for movie in movies.values():
+        for genre in dict.fromkeys(movie.genres.split(",")):  # dict.fromkeys drops repeated genres, keeps the order
+            key = (movie.title_type, movie.start_year, genre)
+            posting = index.get(key)
+            if posting is None:
+                posting = index[key] = list()
+            posting.append((movie.primary_title, movie.tconst))
+
+    for key, posting in index.items():
+        posting.sort(key=operator.itemgetter(0))  # Sort posting by ascending primary_title
+        index[key] = [tconst for primary_title, tconst in posting]
+
+    return index
+
+
+def build_runtime_index(movies: dict) -> dict:
+    """
+    Function to build the RUNTIME index. For every title type the movies are kept sorted by descending runtime
+    (evaluated as an int), then ascending primary_title, movies that tie on both stay in the order they appear in the
+    dataset. The runtimes are stored negated so the ascending order bisect expects is the descending order we display.
+
+    :param movies: dictionary of Movie objects
+    :return: dictionary of title_type -> (array of negated runtimes, list of tconsts)
+    """
+    rows = dict()
+    for movie in movies.values():
+        title_rows = rows.get(movie.title_type)
+        if title_rows is None:
+            title_rows = rows[movie.title_type] = list()
+        title_rows.append((-int(movie.runtime_minutes), movie.primary_title, movie.tconst))
+
+    index = dict()
+    for title_type, title_rows in rows.items():
+        title_rows.sort(key=operator.itemgetter(0, 1))  # Sort by descending runtime then ascending primary_title
+        index[title_type] = (array("i", [row[0] for row in title_rows]), [row[2] for row in title_rows])
+
+    return index
+
+
+def runtime_range(index: dict, title_type: str, min_mins: int, max_mins: int) -> list:
+    """
+    Function to find the movies of a title type whose runtime is between min_mins and max_mins (inclusive) with two
+    binary searches - the matching movies are a contiguous slice of the index.
+
+    :param index: RUNTIME index from build_runtime_index
+    :param title_type: type of movie - examples are short, movies, tv episode or tv series
+    :param min_mins: minimum minutes
+    :param max_mins: maximum minutes
+    :return: list of tconsts sorted by descending runtime, then ascending primary_title
+    """
+    if title_type not in index:
+        return list()
+    negated_runtimes, tconsts = index[title_type]
+    start = bisect.bisect_left(negated_runtimes, -max_mins)
+    end = bisect.bisect_right(negated_runtimes, -min_mins)
+    return tconsts[start:end]
+
+
+def build_most_votes_index(movies: dict, ratings: dict) -> dict:
+    """
+    Function to build the MOST_VOTES index. For every title type the rated movies are kept sorted by descending number
+    of votes (evaluated as an int), then ascending primary_title, movies that tie on both stay in the order they
+    appear in the ratings dataset. The top movies of a title type are the first ones of its list.
+
+    :param movies: dictionary of Movie objects
+    :param ratings: dictionary of Rating objects
+    :return: dictionary of title_type -> list of tconsts
+    """
+    rows = dict()
+    for tconst, rating in ratings.items():
+        movie = rating.movie
+        title_rows = rows.get(movie.title_type)
+        if title_rows is None:
+            title_rows = rows[movie.title_type] = list()
+        title_rows.append((-rating.votes, movie.primary_title, tconst))
+
+    index = dict()
+    for title_type, title_rows in rows.items():
+        title_rows.sort(key=operator.itemgetter(0, 1))  # Sort by descending num_votes then ascending primary_title
+        index[title_type] = [row[2] for row in title_rows]
+
+    return index
+
+
+def build_top_index(movies: dict, ratings: dict) -> dict:
+    """
+    Function to build the TOP index. Only movies with at least 1000 votes are kept, bucketed by title type and start
+    year and sorted by descending rating, descending number of votes, then ascending primary_title, movies that tie on
+    all three stay in the order they appear in the ratings dataset. The top movies of a year are the first ones of its
+    bucket.
+
+    :param movies: dictionary of Movie objects
+    :param ratings: dictionary of Rating objects
+    :return: dictionary of (title_type, start_year) -> list of tconsts
+    """
+    rows = dict()
+    for tconst, rating in ratings.items():
+        if rating.votes < 1000:
+            continue
+        movie = rating.movie
+        key = (movie.title_type, rating.year)
+        bucket = rows.get(key)
+        if bucket is None:
+            bucket = rows[key] = list()
+        bucket.append((-rating.average, -rating.votes, movie.primary_title, tconst))
+
+    index = dict()
+    for key, bucket in rows.items():
+        bucket.sort(key=operator.itemgetter(0, 1, 2))  # Sort by descending avg_rating, descending num_votes then ->
+        # ascending primary_title
+        index[key] = [row[3] for row in bucket]
+
+    return index
+
+
+def trigrams(words: str) -> set:
+    """
+    :param words: string of words
+    :return: set of every 3 character substring of words
+    """
+    return {words[i:i + 3] for i in range(len(words) - 2)}
+
+
+def build_contains_index(movies: dict) -> dict:
+    """
+    Function to build the CONTAINS index - a trigram inverted index over primary_title for every title type. The
+    movies of a title type are listed in the order they appear in the dataset and every trigram of a primary_title
+    points to the position of its movie in that list, so posting lists are in dataset order.
+
+    :param movies: dictionary of Movie objects
+    :return: dictionary of title_type -> (list of tconsts, dictionary of trigram -> array of positions)
+    """
+    index = dict()
+    for movie in movies.values():
+        add_contains_entry(index, movie)
+
+    return index
+
+
+def add_contains_entry(index: dict, movie) -> None:
+    """
+    Function to add a movie after every movie of its title type in the CONTAINS index.
+
+    :param index: CONTAINS index from build_contains_index
+    :param movie: Movie object
+    :return: None
+    """
+    title_index = index.get(movie.title_type)
+    if title_index is None:
+        title_index = index[movie.title_type] = (list(), dict())
+    tconsts, postings = title_index
+    position = len(tconsts)
+    tconsts.append(movie.tconst)
+    for trigram in trigrams(movie.primary_title):
+        posting = postings.get(trigram)
+        if posting is None:
+            posting = postings[trigram] = array("I")
+        posting.append(position)
+
+
+def compact_contains_entries(index: dict, title_type: str) -> None:
+    """
+    Function to drop the positions of the deleted movies of a title type from the CONTAINS index - the positions after
+    them move down, so the posting lists stay in dataset order.
+
+    :param index: CONTAINS index from build_contains_index
+    :param title_type: type of movie - examples are short, movies, tv episode or tv series
+    :return: None
+    """
+    tconsts, postings = index[title_type]
+    new_positions = array("I")  # position -> position after the compaction
+    kept = list()
+    for tconst in tconsts:
+        new_positions.append(len(kept))
+        if tconst is not None:
+            kept.append(tconst)
+    tconsts[:] = kept
+    for trigram, posting in postings.items():  # only the positions of movies that are still there are posted
+        postings[trigram] = array("I", [new_positions[position] for position in posting])
+
+
+def contains_candidates(index: dict, title_type: str, words: str) -> list:
+    """
+    Function to find the movies of a title type whose primary_title may contain words - the posting lists of the
+    trigrams of words are intersected, smallest first. Every movie whose primary_title contains words is a candidate
+    but not every candidate contains words, so the caller still has to check. Words shorter than a trigram can't use
+    the index and every movie of the title type is a candidate.
+
+    :param index: CONTAINS index from build_contains_index
+    :param title_type: type of movie - examples are short, movies, tv episode or tv series
+    :param words: string of words that may be substrings of movie objects primary_title field variable
+    :return: list of tconsts in dataset order
+    """
+    if title_type not in index:
+        return list()
+    tconsts, postings = index[title_type]
+    if len(words) < 3:
+        return [tconst for tconst in tconsts if tconst is not None]
+
+    posting_lists = sorted((postings.get(trigram, ()) for trigram in trigrams(words)), key=len)
+    candidates = posting_lists[0]
+    for posting in posting_lists[1:]:
+        if len(candidates) == 0:
+            break
+        candidates = sorted(set(candidates).intersection(posting))
+
+    return [tconsts[position] for position in candidates if tconsts[position] is not None]
+
+
+def build_indexes(movies: dict, ratings: dict, query_types=None) -> Indexes:
+    """
+    Function to build every secondary index, or only the indexes of some query types.
+
+    :param movies: dictionary of Movie objects
+    :param ratings: dictionary of Rating objects
+    :param query_types: query types whose index is built - every index when None
+    :return: Indexes object
+    """
+    if query_types is None:
+        query_types = QUERY_INDEXES
+    movie_indexes = Indexes()
+    if "YEAR_AND_GENRE" in query_types:
+        movie_indexes.year_and_genre = build_year_and_genre_index(movies)
+    if "RUNTIME" in query_types:
+        movie_indexes.runtime = build_runtime_index(movies)
+    if "MOST_VOTES" in query_types:
+        movie_indexes.most_votes = build_most_votes_index(movies, ratings)
+    if "TOP" in query_types:
+        movie_indexes.top = build_top_index(movies, ratings)
+    if "CONTAINS" in query_types:
+        movie_indexes.contains = build_contains_index(movies)
+    if "STATS" in query_types:
+        movie_indexes.stats = aggregate_cube.build_cube(movies, ratings)
+    return movie_indexes
+
+
+def rebuild_indexes(movie_indexes: Indexes, movies: dict, ratings: dict) -> None:
+    """
+    Function to build the indexes of an Indexes object again - indexes that are None stay None.
+
+    :param movie_indexes: Indexes object
+    :param movies: dictionary of Movie objects
+    :param ratings: dictionary of Rating objects
+    :return: None
+    """
+    if movie_indexes.year_and_genre is not None:
+        movie_indexes.year_and_genre = build_year_and_genre_index(movies)
+    if movie_indexes.runtime is not None:
+        movie_indexes.runtime = build_runtime_index(movies)
+    if movie_indexes.most_votes is not None:
+        movie_indexes.most_votes = build_most_votes_index(movies, ratings)
+    if movie_indexes.top is not None:
+        movie_indexes.top = build_top_index(movies, ratings)
+    if movie_indexes.contains is not None:
+        movie_indexes.contains = build_contains_index(movies)
+    if movie_indexes.stats is not None:
+        movie_indexes.stats = aggregate_cube.build_cube(movies, ratings)
+
+
+def year_and_genre_keys(movie, rating) -> list:
+    if movie is None:
+        return list()
+    return [(movie.title_type, movie.start_year, genre) for genre in dict.fromkeys(movie.genres.split(","))]
+
+
+def year_and_genre_order(movie, rating):
+    return movie.primary_title
+
+
+def runtime_keys(movie, rating) -> list:
+    return list() if movie is None else [movie.title_type]
+
+
+def runtime_order(movie, rating) -> tuple:
+    return -int(movie.runtime_minutes), movie.primary_title
+
+
+def most_votes_keys(movie, rating) -> list:
+    return list() if movie is None or rating is None else [movie.title_type]
+
+
+def most_votes_order(movie, rating) -> tuple:
+    return -rating.votes, movie.primary_title
+
+
+def top_keys(movie, rating) -> list:
+    if movie is None or rating is None or rating.votes < 1000:
+        return list()
+    return [(movie.title_type, rating.year)]
+
+
+def top_order(movie, rating) -> tuple:
+    return -rating.average, -rating.votes, movie.primary_title
+
+
+def update_indexes(movie_indexes: Indexes, movies: dict, ratings: dict, old_movies: dict, old_ratings: dict,
+                   inserted_last: bool = True) -> None:
+    """
+    Function to update the indexes in place after movies and ratings were inserted, updated or deleted, so they are
+    the same as indexes built again from the changed movies and ratings. Every changed tconst is first removed from
+    the posting lists of its old keys (found by binary search on its old sort order) and then inserted into the
+    posting lists of its new keys. Movies that tie with an inserted movie are ordered by their position in the
+    dataset, which costs one pass over the tconsts of the movies (or ratings) and is only done when there is a tie.
+
+    :param movie_indexes: Indexes object - indexes that are None are skipped
+    :param movies: dictionary of Movie objects after the change
+    :param ratings: dictionary of Rating objects after the change
+    :param old_movies: dictionary of tconst -> Movie object before the change (None if inserted) of every inserted,
+                       updated or deleted movie, in the order the changes were made
+    :param old_ratings: dictionary of tconst -> Rating object before the change (None if not rated) of every
+                        inserted, updated or deleted rating and of every rated movie in old_movies
+    :param inserted_last: True if the inserted movies come after every other movie in movies
+    :return: None
+    """
+    changed = set(old_movies).union(old_ratings)
+
+    def old_state(tconst: str) -> tuple:
+        movie = old_movies[tconst] if tconst in old_movies else movies.get(tconst)
+        rating = old_ratings[tconst] if tconst in old_ratings else ratings.get(tconst)
+        return movie, rating
+
+    def new_state(tconst: str) -> tuple:
+        return movies.get(tconst), ratings.get(tconst)
+
+    datasets = {"movies": movies, "ratings": ratings}
+    rules = list()  # (index, keys function, order function, dataset the ties are ordered by, runtime index or not)
+    if movie_indexes.year_and_genre is not None:
+        rules.append((movie_indexes.year_and_genre, year_and_genre_keys, year_and_genre_order, "movies", False))
+    if movie_indexes.runtime is not None:
+        rules.append((movie_indexes.runtime, runtime_keys, runtime_order, "movies", True))
+    if movie_indexes.most_votes is not None:
+        rules.append((movie_indexes.most_votes, most_votes_keys, most_votes_order, "ratings", False))
+    if movie_indexes.top is not None:
+        rules.append((movie_indexes.top, top_keys, top_order, "ratings", False))
+
+    insertions = list()  # (rule, key, list of tconsts to insert)
+    removed_keys = list()  # (index, key, runtime index or not) of the posting lists tconsts were removed from
+    tied = {"movies": set(), "ratings": set()}  # tconsts whose dataset position is needed to break a tie
+    for rule in rules:
+        index, keys, order, dataset, is_runtime = rule
+
+        def old_order(tconst: str):
+            return order(*old_state(tconst))
+
+        for tconst in changed:
+            movie, rating = old_state(tconst)
+            for key in keys(movie, rating):
+                tconsts = index[key][1] if is_runtime else index[key]
+                value = order(movie, rating)
+                start = bisect.bisect_left(tconsts, value, key=old_order)
+                i = tconsts.index(tconst, start, bisect.bisect_right(tconsts, value, start, key=old_order))
+                del tconsts[i]
+                if is_runtime:
+                    del index[key][0][i]
+                removed_keys.append((index, key, is_runtime))
+
+        added = dict()  # key -> tconsts to insert
+        for tconst in changed:
+            for key in keys(*new_state(tconst)):
+                added.setdefault(key, list()).append(tconst)
+
+        def new_order(tconst: str):
+            return order(*new_state(tconst))
+
+        for key, tconsts_added in added.items():
+            if key not in index:
+                index[key] = (array("i"), list()) if is_runtime else list()
+            tconsts = index[key][1] if is_runtime else index[key]
+            values = [new_order(tconst) for tconst in tconsts_added]
+            counts = collections.Counter(values)
+            for tconst, value in zip(tconsts_added, values):
+                start = bisect.bisect_left(tconsts, value, key=new_order)
+                end = bisect.bisect_right(tconsts, value, start, key=new_order)
+                if end > start or counts[value] > 1:
+                    tied[dataset].add(tconst)
+                    tied[dataset].update(tconsts[start:end])
+            insertions.append((rule, key, tconsts_added))
+
+    positions = dict()  # dataset -> dictionary of tconst -> position in the dataset, only for tied tconsts
+    for dataset, needed in tied.items():
+        if len(needed) > 0:
+            positions[dataset] = {tconst: i for i, tconst in enumerate(datasets[dataset]) if tconst in needed}
+
+    for (index, keys, order, dataset, is_runtime), key, tconsts_added in insertions:
+        dataset_positions = positions.get(dataset, dict())
+
+        def new_order(tconst: str):
+            return order(*new_state(tconst))
+
+        tconsts = index[key][1] if is_runtime else index[key]
+        for tconst in sorted(tconsts_added, key=lambda t: (new_order(t), dataset_positions.get(t, 0))):
+            value = new_order(tconst)
+            i = bisect.bisect_left(tconsts, value, key=new_order)
+            end = bisect.bisect_right(tconsts, value, i, key=new_order)
+            while i < end and dataset_positions[tconsts[i]] < dataset_positions[tconst]:
+                i += 1
+            tconsts.insert(i, tconst)
+            if is_runtime:
+                index[key][0].insert(i, value[0])
+
+    for index, key, is_runtime in removed_keys:
+        if key in index and len(index[key][1] if is_runtime else index[key]) == 0:
+            del index[key]
+
+    if movie_indexes.contains is not None:
+        update_contains_index(movie_indexes.contains, movies, old_movies, inserted_last)
+
+    if movie_indexes.stats is not None:  # the changed movies are subtracted as they were and added as they are now
+        for tconst in changed:
+            aggregate_cube.add_movie(movie_indexes.stats, *old_state(tconst), -1)
+            aggregate_cube.add_movie(movie_indexes.stats, *new_state(tconst))
+
+
+def update_contains_index(index: dict, movies: dict, old_movies: dict, inserted_last: bool = True) -> None:
+    """
+    Function to update the CONTAINS index in place. A deleted movie keeps its position with None as its tconst, a
+    movie whose primary_title changed moves to the posting lists of its new trigrams and an inserted movie is added
+    after every movie of its title type. A movie whose title type changed (or an inserted movie when inserted movies
+    are not the last ones) belongs somewhere in the middle of its title type, so that title type is built again. The
+    positions of a title type are compacted once more than COMPACT_FRACTION of them belong to deleted movies.
+
+    :param index: CONTAINS index from build_contains_index
+    :param movies: dictionary of Movie objects after the change
+    :param old_movies: dictionary of tconst -> Movie object before the change (None if inserted) of every inserted,
+                       updated or deleted movie, in the order the changes were made
+    :param inserted_last: True if the inserted movies come after every other movie in movies
+    :return: None
+    """
+    rebuild = set()  # title types built again
+    deleted = set()  # title types with positions of deleted movies
+    for tconst, old_movie in old_movies.items():
+        movie = movies.get(tconst)
+        if old_movie is None:
+            if not inserted_last:
+                rebuild.add(movie.title_type)
+            elif movie.title_type not in rebuild:
+                add_contains_entry(index, movie)
+            continue
+        if movie is not None and movie.title_type == old_movie.title_type and \
+                movie.primary_title == old_movie.primary_title:
+            continue
+
+        tconsts, postings = index[old_movie.title_type]
+        old_trigrams = trigrams(old_movie.primary_title)
+        if len(old_trigrams) > 0:
+            candidates = sorted((postings[trigram] for trigram in old_trigrams), key=len)[0]
+            position = next(position for position in candidates if tconsts[position] == tconst)
+        else:
+            position = tconsts.index(tconst)
+        new_trigrams = set()
+        if movie is not None and movie.title_type == old_movie.title_type:
+            new_trigrams = trigrams(movie.primary_title)
+        else:
+            tconsts[position] = None
+            deleted.add(old_movie.title_type)
+            if movie is not None:
+                rebuild.add(movie.title_type)
+        for trigram in old_trigrams - new_trigrams:
+            posting = postings[trigram]
+            del posting[bisect.bisect_left(posting, position)]
+            if len(posting) == 0:
+                del postings[trigram]
+        for trigram in new_trigrams - old_trigrams:
+            posting = postings.get(trigram)
+            if posting is None:
+                posting = postings[trigram] = array("I")
+            posting.insert(bisect.bisect_left(posting, position), position)
+
+    for title_type in rebuild:
+        index.pop(title_type, None)
+    if len(rebuild) > 0:
+        for movie in movies.values():
+            if movie.title_type in rebuild:
+                add_contains_entry(index, movie)
+    for title_type in deleted - rebuild:
+        tconsts = index[title_type][0]
+        if tconsts.count(None) > COMPACT_FRACTION * len(tconsts):
+            compact_contains_entries(index, title_type)
@@ -0,0 +1,169 @@
+"""
+CSAPX Project 1: Movie
+
+In this project we worked with datasets from the IMDB website. We got
+experience reading in the data and using various structures and collections in Python to
+store, organize and efficiently query for different kinds of information relating to the movies
+and their ratings.
+
+***                                                                                                                 ***
+    This module contains the lazy loader - the query lines are read first and only what they need is loaded. Only the
+    kept fields of the movies dataset are kept, as one text, and a Movie object is only built when a movie is looked
+    up or scanned (a scan of one title type never builds the movies of the others), the ratings dataset is only read
+    the first time a rating is used (LOOKUP, MOST_VOTES, TOP and STATS are the only queries that use them) and only
+    the indexes of the query types in the query lines are built.
+***                                                                                                                 ***
+
+author: Miguel Reyes
+date: 09/26/21
+"""
+import io
+from array import array
+from collections.abc import Mapping
+import query_processor
+from columnar import TconstKeys, TconstRows
+from movies_and_ratings import Movie, open_dataset, parse_movie_line
+
+"""
+RATING_QUERIES:
+    query types that use the ratings
+"""
+RATING_QUERIES = ("LOOKUP", "MOST_VOTES", "TOP", "STATS")
+
+
+class LazyMovies(Mapping):
+    """
+    A read only dictionary of tconst -> Movie object that keeps the kept fields of every movie of the dataset as one
+    text and only builds the Movie object of a movie when it is looked up or scanned.
+
+    text(str): record of every row - its title_type, primary_title, start_year, runtime_minutes and genres separated
+               by tabs and ended by a line break
+    starts(array): position of the record of each row in text
+    tconsts(TconstKeys): tconst of each row
+    rows(TconstRows): tconst -> row id
+    """
+
+    def __init__(self, text: str, starts: array, tconsts: TconstKeys, rows: TconstRows):
+        self.text = text
+        self.starts = starts
+        self.tconsts = tconsts
+        self.rows = rows
+
+    def movie(self, row: int) -> Movie:
+        """
+        :param row: row id
+        :return: Movie object of the row
+        """
+        start = self.starts[row]
+        return Movie(self.tconsts[row], *self.text[start:self.text.index("\n", start)].split("\t"))
+
+    def __getitem__(self, tconst: str) -> Movie:
+        return self.movie(self.rows[tconst])
+
+    def __contains__(self, tconst) -> bool:
+        return tconst in self.rows
+
+    def __iter__(self):
+        return iter(self.tconsts)
+
+    def __len__(self) -> int:
+        return len(self.tconsts)
+
+    def values(self):
+        return map(self.movie, range(len(self.tconsts)))
+
+    def values_of_types(self, title_types, start: int = 0, end: int = None):
+        """
+        :param title_types: collection of title types
+        :param start: first row scanned
+        :param end: row after the last row scanned - the last row when None
+        :return: generator of the Movie objects of the title types, in dataset order - the title type of a row is
+                 compared in text, so the Movie objects of the other rows are never built
+        """
+        prefixes = tuple(title_type + "\t" for title_type in title_types)
+        text = self.text
+        starts = self.starts
+        for row in range(start, len(starts) if end is None else end):
+            if text.startswith(prefixes, starts[row]):
+                yield self.movie(row)
+
+
+class LazyRatings(Mapping):
+    """
+    A read only dictionary of tconst -> RatedMovie object that reads the ratings dataset the first time it is used.
+
+    load(function): function() -> dictionary of RatedMovie objects
+    ratings(dict): the loaded ratings or None until they are used
+    """
+
+    def __init__(self, load):
+        self.load = load
+        self.ratings = None
+
+    @property
+    def loaded(self) -> bool:
+        return self.ratings is not None
+
+    def get_ratings(self) -> dict:
+        if self.ratings is None:
+            self.ratings = self.load()
+        return self.ratings
+
+    def __getitem__(self, tconst: str):
+        return self.get_ratings()[tconst]
+
+    def __contains__(self, tconst) -> bool:
+        return tconst in self.get_ratings()
+
+    def __iter__(self):
+        return iter(self.get_ratings())
+
+    def __len__(self) -> int:
+        return len(self.get_ratings())
+
+    def values(self):
+        return self.get_ratings().values()
+
+    def items(self):
+        return self.get_ratings().items()
+
+
+def read_lazy_movie_dataset(filename: str) -> LazyMovies:
+    """
+    Function to read in file and keep the kept fields of every movie - same rules as
+    movies_and_ratings.read_movie_dataset, originalTitle, isAdult and endYear are dropped right away.
+
+    :param filename: The file name we're reading in
+    :return: dictionary(view) whose values are Movie objects
+    """
+    text = io.StringIO()
+    size = 0
+    starts = array("Q")
+    tconsts = TconstKeys()
+    rows = TconstRows()
+    with open_dataset(filename) as f:
+        next(f)  # skips header line
+        for line in f:
+            data_fields = parse_movie_line(line)
+            if data_fields is None:  # will skip over the movie when isAdult is equal to 1
+                continue
+            record = "\t".join(data_fields[1:]) + "\n"
+            text.write(record)
+            row = rows.get(data_fields[0])
+            if row is None:
+                rows.add(data_fields[0], len(starts))
+                tconsts.append(data_fields[0])
+                starts.append(size)
+            else:  # a movie read again replaces the one before it but keeps its place, like a dictionary
+                starts[row] = size
+            size += len(record)
+
+    return LazyMovies(text.getvalue(), starts, tconsts, rows)
+
+
+def query_types(lines: list) -> set:
+    """
+    :param lines: query lines
+    :return: set of the query types of the query lines
+    """
+    return {query[0] for query in map(query_processor.parse_query, lines) if query is not None}
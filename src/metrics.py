@@ -0,0 +1,252 @@
+"""
+CSAPX Project 1: Movie
+
+In this project we worked with datasets from the IMDB website. We got
+experience reading in the data and using various structures and collections in Python to
+store, organize and efficiently query for different kinds of information relating to the movies
+and their ratings.
+
+***                                                                                                                 ***
+    This module contains the metrics of the load and query phases - named spans whose durations are kept in latency
+    histograms, counters (e.g. rows scanned vs rows emitted by a query), memory snapshots, and an optional cProfile
+    profile per query type. Everything is recorded in the module level REGISTRY, which does nothing until it is
+    enabled, and can be exported as JSON or Prometheus text.
+***                                                                                                                 ***
+
+author: Miguel Reyes
+date: 09/26/21
+"""
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+from timeit import default_timer as timer
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+"""
+BUCKETS:
+    upper bounds (seconds) of the latency histogram buckets
+"""
+BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 60.0)
+
+
+class Histogram:
+    """
+    Latency histogram of a span.
+
+    counts(list): number of durations in each bucket of BUCKETS (and one last bucket for longer durations)
+    count(int): number of durations
+    total(float): sum of the durations
+    maximum(float): longest duration
+    """
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.maximum = 0.0
+
+    def observe(self, seconds: float) -> None:
+        i = 0
+        while i < len(BUCKETS) and seconds > BUCKETS[i]:
+            i += 1
+        self.counts[i] += 1
+        self.count += 1
+        self.total += seconds
+        self.maximum = max(self.maximum, seconds)
+
+    def quantile(self, fraction: float) -> float:
+        """
+        :param fraction: e.g. 0.5 or 0.99
+        :return: upper bound of the bucket holding the quantile (the longest duration for the last bucket)
+        """
+        rank = fraction * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank and bucket_count > 0:
+                return BUCKETS[i] if i < len(BUCKETS) else self.maximum
+        return 0.0
+
+    def to_dict(self) -> dict:
+        return {"count": self.count, "sum": self.total, "max": self.maximum, "p50": self.quantile(0.5),
+                "p99": self.quantile(0.99),
+                "buckets": {str(bound): count for bound, count in zip(BUCKETS + ("+Inf",), self.counts)}}
+
+
+class Span:
+    """Context manager that records its duration in the histogram of its name."""
+
+    def __init__(self, registry, name: str):
+        self.registry = registry
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = timer()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.registry.observe(self.name, timer() - self.start)
+        return False
+
+
+class NoSpan:
+    """Context manager used while metrics are disabled."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+NO_SPAN = NoSpan()
+
+
+def memory_usage() -> tuple:
+    """
+    :return: tuple(current resident memory in bytes, peak resident memory in bytes) - 0 when it can't be measured
+    """
+    current = 0
+    if os.path.exists("/proc/self/statm"):
+        with open("/proc/self/statm") as f:
+            current = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    peak = 0
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        peak = peak if sys.platform == "darwin" else peak * 1024  # bytes on macOS, KiB on Linux
+    return current, peak
+
+
+class Metrics:
+    """
+    Registry of every metric.
+
+    enabled(bool): metrics are only recorded while enabled
+    histograms(dict): span name -> Histogram
+    counters(dict): counter name -> int
+    memory(list): list of (label, current resident bytes, peak resident bytes)
+    profiles(dict): query type -> cProfile.Profile of the query types being profiled
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.histograms = dict()
+        self.counters = dict()
+        self.memory = list()
+        self.profiles = dict()
+
+    def span(self, name: str):
+        """
+        :param name: name of the span - e.g. "read_movie_dataset.parse" or "query.TOP"
+        :return: context manager timing the code it runs
+        """
+        if not self.enabled:
+            return NO_SPAN
+        return Span(self, name)
+
+    def observe(self, name: str, seconds: float) -> None:
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram()
+        histogram.observe(seconds)
+
+    def count(self, name: str, value: int = 1) -> None:
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def snapshot_memory(self, label: str) -> None:
+        if self.enabled:
+            current, peak = memory_usage()
+            self.memory.append((label, current, peak))
+
+    def profile(self, query_type: str):
+        """
+        :param query_type: e.g. "RUNTIME"
+        :return: cProfile.Profile of the query type or None if it is not being profiled
+        """
+        if not self.enabled:
+            return None
+        return self.profiles.get(query_type)
+
+    def enable_profile(self, query_type: str) -> None:
+        self.profiles[query_type] = cProfile.Profile()
+
+    def to_dict(self) -> dict:
+        return {"spans": {name: histogram.to_dict() for name, histogram in sorted(self.histograms.items())},
+                "counters": dict(sorted(self.counters.items())),
+                "memory": [{"label": label, "rss_bytes": current, "peak_rss_bytes": peak}
+                           for label, current, peak in self.memory]}
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), indent=2)
+
+    def to_prometheus(self) -> str:
+        """
+        :return: every metric in the Prometheus text exposition format
+        """
+        lines = ["# TYPE movies_span_seconds histogram"]
+        for name, histogram in sorted(self.histograms.items()):
+            cumulative = 0
+            for bound, count in zip(BUCKETS + ("+Inf",), histogram.counts):
+                cumulative += count
+                lines.append('movies_span_seconds_bucket{span="%s",le="%s"} %d' % (name, bound, cumulative))
+            lines.append('movies_span_seconds_sum{span="%s"} %r' % (name, histogram.total))
+            lines.append('movies_span_seconds_count{span="%s"} %d' % (name, histogram.count))
+        lines.append("# TYPE movies_rows_total counter")
+        for name, value in sorted(self.counters.items()):
+            lines.append('movies_rows_total{name="%s"} %d' % (name, value))
+        lines.append("# TYPE movies_memory_bytes gauge")
+        for label, current, peak in self.memory:
+            lines.append('movies_memory_bytes{label="%s",kind="rss"} %d' % (label, current))
+            lines.append('movies_memory_bytes{label="%s",kind="peak_rss"} %d' % (label, peak))
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str) -> None:
+        """
+        Function to export the metrics - Prometheus text when path ends with .prom, otherwise JSON.
+
+        :param path: path of the file to write
+        :return: None
+        """
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus() if path.endswith(".prom") else self.to_json())
+
+    def profile_stats(self, limit: int = 20) -> str:
+        """
+        :param limit: number of functions shown for each profiled query type
+        :return: the functions with the most cumulative time for each profiled query type
+        """
+        out = io.StringIO()
+        for query_type, profile in sorted(self.profiles.items()):
+            out.write("profile of " + query_type + " queries:\n")
+            try:
+                pstats.Stats(profile, stream=out).sort_stats("cumulative").print_stats(limit)
+            except TypeError:  # the query type never ran
+                out.write("\tno queries\n")
+        return out.getvalue()
+
+
+REGISTRY = Metrics()
+
+
+def span(name: str):
+    """
+    :param name: name of the span
+    :return: context manager timing the code it runs in the REGISTRY
+    """
+    return REGISTRY.span(name)
+
+
+def count(name: str, value: int = 1) -> None:
+    """
+    Function to add value to a counter of the REGISTRY.
+    """
+    REGISTRY.count(name, value)
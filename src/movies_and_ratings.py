@@ -14,8 +14,14 @@ and their ratings.
 author: Miguel Reyes
 date: 09/26/21
 """
+import gzip
+import io
+import os
+import metrics
 from dataclasses import dataclass
 
+BUFFER_SIZE = 1 << 20  # bytes read from a dataset file at a time
+
 """
 Movie:
     tconst(str): unique identifier - unique for every movie
@@ -54,32 +60,126 @@ class Rating:
     num_votes: str
 
 
+"""
+RatedMovie:
+    tconst(str), avg_rating(str), num_votes(str): same as Rating
+    movie(Movie): the rated Movie object - joined once when the ratings are read
+    average(float): avg_rating as a float
+    votes(int): num_votes as an int
+    year(int): start_year of the rated movie as an int
+"""
+
+
+@dataclass(frozen=True)
+class RatedMovie(Rating):
+    """A dataclass to represent a Movie Rating joined with its Movie, numeric field variables are parsed once."""
+    movie: Movie
+    average: float
+    votes: int
+    year: int
+
+
+def join_rating(movie: Movie, avg_rating: str, num_votes: str) -> RatedMovie:
+    """
+    Function to join a rating with its movie, parsing the numbers the rating queries compare.
+
+    :param movie: the rated Movie object
+    :param avg_rating: Movie average rating
+    :param num_votes: Movie number of votes
+    :return: RatedMovie object
+    """
+    return RatedMovie(movie.tconst, avg_rating, num_votes, movie, float(avg_rating), int(num_votes),
+                      int(movie.start_year))
+
+
+def dataset_path(filename: str) -> str:
+    """
+    Function to find the file of a dataset - the uncompressed data/{filename}.tsv or else the gzipped
+    data/{filename}.tsv.gz as published by IMDB.
+
+    :param filename: The file name of the dataset - e.g. "title.basics"
+    :return: path of the dataset file
+    """
+    path = "data/" + filename + ".tsv"
+    if not os.path.exists(path) and os.path.exists(path + ".gz"):
+        return path + ".gz"
+    return path
+
+
+def open_dataset(filename: str):
+    """
+    Function to open a dataset for reading text with a large buffer. A gzipped dataset is decompressed while it is
+    read so it never has to be decompressed to disk. Lines only end with a line break (\\n), like the byte ranges of
+    the parallel loader - a lone \\r is part of its line and the \\r of a \\r\\n is stripped by the line parsers.
+
+    :param filename: The file name of the dataset - e.g. "title.basics"
+    :return: text file object
+    """
+    path = dataset_path(filename)
+    if path.endswith(".gz"):
+        return io.TextIOWrapper(io.BufferedReader(gzip.open(path, "rb"), buffer_size=BUFFER_SIZE), encoding="utf-8",
+                                newline="\n")
+    return open(path, encoding="utf-8", buffering=BUFFER_SIZE, newline="\n")
+
+
+def parse_movie_line(line: str):
+    """
+    Function to split a single line of the basics dataset into the field variables of a Movie object. Adult titles are
+    skipped and missing(\\N) start years, runtimes and genres are replaced with their default values.
+
+    :param line: a line of the basics dataset (not the header line)
+    :return: tuple(tconst, title_type, primary_title, start_year, runtime_minutes, genres) or None if skipped
+    """
+    tconst, title_type, primary_title, _, is_adult, start_year, _, runtime_minutes, genres = line.rstrip().split("\t")
+    # only the columns we use are kept - originalTitle and endYear are dropped right away
+    if is_adult == "1":  # will skip over the movie when isAdult is equal to 1
+        return None
+    if start_year == "\\N":
+        start_year = "0"
+    if runtime_minutes == "\\N":
+        runtime_minutes = "0"
+    if genres == "\\N":
+        genres = "None"
+    return tconst, title_type, primary_title, start_year, runtime_minutes, genres
+
+
+def parse_rating_line(line: str) -> tuple:
+    """
+    Function to split a single line of the ratings dataset into the field variables of a Rating object.
+
+    :param line: a line of the ratings dataset (not the header line)
+    :return: tuple(tconst, avg_rating, num_votes)
+    """
+    tconst, avg_rating, num_votes = line.rstrip().split("\t")
+    return tconst, avg_rating, num_votes
+
+
 def read_movie_dataset(filename: str) -> dict:
     """
     Function to read in file, assign its content to the Movie objects field variables and store Movie objects into a
-    dictionary.
+    dictionary. The file is read a block of lines at a time so reading, splitting and building the Movie objects are
+    timed separately (the read_movie_dataset.io, .parse and .construct spans).
 
-    :param filename: The file name we're reading in
+    :param filename: The file name we're reading in - data/{filename}.tsv or data/{filename}.tsv.gz
     :return: dictionary whose values are Movie objects
     """
     movies = dict()
-    with open("data/" + filename + ".tsv", encoding="utf-8") as f:  # Will open to read and when done reading will -->
-        # close file
+    with open_dataset(filename) as f:  # Will open to read and when done reading will close file - filename.tsv ->
+        # or filename.tsv.gz
         next(f)  # skips header line
-        for line in f:
-            newLine = line.rstrip()
-            data_fields = list(newLine.split("\t"))  # line converted into a list
-            if data_fields[4] == "1":  # will skip over list element(isAdult) when its equal to 1
-                continue
-            if data_fields[5] == "\\N":
-                data_fields[5] = "0"
-            if data_fields[7] == "\\N":
-                data_fields[7] = "0"
-            if data_fields[8] == "\\N":
-                data_fields[8] = "None"
-            movies[data_fields[0]] = Movie(data_fields[0], data_fields[1], data_fields[2], data_fields[5],
-                                           data_fields[7], data_fields[8])
-            #  Movie(tconst, title_type, primary_title, start_year, runtime_minutes, genres)
+        while True:
+            with metrics.span("read_movie_dataset.io"):
+                lines = f.readlines(BUFFER_SIZE)
+            if not lines:
+                break
+            with metrics.span("read_movie_dataset.parse"):
+                rows = [parse_movie_line(line) for line in lines]
+            with metrics.span("read_movie_dataset.construct"):
+                for data_fields in rows:
+                    if data_fields is None:
+                        continue
+                    movies[data_fields[0]] = Movie(*data_fields)
+                    #  Movie(tconst, title_type, primary_title, start_year, runtime_minutes, genres)
 
     return movies
 
@@ -87,21 +187,30 @@ def read_movie_dataset(filename: str) -> dict:
 def read_rating_dataset(filename: str, movies: dict) -> dict:
     """
     Function to read in a file, assign its content to the Rating objects field variables and store Rating objects into a
-    dictionary.
-    :param filename: The file name we're reading in
+    dictionary. Every rating is joined with its movie (the rating queries never have to look the movie up) and its
+    numbers are parsed once (see RatedMovie). Like read_movie_dataset it is timed by the read_rating_dataset.io,
+    .parse and .construct spans.
+    :param filename: The file name we're reading in - data/{filename}.tsv or data/{filename}.tsv.gz
     :param movies: dictionary of Movie objects - returned from the read_movie_dataset function
-    :return: dictionary whose values are Rating objects
+    :return: dictionary whose values are RatedMovie objects
     """
     ratings = dict()
-    with open("data/" + filename + ".tsv", encoding="utf-8") as f:
+    with open_dataset(filename) as f:
         next(f)  # skips header line
-        for line in f:
-            newLine = line.rstrip()
-            data_fields = tuple(newLine.split("\t"))  # line converted into a list
-            if data_fields[0] in movies:  # We only want to store rating objects whose tconst is a key of a movie, -->
-                # otherwise we don't need the rating object
-                ratings[data_fields[0]] = Rating(data_fields[0], data_fields[1], data_fields[2])
-                #  Rating(tconst, avg_rating, num_votes)
+        while True:
+            with metrics.span("read_rating_dataset.io"):
+                lines = f.readlines(BUFFER_SIZE)
+            if not lines:
+                break
+            with metrics.span("read_rating_dataset.parse"):
+                rows = [parse_rating_line(line) for line in lines]
+            with metrics.span("read_rating_dataset.construct"):
+                for data_fields in rows:
+                    movie = movies.get(data_fields[0])
+                    if movie is not None:  # We only want to store rating objects whose tconst is a key of a movie, ->
+                        # otherwise we don't need the rating object
+                        ratings[movie.tconst] = join_rating(movie, data_fields[1], data_fields[2])
+                        #  RatedMovie(tconst, avg_rating, num_votes, movie, average, votes, year)
 
     return ratings
 
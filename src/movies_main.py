@@ -15,11 +15,307 @@ date: 09/26/21
 """
 
 import sys
+import argparse
+import batch
 import movies_and_ratings
+import columnar
+import indexes
+import lazy_loader
+import metrics
+import numpy_backend
+import parallel_loader
+import partitioned_scan
 import queries
+import query_processor
+import refresh
+import render
+import result_cache
+import server
+import shared_dataset
+import snapshot
+import sqlite_store
 from timeit import default_timer as timer
 
 
+def parse_arguments(argv: list) -> argparse.Namespace:
+    """
+    Function to parse the command line arguments.
+
+    :param argv: command line arguments (without the program name)
+    :return: namespace of the parsed arguments
+    """
+    parser = argparse.ArgumentParser(description="Query the IMDB movies and ratings datasets read from standard input.")
+    parser.add_argument("dataset", nargs="?", help="use the small datasets (any value, usually \"small\")")
+    parser.add_argument("--columnar", action="store_true",
+                        help="store the datasets in the compact columnar store instead of dictionaries")
+    parser.add_argument("--no-indexes", dest="indexes", action="store_false",
+                        help="do not build the secondary indexes, every query scans the datasets")
+    parser.add_argument("--backend", choices=["python", "numpy"], default="python",
+                        help="answer the YEAR_AND_GENRE, RUNTIME, MOST_VOTES and TOP queries with the python indexes "
+                             "and scans or with vectorized NumPy column arrays (default python)")
+    parser.add_argument("--snapshot", action="store_true",
+                        help="load the datasets from their snapshot and write one when it is missing or out of date")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of processes parsing the datasets in parallel (default 1 - no parallel parsing)")
+    parser.add_argument("--batch", action="store_true",
+                        help="read every query first and answer the queries that scan the datasets with shared passes")
+    parser.add_argument("--cache-entries", type=int, default=0,
+                        help="keep the output of up to this many recent queries (default 0 - no result cache)")
+    parser.add_argument("--cache-bytes", type=int, default=64 * 1024 * 1024,
+                        help="maximum bytes of output kept by the result cache (default 64 MiB)")
+    parser.add_argument("--line-cache-entries", type=int, default=100000,
+                        help="keep the formatted lines of up to this many recently displayed movies (default 100000)")
+    parser.add_argument("--serve", metavar="ADDRESS",
+                        help="keep the datasets loaded and answer queries sent to ADDRESS (HOST:PORT or unix:PATH) "
+                             "instead of standard input - see client.py")
+    parser.add_argument("--metrics", metavar="PATH",
+                        help="record load and query metrics and write them to PATH (Prometheus text when PATH ends "
+                             "with .prom, otherwise JSON)")
+    parser.add_argument("--profile", metavar="QUERY_TYPE", action="append", default=[],
+                        choices=sorted(query_processor.ARGUMENTS),
+                        help="run the queries of QUERY_TYPE under cProfile and print their profile to standard error "
+                             "(can be given more than once)")
+    parser.add_argument("--scan-workers", type=int, default=0, metavar="N",
+                        help="split the scans of CONTAINS, YEAR_AND_GENRE and RUNTIME queries without an index "
+                             "between N processes (default 0 - scans run in this process)")
+    parser.add_argument("--lazy", action="store_true",
+                        help="read the query lines first and only load what they need - the ratings only for LOOKUP, "
+                             "MOST_VOTES, TOP and STATS queries and only the indexes of the query types used")
+    parser.add_argument("--query-workers", type=int, default=0, metavar="N",
+                        help="publish the datasets and indexes once to a read only shared file and answer the queries "
+                             "with N worker processes attached to it (default 0 - no query workers)")
+    parser.add_argument("--lookup", metavar="FILE",
+                        help="look up every tconst listed in FILE (one per line, - for standard input) at once instead "
+                             "of reading query lines and print all the results together")
+    parser.add_argument("--sqlite", action="store_true",
+                        help="import the datasets into a local SQLite file (once, when it is missing or out of date) "
+                             "and answer every query with an indexed SQL query instead of keeping them in memory")
+    arguments = parser.parse_args(argv)
+    if arguments.query_workers > 0 and (arguments.serve is not None or arguments.batch or arguments.snapshot or
+                                        arguments.backend != "python" or arguments.cache_entries > 0):
+        parser.error("--query-workers can't be combined with --serve, --batch, --snapshot, --backend numpy or "
+                     "--cache-entries")
+    if arguments.query_workers > 0 and arguments.scan_workers > 0:
+        parser.error("--query-workers can't be combined with --scan-workers")
+    if arguments.query_workers > 0 and (arguments.metrics is not None or len(arguments.profile) > 0):
+        parser.error("--query-workers can't be combined with --metrics or --profile")  # the workers record their own
+    if arguments.lazy and (arguments.serve is not None or arguments.snapshot or arguments.workers > 1 or
+                           arguments.query_workers > 0):
+        parser.error("--lazy can't be combined with --serve, --snapshot, --workers or --query-workers")
+    if arguments.sqlite and (arguments.columnar or arguments.backend != "python" or arguments.snapshot or
+                             arguments.workers > 1 or arguments.batch or arguments.serve is not None or
+                             arguments.scan_workers > 0 or arguments.lazy or arguments.query_workers > 0):
+        parser.error("--sqlite can't be combined with --columnar, --backend numpy, --snapshot, --workers, --batch, "
+                     "--serve, --scan-workers, --lazy or --query-workers")
+    if arguments.lookup is not None and (arguments.serve is not None or arguments.batch or arguments.lazy or
+                                         arguments.query_workers > 0):
+        parser.error("--lookup can't be combined with --serve, --batch, --lazy or --query-workers")
+    return arguments
+
+
+def read_tconsts(path: str) -> list:
+    """
+    :param path: path of a file with one tconst per line (LOOKUP query lines work too) - standard input when "-"
+    :return: list of the tconsts
+    """
+    if path == "-":
+        lines = sys.stdin.readlines()
+    else:
+        with open(path) as f:
+            lines = f.readlines()
+    return [values[-1] for values in map(str.split, lines) if len(values) > 0]
+
+
+def read_datasets(basics_filename: str, ratings_filename: str, arguments: argparse.Namespace) -> tuple:
+    """
+    Function to read the movies dataset and then the ratings dataset, printing the elapsed time of each.
+
+    :param basics_filename: file name of the movies dataset
+    :param ratings_filename: file name of the ratings dataset
+    :param arguments: parsed command line arguments
+    :return: tuple(dictionary of Movie objects, dictionary of Rating objects)
+    """
+    print("reading " + movies_and_ratings.dataset_path(basics_filename) + " into dict...")
+    start = timer()
+    with metrics.span("load.movies"):
+        if arguments.columnar:
+            movies = columnar.read_columnar_movie_dataset(basics_filename)  # dictionary(view) of movies
+        else:
+            movies = movies_and_ratings.read_movie_dataset(basics_filename)  # dictionary of movies
+    metrics.REGISTRY.snapshot_memory("load.movies")
+    elapsed = timer() - start
+    print("elapsed time (s):", elapsed, "\n")
+
+    print("reading " + movies_and_ratings.dataset_path(ratings_filename) + " into dict...")
+    start2 = timer()
+    with metrics.span("load.ratings"):
+        if arguments.columnar:
+            ratings = columnar.read_columnar_rating_dataset(ratings_filename, movies)  # dictionary(view) of ratings
+        else:
+            ratings = movies_and_ratings.read_rating_dataset(ratings_filename, movies)  # dictionary of ratings
+    metrics.REGISTRY.snapshot_memory("load.ratings")
+    elapsed2 = timer() - start2
+    print("elapsed time (s):", elapsed2, "\n")
+
+    return movies, ratings
+
+
+def load_datasets(basics_filename: str, ratings_filename: str, arguments: argparse.Namespace) -> tuple:
+    """
+    Function to read the movies and ratings datasets and build the indexes, printing the elapsed time of every step.
+
+    :param basics_filename: file name of the movies dataset
+    :param ratings_filename: file name of the ratings dataset
+    :param arguments: parsed command line arguments
+    :return: tuple(dictionary of Movie objects, dictionary of Rating objects, Indexes object)
+    """
+    if arguments.workers > 1:
+        print("reading " + movies_and_ratings.dataset_path(basics_filename) + " and " +
+              movies_and_ratings.dataset_path(ratings_filename) + " into dict with", arguments.workers, "workers...")
+        start = timer()
+        with metrics.span("load.parallel"):
+            movies, ratings = parallel_loader.read_datasets_parallel(basics_filename, ratings_filename,
+                                                                     arguments.workers, arguments.columnar)
+        metrics.REGISTRY.snapshot_memory("load.parallel")
+        elapsed = timer() - start
+        print("elapsed time (s):", elapsed, "\n")
+    else:
+        movies, ratings = read_datasets(basics_filename, ratings_filename, arguments)
+
+    return movies, ratings, build_indexes(movies, ratings, arguments)
+
+
+def build_indexes(movies: dict, ratings: dict, arguments: argparse.Namespace, query_types=None) -> indexes.Indexes:
+    """
+    Function to build the indexes (and the numpy columns of the numpy backend), printing the elapsed time of each to
+    sys.stderr - the output on sys.stdout stays the same as without indexes.
+
+    :param movies: dictionary of Movie objects
+    :param ratings: dictionary of Rating objects
+    :param arguments: parsed command line arguments
+    :param query_types: query types whose index is built - every index when None
+    :return: Indexes object
+    """
+    if arguments.indexes:
+        print("building indexes...", file=sys.stderr)
+        start3 = timer()
+        with metrics.span("load.indexes"):
+            movie_indexes = indexes.build_indexes(movies, ratings, query_types)
+        metrics.REGISTRY.snapshot_memory("load.indexes")
+        elapsed3 = timer() - start3
+        print("elapsed time (s):", elapsed3, "\n", file=sys.stderr)
+    else:
+        movie_indexes = indexes.Indexes()
+
+    if arguments.backend == "numpy":
+        print("building numpy columns...", file=sys.stderr)
+        start4 = timer()
+        with metrics.span("load.numpy"):
+            movie_indexes.columns = numpy_backend.build_columns(movies, ratings)
+        metrics.REGISTRY.snapshot_memory("load.numpy")
+        elapsed4 = timer() - start4
+        print("elapsed time (s):", elapsed4, "\n", file=sys.stderr)
+
+    return movie_indexes
+
+
+def load_lazy_datasets(basics_filename: str, ratings_filename: str, lines: list,
+                       arguments: argparse.Namespace) -> tuple:
+    """
+    Function to load only what the query lines need (see lazy_loader.py) - the ratings dataset is only read when a
+    query uses the ratings and only the indexes of the query types of the lines are built.
+
+    :param basics_filename: file name of the movies dataset
+    :param ratings_filename: file name of the ratings dataset
+    :param lines: query lines
+    :param arguments: parsed command line arguments
+    :return: tuple(dictionary(view) of Movie objects, dictionary(view) of Rating objects, Indexes object)
+    """
+    query_types = lazy_loader.query_types(lines)
+    print("reading " + movies_and_ratings.dataset_path(basics_filename) + " into dict...")
+    start = timer()
+    with metrics.span("load.movies"):
+        if arguments.columnar:
+            movies = columnar.read_columnar_movie_dataset(basics_filename)  # dictionary(view) of movies
+        else:
+            movies = lazy_loader.read_lazy_movie_dataset(basics_filename)  # dictionary(view) of movie lines
+    metrics.REGISTRY.snapshot_memory("load.movies")
+    elapsed = timer() - start
+    print("elapsed time (s):", elapsed, "\n")
+
+    def read_ratings():
+        with metrics.span("load.ratings"):
+            if arguments.columnar:
+                return columnar.read_columnar_rating_dataset(ratings_filename, movies)
+            return movies_and_ratings.read_rating_dataset(ratings_filename, movies)
+
+    ratings = lazy_loader.LazyRatings(read_ratings)  # dictionary(view) of ratings, read when first used
+    if any(query_type in lazy_loader.RATING_QUERIES for query_type in query_types) or arguments.backend == "numpy":
+        print("reading " + movies_and_ratings.dataset_path(ratings_filename) + " into dict...")
+        start2 = timer()
+        ratings.get_ratings()
+        metrics.REGISTRY.snapshot_memory("load.ratings")
+        elapsed2 = timer() - start2
+        print("elapsed time (s):", elapsed2, "\n")
+
+    return movies, ratings, build_indexes(movies, ratings, arguments, query_types)
+
+
+def attach_shared_datasets(basics_filename: str, ratings_filename: str, arguments: argparse.Namespace) -> tuple:
+    """
+    Function to attach to the shared dataset file of the datasets, publishing it first when it is missing or out of
+    date.
+
+    :param basics_filename: file name of the movies dataset
+    :param ratings_filename: file name of the ratings dataset
+    :param arguments: parsed command line arguments
+    :return: tuple(dictionary(view) of Movie objects, dictionary(view) of Rating objects, Indexes object)
+    """
+    path = shared_dataset.shared_path(basics_filename)
+    sources = [movies_and_ratings.dataset_path(basics_filename), movies_and_ratings.dataset_path(ratings_filename)]
+    options = {"indexes": arguments.indexes}
+    if not shared_dataset.is_current(path, sources, options):
+        datasets = load_datasets(basics_filename, ratings_filename, arguments)
+        print("publishing " + path + "...")
+        start = timer()
+        with metrics.span("load.publish"):
+            shared_dataset.publish(path, sources, options, *datasets)
+        elapsed = timer() - start
+        print("elapsed time (s):", elapsed, "\n")
+        del datasets  # the queries only use the shared file
+
+    print("attaching " + path + "...")
+    start = timer()
+    datasets = shared_dataset.attach(path)
+    elapsed = timer() - start
+    print("elapsed time (s):", elapsed, "\n")
+    return datasets
+
+
+def open_sqlite_datasets(basics_filename: str, ratings_filename: str) -> tuple:
+    """
+    Function to open the SQLite file of the datasets, importing them into it first when it is missing or out of date.
+
+    :param basics_filename: file name of the movies dataset
+    :param ratings_filename: file name of the ratings dataset
+    :return: tuple(dictionary(view) of Movie objects, dictionary(view) of Rating objects, Indexes object)
+    """
+    path = sqlite_store.database_path(basics_filename)
+    sources = [movies_and_ratings.dataset_path(basics_filename), movies_and_ratings.dataset_path(ratings_filename)]
+    if not sqlite_store.is_current(path, sources):
+        print("importing " + sources[0] + " and " + sources[1] + " into " + path + "...")
+        start = timer()
+        with metrics.span("load.sqlite"):
+            sqlite_store.import_datasets(path, sources, basics_filename, ratings_filename)
+        metrics.REGISTRY.snapshot_memory("load.sqlite")
+        elapsed = timer() - start
+        print("elapsed time (s):", elapsed, "\n")
+
+    print("opening " + path + "...")
+    movies, ratings = sqlite_store.open_store(path)
+    return movies, ratings, indexes.Indexes()  # the SQLite file has its own indexes
+
+
 def main():
     """
     Main function - uses the command line to determine whether to use the small or large datasets. If no command line
@@ -32,71 +328,127 @@ def main():
     Read each query line and storing every tab separated value into a list and using the values of the list we perform
     the query operations until there are no queries left.
 
+    The --columnar option stores the datasets in the columnar store (see columnar.py) which uses much less memory.
+    Unless --no-indexes is given, the secondary indexes (see indexes.py) are built after the datasets are loaded.
+    The --snapshot option loads everything from a binary snapshot (see snapshot.py) when one is up to date.
+    With --backend numpy the YEAR_AND_GENRE, RUNTIME, MOST_VOTES and TOP queries are answered from NumPy column
+    arrays (see numpy_backend.py).
+    With --scan-workers N the queries that scan the movies split the scan between N processes (see
+    partitioned_scan.py).
+    With --lazy the query lines are read first and only what they need is loaded (see lazy_loader.py).
+    With --query-workers N the datasets and indexes are published once to a read only shared file and N worker
+    processes attached to it answer the queries (see shared_dataset.py).
+    With --sqlite the datasets are imported into a SQLite file and every query runs as an indexed SQL query (see
+    sqlite_store.py).
+    With --lookup FILE the tconsts listed in FILE are all looked up at once (see queries.bulk_lookup) instead.
+    With --workers N both datasets are parsed at the same time by N processes (see parallel_loader.py).
+    With --batch all the query lines are read first and planned together (see batch.py).
+    With --cache-entries N the output of the N most recent queries is cached (see result_cache.py).
+    With --line-cache-entries N the formatted lines of the N most recently displayed movies are kept (see render.py).
+    With --serve ADDRESS the queries are read from clients of the query server instead (see server.py), sending the
+    server SIGHUP refreshes the datasets from their files without restarting it (see refresh.py).
+    With --metrics PATH the load and query metrics are written to PATH and --profile QUERY_TYPE profiles the queries
+    of QUERY_TYPE (see metrics.py).
+
     :return:None
     """
-    number_of_commands = len(sys.argv)
-    if number_of_commands < 2:
+    arguments = parse_arguments(sys.argv[1:])
+    if arguments.dataset is None:
         small_or_large_basics = "title.basics"
         small_or_large_ratings = "title.ratings"
     else:
         small_or_large_basics = "small.basics"
         small_or_large_ratings = "small.ratings"
 
-    print("reading data/" + small_or_large_basics + ".tsv into dict...")
-    start = timer()
-    movies = movies_and_ratings.read_movie_dataset(small_or_large_basics)  # dictionary of movies
-    elapsed = timer() - start
-    print("elapsed time (s):", elapsed, "\n")
+    if arguments.metrics is not None or len(arguments.profile) > 0:
+        metrics.REGISTRY.enabled = True
+        for query_type in arguments.profile:
+            metrics.REGISTRY.enable_profile(query_type)
 
-    print("reading data/" + small_or_large_ratings + ".tsv into dict...")
-    start2 = timer()
-    ratings = movies_and_ratings.read_rating_dataset(small_or_large_ratings, movies)  # dictionary of movie ratings
-    elapsed2 = timer() - start2
-    print("elapsed time (s):", elapsed2, "\n")
+    lines = sys.stdin.readlines() if arguments.lazy else None  # the lazy loader reads the query lines first
+    datasets = None
+    if arguments.lazy:
+        datasets = load_lazy_datasets(small_or_large_basics, small_or_large_ratings, lines, arguments)
+    elif arguments.sqlite:
+        datasets = open_sqlite_datasets(small_or_large_basics, small_or_large_ratings)
+    elif arguments.query_workers > 0:
+        datasets = attach_shared_datasets(small_or_large_basics, small_or_large_ratings, arguments)
+    elif arguments.snapshot:
+        path = snapshot.snapshot_path(small_or_large_basics)
+        sources = [movies_and_ratings.dataset_path(small_or_large_basics),
+                   movies_and_ratings.dataset_path(small_or_large_ratings)]
+        options = {"columnar": arguments.columnar, "indexes": arguments.indexes, "backend": arguments.backend}
+        start = timer()
+        with metrics.span("load.snapshot"):
+            datasets = snapshot.read_snapshot(path, sources, options)  # None when missing or out of date
+        if datasets is not None:
+            print("reading " + path + " into dict...")
+            elapsed = timer() - start
+            print("elapsed time (s):", elapsed, "\n")
 
-    print("Total movies: " + movies_and_ratings.total_movies(movies))
-    print("Total ratings: " + movies_and_ratings.total_ratings(ratings) + " \n")
-
-    for line in sys.stdin:
-        query = tuple(line.split())
-        if "LOOKUP" in query:
-            print("processing:", query[0], query[1])
-            lookup_start = timer()
-            queries.lookup(query[1], movies, ratings)
-            elapsed = timer() - lookup_start
+    if datasets is None:
+        datasets = load_datasets(small_or_large_basics, small_or_large_ratings, arguments)
+        if arguments.snapshot:
+            print("writing " + path + "...")
+            start = timer()
+            snapshot.write_snapshot(path, sources, options, *datasets)
+            elapsed = timer() - start
             print("elapsed time (s):", elapsed, "\n")
-        if "CONTAINS" in query:
-            empty_string = " "
-            primary_title = empty_string.join(query[2:])
-            print("processing:", query[0], query[1], primary_title)
-            contains_start = timer()
-            queries.contains(query[1], primary_title, movies)
-            contains_elapsed = timer() - contains_start
-            print("elapsed time (s):", contains_elapsed, "\n")
-        if "YEAR_AND_GENRE" in query:
-            print("processing:", query[0], query[1], query[2], query[3])
-            year_and_genre_start = timer()
-            queries.year_and_genre(query[1], query[2], query[3], movies)
-            year_and_genre_elapsed = timer() - year_and_genre_start
-            print("elapsed time (s):", year_and_genre_elapsed, "\n")
-        if "RUNTIME" in query:
-            print("processing:", query[0], query[1], query[2], query[3])
-            runtime_start = timer()
-            queries.runtime(query[1], query[2], query[3], movies)
-            runtime_elapsed = timer() - runtime_start
-            print("elapsed time (s):", runtime_elapsed, "\n")
-        if "MOST_VOTES" in query:
-            print("processing:", query[0], query[1], query[2])
-            runtime_start = timer()
-            queries.most_votes(query[1], query[2], movies, ratings)
-            runtime_elapsed = timer() - runtime_start
-            print("elapsed time (s):", runtime_elapsed, "\n")
-        if "TOP" in query:
-            print("processing:", query[0], query[1], query[2], query[3], query[4])
-            runtime_start = timer()
-            queries.top(query[1], query[2], query[3], query[4], movies, ratings)
-            runtime_elapsed = timer() - runtime_start
-            print("elapsed time (s):", runtime_elapsed, "\n")
+
+    movies, ratings, movie_indexes = datasets
+    movie_indexes.lines = render.LineCache(arguments.line_cache_entries)
+    if arguments.scan_workers > 0:
+        movie_indexes.scan_pool = partitioned_scan.ScanPool(movies, arguments.scan_workers)
+    metrics.REGISTRY.snapshot_memory("loaded")
+
+    print("Total movies: " + movies_and_ratings.total_movies(movies))
+    if isinstance(ratings, lazy_loader.LazyRatings) and not ratings.loaded:
+        print("Total ratings: not loaded - no query uses them \n")
+    else:
+        print("Total ratings: " + movies_and_ratings.total_ratings(ratings) + " \n")
+
+    if arguments.cache_entries > 0:
+        cache = result_cache.ResultCache(arguments.cache_entries, arguments.cache_bytes)
+    else:
+        cache = None
+
+    if arguments.lookup is not None:
+        tconsts = read_tconsts(arguments.lookup)
+        start = timer()
+        queries.bulk_lookup(tconsts, movies, ratings, movie_indexes.lines)
+        elapsed = timer() - start
+        print("elapsed time (s):", elapsed, "\n")
+    elif arguments.query_workers > 0:
+        sys.stdout.flush()
+        shared_dataset.process_queries(shared_dataset.shared_path(small_or_large_basics), sys.stdin.readlines(),
+                                       arguments.query_workers)
+    elif arguments.serve is not None:
+        def refresh_datasets():
+            print("refreshing " + movies_and_ratings.dataset_path(small_or_large_basics) + " and " +
+                  movies_and_ratings.dataset_path(small_or_large_ratings) + "...")
+            start = timer()
+            changes = refresh.refresh_datasets(small_or_large_basics, small_or_large_ratings, movies, ratings,
+                                               movie_indexes, cache)
+            elapsed = timer() - start
+            print(refresh.describe_changes(changes))
+            print("elapsed time (s):", elapsed, "\n", flush=True)
+
+        server.serve(arguments.serve, movies, ratings, movie_indexes, cache, refresh_datasets)
+    elif arguments.batch:
+        batch.process_batch(sys.stdin.readlines() if lines is None else lines, movies, ratings, movie_indexes, cache)
+    else:
+        for line in sys.stdin if lines is None else lines:
+            query_processor.process_query(line, movies, ratings, movie_indexes, cache)
+
+    if movie_indexes.scan_pool is not None:
+        movie_indexes.scan_pool.close()
+    if cache is not None:
+        print(cache.stats(), file=sys.stderr)
+    if arguments.metrics is not None:
+        metrics.REGISTRY.snapshot_memory("queries")
+        metrics.REGISTRY.write(arguments.metrics)
+    if len(arguments.profile) > 0:
+        print(metrics.REGISTRY.profile_stats(), file=sys.stderr)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,231 @@
+"""
+CSAPX Project 1: Movie
+
+In this project we worked with datasets from the IMDB website. We got
+experience reading in the data and using various structures and collections in Python to
+store, organize and efficiently query for different kinds of information relating to the movies
+and their ratings.
+
+***                                                                                                                 ***
+    This module contains the NumPy query backend - the datasets are also kept as NumPy column arrays (title type
+    codes, a genre bitmask, int start years, runtimes and votes, float ratings and the rank of every primary title)
+    and the RUNTIME, YEAR_AND_GENRE, MOST_VOTES and TOP queries are evaluated as boolean masks over the columns, then
+    ordered with lexsort (argpartition first picks the candidates of MOST_VOTES). The movies each query finds are
+    handed to the query functions in queries.py as a one key index, so the output is exactly the same as the pure
+    Python path. NumPy is optional - the backend is only available when it is installed.
+***                                                                                                                 ***
+
+author: Miguel Reyes
+date: 09/26/21
+"""
+import queries
+
+try:
+    import numpy
+except ImportError:  # the numpy backend is not available
+    numpy = None
+
+"""
+QUERY_TYPES:
+    query types answered by the numpy backend, the other query types use the python backend
+"""
+QUERY_TYPES = ("YEAR_AND_GENRE", "RUNTIME", "MOST_VOTES", "TOP")
+
+
+class NumpyColumns:
+    """
+    NumPy column arrays of the movies and ratings, row i of every column belongs to the i-th movie in dataset order.
+
+    tconsts(list): tconst of each row
+    title_types(dict): title_type -> code
+    title_type_codes(ndarray): code of each rows title_type
+    start_years(ndarray): start_year of each row as an int
+    runtime_minutes(ndarray): runtime_minutes of each row as an int
+    genres(dict): genre -> bit of the genre in genre_bits
+    genre_bits(ndarray): bitmask of the genres of each row (python ints if there are more than 64 genres)
+    title_ranks(ndarray): rank of each rows primary_title in the sorted distinct primary titles
+    rated(ndarray): True if the row has a rating
+    avg_ratings(ndarray): avg_rating of each row as a float (0.0 if the row has no rating)
+    num_votes(ndarray): num_votes of each row as an int (0 if the row has no rating)
+    rating_positions(ndarray): position of each rows rating in the ratings dataset (-1 if the row has no rating)
+    """
+
+    def __init__(self, movies: dict, ratings: dict):
+        self.tconsts = list()
+        self.title_types = dict()
+        title_type_codes = list()
+        start_years = list()
+        runtime_minutes = list()
+        genre_lists = dict()  # genres string -> bitmask, most movies share their genres with many others
+        self.genres = dict()
+        genre_bits = list()
+        titles = list()
+        rows = dict()
+        for movie in movies.values():
+            rows[movie.tconst] = len(self.tconsts)
+            self.tconsts.append(movie.tconst)
+            title_type_codes.append(self.title_types.setdefault(movie.title_type, len(self.title_types)))
+            start_years.append(int(movie.start_year))
+            runtime_minutes.append(int(movie.runtime_minutes))
+            bits = genre_lists.get(movie.genres)
+            if bits is None:
+                bits = 0
+                for genre in movie.genres.split(","):
+                    bits |= 1 << self.genres.setdefault(genre, len(self.genres))
+                genre_lists[movie.genres] = bits
+            genre_bits.append(bits)
+            titles.append(movie.primary_title)
+
+        ranks = {title: rank for rank, title in enumerate(sorted(set(titles)))}
+        self.title_type_codes = numpy.array(title_type_codes, dtype=numpy.int32)
+        self.start_years = numpy.array(start_years, dtype=numpy.int64)
+        self.runtime_minutes = numpy.array(runtime_minutes, dtype=numpy.int64)
+        if len(self.genres) <= 64:
+            self.genre_bits = numpy.array(genre_bits, dtype=numpy.uint64)
+        else:  # too many genres for 64 bits, the bitmasks are kept as python ints
+            self.genre_bits = numpy.array(genre_bits, dtype=object)
+        self.title_ranks = numpy.array([ranks[title] for title in titles], dtype=numpy.int64)
+
+        count = len(self.tconsts)
+        self.rated = numpy.zeros(count, dtype=bool)
+        self.avg_ratings = numpy.zeros(count, dtype=numpy.float64)
+        self.num_votes = numpy.zeros(count, dtype=numpy.int64)
+        self.rating_positions = numpy.full(count, -1, dtype=numpy.int64)
+        for position, rating in enumerate(ratings.values()):
+            row = rows[rating.tconst]
+            self.rated[row] = True
+            self.avg_ratings[row] = rating.average
+            self.num_votes[row] = rating.votes
+            self.rating_positions[row] = position
+
+    def title_type_mask(self, title_type: str):
+        """
+        :param title_type: type of movie
+        :return: boolean array that is True for the rows of title_type or None if no movie has that title type
+        """
+        code = self.title_types.get(title_type)
+        if code is None:
+            return None
+        return self.title_type_codes == code
+
+    def tconsts_of(self, rows) -> list:
+        tconsts = self.tconsts
+        return [tconsts[row] for row in rows.tolist()]
+
+
+def build_columns(movies: dict, ratings: dict) -> NumpyColumns:
+    """
+    :param movies: dictionary of Movie objects
+    :param ratings: dictionary of RatedMovie objects
+    :return: NumpyColumns object
+    """
+    if numpy is None:
+        raise RuntimeError("the numpy backend needs NumPy - pip install numpy")
+    return NumpyColumns(movies, ratings)
+
+
+def year_and_genre_tconsts(columns: NumpyColumns, title_type: str, year: str, genre: str) -> list:
+    """
+    :return: tconsts of the movies of title_type, start year and genre sorted by ascending primary_title (movies with
+             the same primary_title in dataset order)
+    """
+    mask = columns.title_type_mask(title_type)
+    bit = columns.genres.get(genre)
+    if mask is None or bit is None or not year.isdigit() or str(int(year)) != year:  # years are compared as strings
+        return list()
+    mask &= columns.start_years == int(year)
+    genre_bit = 1 << bit if columns.genre_bits.dtype == object else numpy.uint64(1 << bit)
+    mask &= (columns.genre_bits & genre_bit) != 0
+    rows = numpy.flatnonzero(mask)
+    return columns.tconsts_of(rows[numpy.argsort(columns.title_ranks[rows], kind="stable")])
+
+
+def runtime_tconsts(columns: NumpyColumns, title_type: str, min_mins: int, max_mins: int) -> tuple:
+    """
+    :return: tuple(list of negated runtimes, list of tconsts) of the movies of title_type whose runtime is between
+             min_mins and max_mins (inclusive) sorted by descending runtime, then ascending primary_title
+    """
+    mask = columns.title_type_mask(title_type)
+    if mask is None:
+        return list(), list()
+    mask &= columns.runtime_minutes >= min_mins
+    mask &= columns.runtime_minutes <= max_mins
+    rows = numpy.flatnonzero(mask)
+    rows = rows[numpy.lexsort((columns.title_ranks[rows], -columns.runtime_minutes[rows]))]  # last key sorts first
+    return (-columns.runtime_minutes[rows]).tolist(), columns.tconsts_of(rows)
+
+
+def most_votes_tconsts(columns: NumpyColumns, title_type: str, top_num: int) -> list:
+    """
+    :return: tconsts of the top_num rated movies of title_type with the most votes sorted by descending num_votes, then
+             ascending primary_title (movies that tie on both in ratings dataset order) - every one when top_num is
+             negative, like queries.top_count
+    """
+    mask = columns.title_type_mask(title_type)
+    if mask is None or top_num == 0:
+        return list()
+    rows = numpy.flatnonzero(mask & columns.rated)
+    if len(rows) == 0:
+        return list()
+    negated_votes = -columns.num_votes[rows]
+    if 0 < top_num < len(rows):  # only the movies with at least as many votes as the top_num-th one can be displayed
+        kth = negated_votes[numpy.argpartition(negated_votes, top_num - 1)[top_num - 1]]
+        rows = rows[negated_votes <= kth]
+    rows = rows[numpy.lexsort((columns.rating_positions[rows], columns.title_ranks[rows], -columns.num_votes[rows]))]
+    return columns.tconsts_of(rows if top_num < 0 else rows[:top_num])
+
+
+def top_tconsts(columns: NumpyColumns, title_type: str, top_num: int, start_year: int, end_year: int) -> dict:
+    """
+    :return: dictionary of (title_type, year) -> tconsts of the top_num movies of every year from start_year to
+             end_year with at least 1000 votes sorted by descending avg_rating, descending num_votes, then ascending
+             primary_title (movies that tie on all three in ratings dataset order) - every one when top_num is negative
+    """
+    index = dict()
+    mask = columns.title_type_mask(title_type)
+    if mask is None or top_num == 0:
+        return index
+    mask &= columns.rated
+    mask &= columns.num_votes >= 1000
+    mask &= columns.start_years >= start_year
+    mask &= columns.start_years <= end_year
+    rows = numpy.flatnonzero(mask)
+    rows = rows[numpy.lexsort((columns.rating_positions[rows], columns.title_ranks[rows], -columns.num_votes[rows],
+                               -columns.avg_ratings[rows], columns.start_years[rows]))]
+    years = columns.start_years[rows]
+    for year in range(start_year, end_year + 1):
+        start = numpy.searchsorted(years, year, side="left")
+        end = numpy.searchsorted(years, year, side="right")
+        if top_num > 0:
+            end = min(end, start + top_num)
+        if end > start:
+            index[(title_type, year)] = columns.tconsts_of(rows[start:end])
+    return index
+
+
+def run_query(query: tuple, movies: dict, ratings: dict, columns: NumpyColumns, cache=None, out=None) -> None:
+    """
+    Function to answer a YEAR_AND_GENRE, RUNTIME, MOST_VOTES or TOP query with the numpy backend - the matching movies
+    are found in the columns and printed by the query function of queries.py.
+
+    :param query: tuple of the query values
+    :param movies: dictionary of Movie objects
+    :param ratings: dictionary of RatedMovie objects
+    :param columns: NumpyColumns object
+    :param cache: LineCache object of formatted movie lines
+    :param out: text file the query output is written to - sys.stdout when None
+    :return: None
+    """
+    query_type, title_type = query[0], query[1]
+    if query_type == "YEAR_AND_GENRE":
+        index = {(title_type, query[2], query[3]): year_and_genre_tconsts(columns, title_type, query[2], query[3])}
+        queries.year_and_genre(title_type, query[2], query[3], movies, index, cache, out)
+    elif query_type == "RUNTIME":
+        index = {title_type: runtime_tconsts(columns, title_type, int(query[2]), int(query[3]))}
+        queries.runtime(title_type, query[2], query[3], movies, index, cache, out)
+    elif query_type == "MOST_VOTES":
+        index = {title_type: most_votes_tconsts(columns, title_type, int(query[2]))}
+        queries.most_votes(title_type, query[2], movies, ratings, index, cache, out)
+    elif query_type == "TOP":
+        index = top_tconsts(columns, title_type, int(query[2]), int(query[3]), int(query[4]))
+        queries.top(title_type, query[2], query[3], query[4], movies, ratings, index, cache, out)
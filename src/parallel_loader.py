@@ -0,0 +1,145 @@
+"""
+CSAPX Project 1: Movie
+
+In this project we worked with datasets from the IMDB website. We got
+experience reading in the data and using various structures and collections in Python to
+store, organize and efficiently query for different kinds of information relating to the movies
+and their ratings.
+
+***                                                                                                                 ***
+    This module contains the parallel loader - both datasets are split into byte ranges that start and end on a line
+    break and every range is parsed by a process of a process pool. The movies and ratings datasets are parsed at the
+    same time, the parsed ranges are merged in file order and only then are the ratings joined with the movies, so
+    the result is the same as reading the datasets one line at a time. A gzipped dataset can't be split, it is
+    parsed by a single process (still at the same time as the other dataset).
+***                                                                                                                 ***
+
+author: Miguel Reyes
+date: 09/26/21
+"""
+import gzip
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+import columnar
+from movies_and_ratings import BUFFER_SIZE, Movie, dataset_path, join_rating, parse_movie_line, parse_rating_line
+
+
+def chunk_ranges(path: str, chunks: int) -> list:
+    """
+    Function to split a file (without its header line) into byte ranges of about the same size, every range starts at
+    the beginning of a line and ends right after a line break (or at the end of the file).
+
+    :param path: path of the file
+    :param chunks: number of ranges wanted - fewer are returned for small files
+    :return: list of (start, end) byte offsets
+    """
+    if path.endswith(".gz"):
+        return [(0, None)]  # a gzipped dataset can't be split into byte ranges - one worker parses all of it
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        f.readline()  # skips header line
+        boundaries = [f.tell()]
+        for i in range(1, chunks):
+            offset = size * i // chunks
+            if offset <= boundaries[-1]:
+                continue
+            f.seek(offset - 1)
+            f.readline()  # moves to the start of the next line (offset - 1 in case offset is already a line start)
+            if f.tell() >= size:
+                break
+            boundaries.append(f.tell())
+    boundaries.append(size)
+    return [(boundaries[i], boundaries[i + 1]) for i in range(len(boundaries) - 1) if boundaries[i] < boundaries[i + 1]]
+
+
+def read_lines(path: str, start: int, end: int):
+    """
+    :param path: path of the file
+    :param start: byte offset of the first line
+    :param end: byte offset right after the last line - None to read every line (after the header line) of a
+                gzipped file
+    :return: iterable of the lines between start and end
+    """
+    if end is None:
+        with io.TextIOWrapper(io.BufferedReader(gzip.open(path, "rb"), buffer_size=BUFFER_SIZE), encoding="utf-8",
+                              newline="\n") as f:  # only on line breaks, like movies_and_ratings.open_dataset
+            next(f)  # skips header line
+            yield from f
+        return
+    with open(path, "rb") as f:
+        f.seek(start)
+        lines = f.read(end - start).decode("utf-8").split("\n")  # only on line breaks - str.splitlines() also
+        # splits on characters like \x85 that can be part of a title
+        if lines[-1] == "":
+            lines.pop()  # the range ends right after a line break
+        yield from lines
+
+
+def parse_movie_chunk(path: str, start: int, end: int) -> list:
+    """
+    Function run by the worker processes - parses a byte range of the movies dataset.
+
+    :return: list of tuple(tconst, title_type, primary_title, start_year, runtime_minutes, genres)
+    """
+    rows = list()
+    for line in read_lines(path, start, end):
+        data_fields = parse_movie_line(line)
+        if data_fields is not None:
+            rows.append(data_fields)
+    return rows
+
+
+def parse_rating_chunk(path: str, start: int, end: int) -> list:
+    """
+    Function run by the worker processes - parses a byte range of the ratings dataset.
+
+    :return: list of tuple(tconst, avg_rating, num_votes)
+    """
+    return [parse_rating_line(line) for line in read_lines(path, start, end)]
+
+
+def read_datasets_parallel(basics_filename: str, ratings_filename: str, workers: int, use_columnar: bool = False) \
+        -> tuple:
+    """
+    Function to read in the movies and ratings datasets with a pool of worker processes. Each dataset is split into
+    a few ranges per worker so the workers stay busy, the ranges of both datasets are submitted together.
+
+    :param basics_filename: The movies file name we're reading in
+    :param ratings_filename: The ratings file name we're reading in
+    :param workers: number of worker processes
+    :param use_columnar: store the datasets in a columnar.ColumnStore instead of dictionaries
+    :return: tuple(dictionary of Movie objects, dictionary of Rating objects)
+    """
+    basics_path = dataset_path(basics_filename)
+    ratings_path = dataset_path(ratings_filename)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        movie_chunks = [executor.submit(parse_movie_chunk, basics_path, start, end)
+                        for start, end in chunk_ranges(basics_path, workers * 4)]
+        rating_chunks = [executor.submit(parse_rating_chunk, ratings_path, start, end)
+                         for start, end in chunk_ranges(ratings_path, workers * 4)]
+
+        if use_columnar:
+            store = columnar.ColumnStore()
+            for chunk in movie_chunks:  # merged in file order
+                for data_fields in chunk.result():
+                    store.add_movie(*data_fields)
+            for chunk in rating_chunks:
+                for data_fields in chunk.result():
+                    row = store.rows.get(data_fields[0])
+                    if row is not None:
+                        store.add_rating(row, data_fields[1], data_fields[2])
+            return columnar.ColumnarMovies(store), columnar.ColumnarRatings(store)
+
+        movies = dict()
+        for chunk in movie_chunks:  # merged in file order
+            for data_fields in chunk.result():
+                movies[data_fields[0]] = Movie(*data_fields)
+        ratings = dict()
+        for chunk in rating_chunks:
+            for data_fields in chunk.result():
+                movie = movies.get(data_fields[0])
+                if movie is not None:
+                    ratings[movie.tconst] = join_rating(movie, data_fields[1], data_fields[2])
+
+    return movies, ratings
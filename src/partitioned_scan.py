@@ -0,0 +1,187 @@
+"""
+CSAPX Project 1: Movie
+
+In this project we worked with datasets from the IMDB website. We got
+experience reading in the data and using various structures and collections in Python to
+store, organize and efficiently query for different kinds of information relating to the movies
+and their ratings.
+
+***                                                                                                                 ***
+    This module contains the partitioned scans - the movies are split into contiguous row ranges, one for every
+    process of a process pool, and the CONTAINS, YEAR_AND_GENRE and RUNTIME queries that have to scan the movies run
+    the filter functions of queries.py on every range at the same time. Every worker reads the rows of its range
+    from the movies dictionary itself, so a columnar or lazy dictionary only builds the Movie objects it scans.
+    CONTAINS results are joined in range order (dataset order), the sorted YEAR_AND_GENRE and RUNTIME results of the
+    ranges are combined with a k-way merge that keeps ties in range order, so the output is the same as scanning all
+    the movies in one process.
+***                                                                                                                 ***
+
+author: Miguel Reyes
+date: 09/26/21
+"""
+import heapq
+import itertools
+import multiprocessing
+import operator
+import queries
+
+"""
+QUERY_TYPES:
+    query types whose scans are partitioned
+"""
+QUERY_TYPES = ("CONTAINS", "YEAR_AND_GENRE", "RUNTIME")
+
+"""
+worker_movies:
+    dictionary of Movie objects the ranges of a worker process are taken from
+"""
+worker_movies = None
+
+
+class Partition:
+    """A row range of the movies, filtered by the queries.filter_* functions like a dictionary of Movie objects."""
+
+    def __init__(self, start: int, end: int):
+        self.start = start
+        self.end = end
+
+    def values(self):
+        return itertools.islice(worker_movies.values(), self.start, self.end)
+
+    def values_of_types(self, title_types):
+        values_of_types = getattr(worker_movies, "values_of_types", None)
+        if values_of_types is None:  # e.g. a dict - skipping the rows before the range doesn't build anything
+            return self.values()
+        return values_of_types(title_types, self.start, self.end)
+
+
+def start_worker(movies) -> None:
+    """
+    Function run once by every worker process.
+
+    :param movies: dictionary of Movie objects - None when the worker process was forked and already has worker_movies
+    :return: None
+    """
+    global worker_movies
+    if movies is not None:
+        worker_movies = movies
+
+
+def scan_partition(query: tuple, start: int, end: int) -> list:
+    """
+    Function run by the worker processes - filters a row range of the movies.
+
+    :param query: tuple of the query values
+    :param start: first row of the range
+    :param end: row after the last row of the range
+    :return: list of tconsts in dataset order for CONTAINS, otherwise list of (sort key, tconst) sorted by sort key
+             (movies with the same sort key in dataset order)
+    """
+    query_type, title_type = query[0], query[1]
+    partition = Partition(start, end)
+    if query_type == "CONTAINS":
+        return [movie.tconst for movie in queries.filter_contains_only(title_type, query[2], partition)]
+    if query_type == "YEAR_AND_GENRE":
+        rows = [(movie.primary_title, movie.tconst)
+                for movie in queries.filter_year_and_genre_only(title_type, query[2], query[3], partition)]
+    else:
+        rows = [((-int(movie.runtime_minutes), movie.primary_title), movie.tconst)
+                for movie in queries.filter_runtime_only(title_type, query[2], query[3], partition)]
+    rows.sort(key=operator.itemgetter(0))
+    return rows
+
+
+class ScanPool:
+    """
+    Process pool running partitioned scans of the movies.
+
+    workers(int): number of worker processes (and of row ranges)
+    ranges(list): (start, end) row range of every partition
+    pool(Pool): the worker processes - every worker has the movies dictionary, forked workers share its pages
+    """
+
+    def __init__(self, movies: dict, workers: int):
+        self.workers = workers
+        self.ranges = list()
+        self.pool = None
+        self.reload(movies)
+
+    def reload(self, movies: dict) -> None:
+        """
+        Function to (re)start the worker processes with the current movies - after the movies changed.
+
+        :param movies: dictionary of Movie objects
+        :return: None
+        """
+        global worker_movies
+        self.close()
+        count = len(movies)
+        self.ranges = [(count * i // self.workers, count * (i + 1) // self.workers) for i in range(self.workers)]
+        if "fork" in multiprocessing.get_all_start_methods():  # the forked workers inherit worker_movies
+            worker_movies = movies
+            self.pool = multiprocessing.get_context("fork").Pool(self.workers, start_worker, (None,))
+            worker_movies = None  # the main process keeps no reference of its own
+        else:
+            self.pool = multiprocessing.Pool(self.workers, start_worker, (movies,))
+
+    def close(self) -> None:
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool = None
+
+    def __getstate__(self):
+        raise TypeError("a ScanPool can't be pickled")  # e.g. into a snapshot, it is started after loading
+
+    def scan(self, query: tuple) -> list:
+        """
+        :param query: tuple of the query values - CONTAINS, YEAR_AND_GENRE or RUNTIME
+        :return: list of the tconsts found by the query - in dataset order for CONTAINS, otherwise in output order
+        """
+        partials = self.pool.starmap(scan_partition, [(query, start, end) for start, end in self.ranges])
+        if query[0] == "CONTAINS":
+            return [tconst for partial in partials for tconst in partial]
+        return list(heapq.merge(*partials, key=operator.itemgetter(0)))  # ties come from the earlier range first
+
+
+def answers(query: tuple, movie_indexes) -> bool:
+    """
+    :param query: tuple of the query values
+    :param movie_indexes: Indexes object
+    :return: True if the query scans the movies and the Indexes object has a scan pool
+    """
+    if movie_indexes.scan_pool is None:
+        return False
+    query_type = query[0]
+    if query_type == "CONTAINS":
+        return movie_indexes.contains is None or len(query[2]) < 3  # short words can't use the trigram index
+    if query_type == "YEAR_AND_GENRE":
+        return movie_indexes.year_and_genre is None
+    if query_type == "RUNTIME":
+        return movie_indexes.runtime is None
+    return False
+
+
+def run_query(query: tuple, movies: dict, scan_pool: ScanPool, cache=None, out=None) -> None:
+    """
+    Function to answer a CONTAINS, YEAR_AND_GENRE or RUNTIME query with a partitioned scan - the movies found are
+    printed by the query function of queries.py, handed to it as a one key index (CONTAINS gets the movies found and
+    checks their titles again, it has no index to hand them in).
+
+    :param query: tuple of the query values
+    :param movies: dictionary of Movie objects
+    :param scan_pool: ScanPool object
+    :param cache: LineCache object of formatted movie lines
+    :param out: text file the query output is written to - sys.stdout when None
+    :return: None
+    """
+    query_type, title_type = query[0], query[1]
+    found = scan_pool.scan(query)
+    if query_type == "CONTAINS":
+        found_movies = {tconst: movies[tconst] for tconst in found}  # in dataset order
+        queries.contains(title_type, query[2], found_movies, None, cache, out)
+    elif query_type == "YEAR_AND_GENRE":
+        index = {(title_type, query[2], query[3]): [tconst for title, tconst in found]}
+        queries.year_and_genre(title_type, query[2], query[3], movies, index, cache, out)
+    elif query_type == "RUNTIME":
+        index = {title_type: ([key[0] for key, tconst in found], [tconst for key, tconst in found])}
+        queries.runtime(title_type, query[2], query[3], movies, index, cache, out)
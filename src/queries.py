@@ -6,17 +6,71 @@ experience reading in the data and using various structures and collections in P
 store, organize and efficiently query for different kinds of information relating to the movies
 and their ratings.
 
-***                                         ***
-    This module contains all query functions
-***                                         ***
+***                                                                                                                 ***
+    This module contains all query functions - every query has a generator (iter_lookup, iter_contains, ...) of
+    its result rows that takes a limit and an offset and stops evaluating as soon as the page is full, and a
+    function that prints the rows of the generator to the console. bulk_lookup answers the LOOKUP of a whole list of
+    tconsts at once.
+***                                                                                                                 ***
 
 author: Miguel Reyes
 date: 09/26/21
 """
+import heapq
+import itertools
 import operator
+import aggregate_cube
+import columnar
+import indexes
+import metrics
+import render
 
 
-def lookup(tconst: str, movies: dict, ratings: dict):
+def page(rows, limit: int = None, offset: int = 0):
+    """
+    :param rows: iterable of result rows
+    :param limit: maximum number of rows - every row when None
+    :param offset: number of rows skipped first
+    :return: iterator of the rows of the page - the rows after the page are never evaluated
+    """
+    return itertools.islice(rows, offset, None if limit is None else offset + limit)
+
+
+def page_end(limit: int, offset: int):
+    """
+    :return: number of rows a sorted query has to keep to fill the page - None when every row is needed
+    """
+    return None if limit is None else offset + limit
+
+
+def scan_movies(movies: dict, title_types):
+    """
+    :param movies: dictionary of Movie objects
+    :param title_types: collection of the title types a scan keeps
+    :return: iterable of the Movie objects a scan has to look at - only the ones of title_types when the dictionary
+             can select them without building the others (lazy_loader.LazyMovies, columnar.ColumnarMovies), every
+             movie otherwise
+    """
+    values_of_types = getattr(movies, "values_of_types", None)
+    if values_of_types is None:
+        return movies.values()
+    return values_of_types(title_types)
+
+
+def iter_lookup(tconst: str, movies: dict, ratings: dict, limit: int = None, offset: int = 0):
+    """
+    :param tconst: unique identifier - unique for every movie
+    :param movies: dictionary of Movie objects
+    :param ratings: dictionary of RatedMovie objects
+    :param limit: maximum number of rows - every row when None
+    :param offset: number of rows skipped first
+    :return: generator of the RatedMovie object of the movie (only movies with a rating are found)
+    """
+    metrics.count("lookup.rows_scanned")
+    yield from page((ratings[tconst],) if tconst in ratings else (), limit, offset)
+
+
+def lookup(tconst: str, movies: dict, ratings: dict, cache: render.LineCache = None, out=None):
     """
     LOOKUP Query:
     This function will look up a movie and its rating by using tconst(the movies unique identifier) and
@@ -36,21 +90,107 @@ def lookup(tconst: str, movies: dict, ratings: dict):
     :param tconst: unique identifier - unique for every movie
     :param movies: dictionary of Movie objects
     :param ratings: dictionary of Rating objects
+    :param cache: LineCache object of formatted movie lines - every line is formatted when None
+    :param out: text file the output is written to (with a single write) - sys.stdout when None
+    :return: None
+    """
+    output = list()
+    rating = next(iter_lookup(tconst, movies, ratings), None)  # only movies with a rating are found, we don't want ->
+    # to deal with movies that don't have ratings
+    lookup_lines(tconst, rating, output, cache)
+    with metrics.span("lookup.write"):
+        render.write_output(output, out)
+
+
+def lookup_lines(tconst: str, rating, output: list, cache: render.LineCache = None) -> None:
+    """
+    Function to add the output lines of a LOOKUP query to output.
+
+    :param tconst: unique identifier - unique for every movie
+    :param rating: RatedMovie object of the movie or None if it was not found
+    :param output: list of output lines
+    :param cache: LineCache object of formatted movie lines - every line is formatted when None
+    :return: None
+    """
+    if rating is not None:
+        output.append("\tMOVIE: " + render.movie_line(rating.movie, cache) + "\n")
+        output.append("\tRATING: Identifier: " + tconst + ", Rating: " + rating.avg_rating + ", Votes: " +
+                      rating.num_votes + "\n")
+        metrics.count("lookup.rows_emitted")
+    else:
+        output.append("\tMovie not found!\n\tRating not found!\n")
+
+
+def iter_bulk_lookup(tconsts: list, movies: dict, ratings: dict):
+    """
+    :param tconsts: list of unique identifiers
+    :param movies: dictionary of Movie objects
+    :param ratings: dictionary of RatedMovie objects
+    :return: generator of the RatedMovie object of every tconst (None if it was not found), in the order of tconsts -
+             a columnar store resolves all the tconsts with one sorted merge pass over its tconst keys
+    """
+    metrics.count("lookup.rows_scanned", len(tconsts))
+    if isinstance(ratings, columnar.ColumnarRatings):
+        store = ratings.store
+        for row in store.find_rows(tconsts):
+            yield None if row is None or not store.rated[row] else store.rating(row)
+    else:
+        yield from map(ratings.get, tconsts)
+
+
+def bulk_lookup(tconsts: list, movies: dict, ratings: dict, cache: render.LineCache = None, out=None):
+    """
+    Bulk LOOKUP:
+    Looks up every tconst of a list at once and prints the same lines as a LOOKUP query line for each of them,
+    without their elapsed time:
+    processing: LOOKUP {tconst}
+        MOVIE: Identifier: {tconst}, Title: {primaryTitle}, Type: {titleType}, Year: {startYear}, Runtime: {runTime},
+        Genres: {genres}
+        RATING: Identifier: {tconst}, Rating: {rating}, Votes: {numVotes}
+    processing: LOOKUP {tconst}
+        ...
+
+    :param tconsts: list of unique identifiers
+    :param movies: dictionary of Movie objects
+    :param ratings: dictionary of Rating objects
+    :param cache: LineCache object of formatted movie lines - every line is formatted when None
+    :param out: text file the output is written to (with a single write) - sys.stdout when None
     :return: None
     """
-    if tconst in ratings:  # only want the tconst(key) in the ratings dictionary because we don't want to deal with ->
-        # movies that don't have ratings
-        print("\tMOVIE: Identifier: " + tconst + ", Title: " + movies[
-            tconst].primary_title + ", Type: " + movies[tconst].title_type + ", Year: " + movies[tconst].start_year
-              + ", Runtime: " + movies[tconst].runtime_minutes + ", Genres: "
-              + movies[tconst].genres.replace(",", ", "))
-        print("\tRATING: Identifier: " + tconst + ", Rating: " + ratings[tconst].avg_rating + ", Votes: " +
-              ratings[tconst].num_votes)
+    output = list()
+    with metrics.span("lookup.bulk"):
+        for tconst, rating in zip(tconsts, iter_bulk_lookup(tconsts, movies, ratings)):
+            output.append("processing: LOOKUP " + tconst + "\n")
+            lookup_lines(tconst, rating, output, cache)
+    with metrics.span("lookup.write"):
+        render.write_output(output, out)
+
+
+def iter_contains(title_type: str, words: str, movies: dict, index: dict = None, limit: int = None, offset: int = 0):
+    """
+    :param title_type: type of movie - examples are short, movies, tv episode or tv series
+    :param words: string of words that may be substrings of movie objects primary_title field variable
+    :param movies: dictionary of Movie objects
+    :param index: CONTAINS index from indexes.build_contains_index - scans the movies when None
+    :param limit: maximum number of rows - every row when None
+    :param offset: number of rows skipped first
+    :return: generator of the Movie objects found, in dataset order - the scan stops once the page is full
+    """
+    if index is not None:
+        with metrics.span("contains.candidates"):
+            candidate_tconsts = indexes.contains_candidates(index, title_type, words)  # in dataset order
+        candidates = (movies[tconst] for tconst in candidate_tconsts)
+        metrics.count("contains.rows_scanned", len(candidate_tconsts))
     else:
-        print("\tMovie not found!\n\tRating not found!")
+        candidates = scan_movies(movies, (title_type,))
+        metrics.count("contains.rows_scanned", len(movies))
 
+    # Conditions to check title_type match and words is a substring of the movie objects primary_title
+    yield from page((movie for movie in candidates if title_type == movie.title_type and words in movie.primary_title),
+                    limit, offset)
 
-def contains(title_type: str, words: str, movies: dict):
+
+def contains(title_type: str, words: str, movies: dict, index: dict = None, cache: render.LineCache = None, out=None):
     """
     CONTAINS Query:
     When looking up movies of a certain title type, whose primary title contains the sequence
@@ -70,21 +210,43 @@ def contains(title_type: str, words: str, movies: dict):
     :param title_type: type of movie - examples are short, movies, tv episode or tv series
     :param words: string of words that may be substrings of movie objects primary_title field variable
     :param movies: dictionary of Movie objects
+    :param index: CONTAINS index from indexes.build_contains_index - scans the movies when None
+    :param cache: LineCache object of formatted movie lines - every line is formatted when None
+    :param out: text file the output is written to (with a single write) - sys.stdout when None
     :return: None
     """
+    output = list()
     counter = 0  # this will keep track of all the movies that do not meet the conditions below - if conditions met ->
     # increment counter otherwise it stays at 0 and will print "No match found!"
-    for movie in movies.values():  # iterating through movies values
-        if title_type == movie.title_type and words in movie.primary_title:  # Conditions to check title_type match ->
-            # and words is a substring of the movie objects primary_title
-            print("\tIdentifier: " + movie.tconst + ", Title: " + movie.primary_title +
-                  ", Type: " + movie.title_type + ", Year: " + movie.start_year + ", Runtime: " +
-                  movie.runtime_minutes + ", Genres: " + movie.genres.replace(",", ", "))
+    with metrics.span("contains.scan"):
+        for movie in iter_contains(title_type, words, movies, index):
+            output.append("\t" + render.movie_line(movie, cache) + "\n")
             counter += 1
-        else:
-            continue
+    metrics.count("contains.rows_emitted", counter)
     if counter == 0:
-        print("\tNo match found!")
+        output.append("\tNo match found!\n")
+    with metrics.span("contains.write"):
+        render.write_output(output, out)
+
+
+def filter_contains_only(title_type: str, words: str, movies: dict) -> list:
+    """
+    This function will take in the movies dictionary, iterate through its values(movie objects) and filter out the
+    movie objects that do not pass the following conditions - Movies of a certain title type whose primary title
+    contains words. The movies that do pass the conditions are stored into a list (in dataset order) and that list is
+    returned.
+
+    :param title_type: type of movie - examples are short, movies, tv episode or tv series
+    :param words: string of words that may be substrings of movie objects primary_title field variable
+    :param movies: dictionary of Movie objects
+    :return: list of Movie objects
+    """
+    new_list = list()
+    for movie in scan_movies(movies, (title_type,)):
+        if title_type == movie.title_type and words in movie.primary_title:
+            new_list.append(movie)
+
+    return new_list
 
 
 def filter_year_and_genre_only(title_type: str, year: str, genre: str, movies: dict) -> list:
@@ -103,14 +265,50 @@ def filter_year_and_genre_only(title_type: str, year: str, genre: str, movies: d
     :return: list of Movie objects
     """
     new_list = list()
-    for movie in movies.values():
-        if title_type == movie.title_type and year == movie.start_year and genre in movie.genres:
+    for movie in scan_movies(movies, (title_type,)):
+        if title_type == movie.title_type and year == movie.start_year and genre in movie.genres.split(","):  # --->
+            # genre must be one of the comma separated genres, not just a substring (Music vs Musical)
             new_list.append(movie)
 
     return new_list
 
 
-def year_and_genre(title_type: str, year: str, genre: str, movies: dict):
+def iter_year_and_genre(title_type: str, year: str, genre: str, movies: dict, index: dict = None, limit: int = None,
+                        offset: int = 0):
+    """
+    :param title_type: type of movie - examples are short, movies, tv episode or tv series
+    :param year: start_year of movie object
+    :param genre: genre of movie object
+    :param movies: dictionary of Movie objects
+    :param index: YEAR_AND_GENRE index from indexes.build_year_and_genre_index - scans the movies when None
+    :param limit: maximum number of rows - every row when None
+    :param offset: number of rows skipped first
+    :return: generator of the Movie objects found sorted by ascending primary_title - a scan only sorts the movies
+             of the page and the ones before it
+    """
+    if index is not None:
+        tconsts = index.get((title_type, year, genre), ())  # already sorted by primary_title
+        metrics.count("year_and_genre.rows_scanned", len(tconsts))
+        final_movies = (movies[tconst] for tconst in tconsts)
+    else:
+        with metrics.span("year_and_genre.filter"):
+            final_movies = filter_year_and_genre_only(title_type, year, genre, movies)  # list of movies from --->
+            # filter_year_and_genre_only function
+        metrics.count("year_and_genre.rows_scanned", len(movies))
+
+        with metrics.span("year_and_genre.sort"):
+            if page_end(limit, offset) is None:
+                final_movies.sort(key=operator.attrgetter("primary_title"))  # Sort final_movies by ascending ---->
+                # primary_title
+            else:  # only the first page_end movies are needed, nsmallest keeps ties in order like the sort
+                final_movies = heapq.nsmallest(page_end(limit, offset), final_movies,
+                                               key=operator.attrgetter("primary_title"))
+
+    yield from page(final_movies, limit, offset)
+
+
+def year_and_genre(title_type: str, year: str, genre: str, movies: dict, index: dict = None,
+                   cache: render.LineCache = None, out=None):
     """
     YEAR_AND_GENRE Query:
     When looking up movies of a certain title type, whose start year and genre matches, there are
@@ -131,23 +329,23 @@ def year_and_genre(title_type: str, year: str, genre: str, movies: dict):
     :param year: start_year of movie object
     :param genre: genre of movie object
     :param movies: dictionary of Movie objects
+    :param index: YEAR_AND_GENRE index from indexes.build_year_and_genre_index - scans the movies when None
+    :param cache: LineCache object of formatted movie lines - every line is formatted when None
+    :param out: text file the output is written to (with a single write) - sys.stdout when None
     :return: None
     """
-    final_movies = filter_year_and_genre_only(title_type, year, genre, movies)  # list of movies from ----------->
-    # filter_year_and_genre_only function
-
-    final_movies.sort(key=operator.attrgetter("primary_title"))  # Sort final_movies by ascending primary_title
-
+    output = list()
     counter = 0  # this will keep track of all the movies that do not meet the conditions below - if conditions met ->
     # increment counter otherwise it stays at 0 and will print "No match found!"
 
-    for movie in final_movies:
-        print("\tIdentifier: " + movie.tconst + ", Title: " + movie.primary_title +
-              ", Type: " + movie.title_type + ", Year: " + movie.start_year + ", Runtime: " +
-              movie.runtime_minutes + ", Genres: " + movie.genres.replace(",", ", "))
+    for movie in iter_year_and_genre(title_type, year, genre, movies, index):
+        output.append("\t" + render.movie_line(movie, cache) + "\n")
         counter += 1
+    metrics.count("year_and_genre.rows_emitted", counter)
     if counter == 0:
-        print("\tNo match found!")
+        output.append("\tNo match found!\n")
+    with metrics.span("year_and_genre.write"):
+        render.write_output(output, out)
 
 
 def filter_runtime_only(title_type: str, min_mins: str, max_mins: str, movies: dict) -> list:
@@ -167,14 +365,56 @@ def filter_runtime_only(title_type: str, min_mins: str, max_mins: str, movies: d
     :return: list of Movie objects
     """
     new_list = list()
-    for movie in movies.values():
-        if title_type == movie.title_type and int(min_mins) <= int(movie.runtime_minutes) <= int(max_mins):
+    min_mins = int(min_mins)
+    max_mins = int(max_mins)
+    for movie in scan_movies(movies, (title_type,)):
+        if title_type == movie.title_type and min_mins <= int(movie.runtime_minutes) <= max_mins:
             new_list.append(movie)
 
     return new_list
 
 
-def runtime(title_type: str, min_mins: str, max_mins: str, movies: dict):
+def iter_runtime(title_type: str, min_mins: str, max_mins: str, movies: dict, index: dict = None, limit: int = None,
+                 offset: int = 0):
+    """
+    :param title_type: type of movie - examples are short, movies, tv episode or tv series
+    :param min_mins: minimum minutes passed in as string but evaluated as an int in the condition
+    :param max_mins: maximum minutes passed in as string but evaluated as an int in the condition
+    :param movies: dictionary of Movie objects
+    :param index: RUNTIME index from indexes.build_runtime_index - scans the movies when None
+    :param limit: maximum number of rows - every row when None
+    :param offset: number of rows skipped first
+    :return: generator of the Movie objects found sorted by descending runtime, then ascending primary_title - a scan
+             only sorts the movies of the page and the ones before it
+    """
+    if index is not None:
+        with metrics.span("runtime.filter"):
+            tconsts = indexes.runtime_range(index, title_type, int(min_mins), int(max_mins))  # already sorted
+        metrics.count("runtime.rows_scanned", len(tconsts))
+        final_movies = (movies[tconst] for tconst in tconsts)
+    else:
+        with metrics.span("runtime.filter"):
+            final_movies = filter_runtime_only(title_type, min_mins, max_mins, movies)  # list of movies from --->
+            # filter_runtime_only function
+        metrics.count("runtime.rows_scanned", len(movies))
+
+        # Must sort things in the opposite order you intend - so if you want to sort by runtime then primary title ->
+        # must call sorts in the reverse order such as primary title then runtime.
+        with metrics.span("runtime.sort"):
+            if page_end(limit, offset) is None:
+                final_movies.sort(key=operator.attrgetter("primary_title"))  # Sort final_movies by ascending ---->
+                # primary_title
+                final_movies.sort(key=lambda movie: int(movie.runtime_minutes), reverse=True)  # Sort ----------->
+                # final_movies by descending runtime_minutes (as an int, "99" must come after "100")
+            else:  # only the first page_end movies are needed, nsmallest keeps ties in order like the sorts
+                final_movies = heapq.nsmallest(page_end(limit, offset), final_movies,
+                                               key=lambda movie: (-int(movie.runtime_minutes), movie.primary_title))
+
+    yield from page(final_movies, limit, offset)
+
+
+def runtime(title_type: str, min_mins: str, max_mins: str, movies: dict, index: dict = None,
+            cache: render.LineCache = None, out=None):
     """
     RUNTIME Query:
     When looking up movies of a certain title type, whose runtime is between the start and end
@@ -195,52 +435,97 @@ def runtime(title_type: str, min_mins: str, max_mins: str, movies: dict):
     :param min_mins: minimum minutes passed in as string but evaluated as an int in the condition
     :param max_mins: maximum minutes passed in as string but evaluated as an int in the condition
     :param movies: dictionary of Movie objects
+    :param index: RUNTIME index from indexes.build_runtime_index - scans the movies when None
+    :param cache: LineCache object of formatted movie lines - every line is formatted when None
+    :param out: text file the output is written to (with a single write) - sys.stdout when None
     :return: None
     """
-    final_movies = filter_runtime_only(title_type, min_mins, max_mins, movies)  # list of movies from ----------->
-    # filter_runtime_only function
-
-    # Must sort things in the opposite order you intend - so if you want to sort by runtime then primary title must ->
-    # call sorts in the reverse order such as primary title then runtime.
-    final_movies.sort(key=operator.attrgetter("primary_title"))  # Sort final_movies by ascending primary_title
-    final_movies.sort(key=operator.attrgetter("runtime_minutes"), reverse=True)  # Sort final_movies by descending --->
-    # runtime_minutes
-
+    output = list()
     counter = 0  # this will keep track of all the movies that do not meet the conditions below - if conditions met ->
     # increment counter otherwise it stays at 0 and will print "No match found!"
 
-    for movie in final_movies:
-        print("\tIdentifier: " + movie.tconst + ", Title: " + movie.primary_title +
-              ", Type: " + movie.title_type + ", Year: " + movie.start_year + ", Runtime: " +
-              movie.runtime_minutes + ", Genres: " + movie.genres.replace(",", ", "))
+    for movie in iter_runtime(title_type, min_mins, max_mins, movies, index):
+        output.append("\t" + render.movie_line(movie, cache) + "\n")
         counter += 1
+    metrics.count("runtime.rows_emitted", counter)
     if counter == 0:
-        print("\tNo match found!")
+        output.append("\tNo match found!\n")
+    with metrics.span("runtime.write"):
+        render.write_output(output, out)
 
 
-def filter_most_votes_only(title_type: str, movies: dict, ratings: dict) -> list:
+def filter_most_votes_only(title_type: str, ratings: dict) -> list:
     """
-    This function will take in the movies and ratings dictionary, iterate through the ratings values(rating objects)
-    and filter out the movie objects that do not pass the following conditions - movies of a certain title type,
-    and the key from the ratings dictionary must be a key in the movies dictionary. If conditions are met the movie
-    objects along with the ratings num_votes field variable is stored as a tuple pair in a list.
+    This function will take in the ratings dictionary, iterate through the ratings values(rating objects) and filter out
+    the movie objects that do not pass the following conditions - movies of a certain title type. Ratings are already
+    joined with their movie and have their numbers parsed (see movies_and_ratings.RatedMovie), so there is no movies
+    lookup or int conversion per rating. If conditions are met the rating objects are stored in a list.
 
     The purpose of this function is to return a much smaller collection so when sorting is done in the most_votes
     function it is done much more efficiently because sorting a much smaller collection decreases run time.
 
     :param title_type: type of movie - examples are short, movies, tv episode or tv series
-    :param movies: dictionary of Movie objects
-    :param ratings: dictionary of Rating objects
-    :return: list of tuple pairs(Movie object, Rating.num_votes)
+    :param ratings: dictionary of RatedMovie objects
+    :return: list of RatedMovie objects
     """
     new_list = list()
-    for key in ratings:
-        if key in movies.keys() and title_type == movies.get(key).title_type:
-            new_list.append((movies.get(key), int(ratings.get(key).num_votes)))
+    for rating in ratings.values():
+        if title_type == rating.movie.title_type:
+            new_list.append(rating)
     return new_list
 
 
-def most_votes(title_type: str, top_num: str, movies: dict, ratings: dict):
+def top_count(top_num: str):
+    """
+    :param top_num: maximum number of movies of a MOST_VOTES query (or of every year of a TOP query)
+    :return: number of movies kept - None (every movie) when top_num is negative, the display loop of the original
+             queries only stopped once it had printed exactly top_num movies
+    """
+    count = int(top_num)
+    return None if count < 0 else count
+
+
+def iter_most_votes(title_type: str, top_num: str, movies: dict, ratings: dict, index: dict = None, limit: int = None,
+                    offset: int = 0):
+    """
+    :param title_type: type of movie - examples are short, movies, tv episode or tv series
+    :param top_num: maximum number of movies found
+    :param movies: dictionary of Movie objects
+    :param ratings: dictionary of RatedMovie objects
+    :param index: MOST_VOTES index from indexes.build_most_votes_index - selects from all the ratings when None
+    :param limit: maximum number of rows - every row when None
+    :param offset: number of rows skipped first
+    :return: generator of the RatedMovie objects of the top_num movies with the most votes sorted by descending
+             num_votes, then ascending primary_title - only the movies of the page and the ones before it are selected
+    """
+    count = top_count(top_num)
+    if page_end(limit, offset) is not None:
+        count = page_end(limit, offset) if count is None else min(count, page_end(limit, offset))
+    if index is not None:
+        with metrics.span("most_votes.filter"):
+            final_movies = [ratings[tconst] for tconst in index.get(title_type, ())[:count]]  # already sorted, ---->
+            # only the first count
+        metrics.count("most_votes.rows_scanned", len(final_movies))
+    else:
+        with metrics.span("most_votes.filter"):
+            final_movies = filter_most_votes_only(title_type, ratings)  # list of ratings from ----------------->
+            # filter_most_votes_only function
+        metrics.count("most_votes.rows_scanned", len(ratings))
+
+        # Only the first count movies are displayed so instead of sorting every movie we keep the count best ones
+        # in a heap - sorted by descending num_votes then ascending primary_title (ties keep their order), a
+        # negative top_num displays every movie so they are all sorted
+        with metrics.span("most_votes.sort"):
+            if count is None:
+                final_movies.sort(key=lambda x: (-x.votes, x.movie.primary_title))
+            else:
+                final_movies = heapq.nsmallest(count, final_movies, key=lambda x: (-x.votes, x.movie.primary_title))
+
+    yield from page(final_movies, limit, offset)
+
+
+def most_votes(title_type: str, top_num: str, movies: dict, ratings: dict, index: dict = None,
+               cache: render.LineCache = None, out=None):
     """
     MOST_VOTES Query:
     When looking up the top number of movies of a certain title type, there are two possible
@@ -261,47 +546,36 @@ def most_votes(title_type: str, top_num: str, movies: dict, ratings: dict):
     :param top_num: maximum number of output to the console - depends on the sorting done to the final_movies list
     :param movies: dictionary of Movie objects
     :param ratings: dictionary of Rating objects
+    :param index: MOST_VOTES index from indexes.build_most_votes_index - selects from all the ratings when None
+    :param cache: LineCache object of formatted movie lines - every line is formatted when None
+    :param out: text file the output is written to (with a single write) - sys.stdout when None
     :return: None
     """
-    final_movies = filter_most_votes_only(title_type, movies, ratings)  # list of movies from ----------->
-    # filter_most_votes_only function
-
-    # Must sort things in the opposite order you intend - so if you want to sort by runtime then primary title must ->
-    # call sorts in the reverse order such as primary title then runtime.
-    final_movies.sort(key=lambda x: x[0].primary_title)  # Sort final_movies by tuples first element in ascending ->
-    # primary_title
-    final_movies.sort(key=lambda x: x[1], reverse=True)  # Sort final_movies by tuples 2nd element in descending ->
-    # num_votes
-
+    output = list()
     counter = 0  # this will keep track of all the movies that do not meet the conditions below - if conditions met ->
     # increment counter otherwise it stays at 0 and will print "No match found!"
 
-    num = 0  # Keeps track of how many times we send output to the console, once num is equal to top_num then ----->
-    # we break out of the loop
-
     i = 1  # Used for displaying what output number we are at i <= top_num
 
-    for movie in final_movies:
-        if num == int(top_num):
-            break
-        else:
-            print("\t" + str(i) + ". VOTES: " + str(movie[1]) + ", MOVIE: Identifier: " + movie[0].tconst + ", Title: "
-                  + movie[0].primary_title + ", Type: " + movie[0].title_type + ", Year: " + movie[0].start_year
-                  + ", Runtime: " + movie[0].runtime_minutes + ", Genres: " + movie[0].genres.replace(",", ", "))
-            counter += 1
-            num += 1
-            i += 1
+    for rating in iter_most_votes(title_type, top_num, movies, ratings, index):
+        output.append("\t" + str(i) + ". VOTES: " + str(rating.votes) + ", MOVIE: " +
+                      render.movie_line(rating.movie, cache) + "\n")
+        counter += 1
+        i += 1
+    metrics.count("most_votes.rows_emitted", counter)
     if counter == 0:
-        print("\tNo match found!")
+        output.append("\tNo match found!\n")
+    with metrics.span("most_votes.write"):
+        render.write_output(output, out)
 
 
-def filter_top_only(title_type: str, start_year: str, end_year: str, movies: dict, ratings: dict):
+def filter_top_only(title_type: str, start_year: str, end_year: str, ratings: dict):
     """
-    This function will take in the movies and ratings dictionary, iterate through the ratings values(rating objects)
-    and filter out the movie objects that do not pass the following conditions - movies of a certain title type, the key
-    from the ratings dictionary must be a key in the movies dictionary, the start_year must be between start and year
-    parameters, and rating object must have over 1000 votes. If conditions are met the movie and rating objects are
-    stored as a tuple pair in a list.
+    This function will take in the ratings dictionary, iterate through the ratings values(rating objects) and filter out
+    the movie objects that do not pass the following conditions - movies of a certain title type, the start_year must be
+    between start and year parameters, and rating object must have over 1000 votes. Ratings are already joined with
+    their movie and have their numbers parsed (see movies_and_ratings.RatedMovie). If conditions are met the rating
+    objects are stored in a list.
 
     The purpose of this function is to return a much smaller collection so when sorting is done in the top function it
     is done much more efficiently because sorting a much smaller collection decreases run time.
@@ -309,21 +583,63 @@ def filter_top_only(title_type: str, start_year: str, end_year: str, movies: dic
     :param title_type: type of movie - examples are short, movies, tv episode or tv series
     :param start_year: start of range - evaluated as an int
     :param end_year: end of range - evaluated as an int
-    :param movies: dictionary of Movie objects
-    :param ratings: dictionary of Rating objects
-    :return: list of tuple pairs(Movie object, Rating object)
+    :param ratings: dictionary of RatedMovie objects
+    :return: list of RatedMovie objects
     """
     new_list = list()
-    for key in ratings:
-        if key in movies.keys() and title_type == movies.get(key).title_type and \
-                int(ratings.get(key).num_votes) >= 1000 \
-                and int(start_year) <= int(movies.get(key).start_year) <= int(end_year):
-            new_list.append((movies.get(key), ratings.get(key)))
+    start_year = int(start_year)
+    end_year = int(end_year)
+    for rating in ratings.values():
+        if rating.votes >= 1000 and start_year <= rating.year <= end_year and title_type == rating.movie.title_type:
+            new_list.append(rating)
 
     return new_list
 
 
-def top(title_type: str, top_num: str, start_year: str, end_year: str, movies: dict, ratings: dict):
+def iter_top(title_type: str, top_num: str, start_year: str, end_year: str, movies: dict, ratings: dict,
+             index: dict = None, limit: int = None, offset: int = 0):
+    """
+    :param title_type: type of movie - examples are short, movies, tv episode or tv series
+    :param top_num: maximum number of movies found for each year
+    :param start_year: start of range - evaluated as an int
+    :param end_year: end of range - evaluated as an int
+    :param movies: dictionary of Movie objects
+    :param ratings: dictionary of RatedMovie objects
+    :param index: TOP index from indexes.build_top_index - filters all the ratings when None
+    :param limit: maximum number of rows - every row when None
+    :param offset: number of rows skipped first
+    :return: generator of the RatedMovie objects of the top_num movies of every year (RatedMovie.year) in increasing
+             order of year, sorted by descending avg_rating, descending num_votes, then ascending primary_title within
+             a year - with the index the years after the page are never looked up
+    """
+    count = top_count(top_num)
+    if index is None:
+        with metrics.span("top.filter"):
+            final_movies = filter_top_only(title_type, start_year, end_year, ratings)  # list of ratings from ---->
+            # filter_top_only function
+        metrics.count("top.rows_scanned", len(ratings))
+
+        with metrics.span("top.sort"):
+            final_movies.sort(key=lambda x: (-x.average, -x.votes, x.movie.primary_title))  # Sort final_movies --->
+            # by descending average, then descending votes, then ascending primary_title in a single stable sort
+
+        years = dict()  # start_year -> sorted movies of that year, one pass instead of one pass per year in the range
+        for rating in final_movies:
+            years.setdefault(rating.year, list()).append(rating)
+
+    def year_movies(year: int):
+        if index is None:
+            return years.get(year, ())[:count]
+        tconsts = index.get((title_type, year), ())[:count]  # already sorted
+        metrics.count("top.rows_scanned", len(tconsts))
+        return (ratings[tconst] for tconst in tconsts)
+
+    yield from page((rating for year in range(int(start_year), int(end_year) + 1) for rating in year_movies(year)),
+                    limit, offset)
+
+
+def top(title_type: str, top_num: str, start_year: str, end_year: str, movies: dict, ratings: dict,
+        index: dict = None, cache: render.LineCache = None, out=None):
     """
     TOP Query:
     When looking up the top number of movies of a certain title type for each year in a range
@@ -352,47 +668,126 @@ def top(title_type: str, top_num: str, start_year: str, end_year: str, movies: d
     :param end_year: end_year: end of range - evaluated as an int
     :param movies: movies: dictionary of Movie objects
     :param ratings: ratings: dictionary of Rating objects
+    :param index: TOP index from indexes.build_top_index - filters all the ratings when None
+    :param cache: LineCache object of formatted movie lines - every line is formatted when None
+    :param out: text file the output is written to (with a single write) - sys.stdout when None
     :return: None
     """
-    final_movies = filter_top_only(title_type, start_year, end_year, movies, ratings)  # list of movies from --------->
-    # filter_most_votes_only function
+    output = list()
+    rows = iter_top(title_type, top_num, start_year, end_year, movies, ratings, index)  # in year order
+    rating = next(rows, None)
+    for year in range(int(start_year), (int(end_year) + 1)):
+        output.append("\tYEAR: " + str(year) + "\n")
 
-    # Must sort things in the opposite order you intend - so if you want to sort by runtime then primary title must ->
-    # call sorts in the reverse order such as primary title then runtime.
-    final_movies.sort(key=lambda x: x[0].primary_title)  # Sort final_movies by tuples first element in ascending ->
-    # primary_title
-    final_movies.sort(key=lambda x: int(x[1].num_votes), reverse=True)  # Sort final_movies by tuples 2nd element in ->
-    # descending num_votes
-    final_movies.sort(key=lambda x: float(x[1].avg_rating), reverse=True)  # Sort final_movies by tuples 2nd element ->
-    # in descending avg_rating
+        i = 1  # Used for displaying what output number we are at i <= top_num
 
-    num = 0  # Keeps track of how many times we send output to the console, once num is equal to top_num then ---->
-    # we break out of the loop
+        while rating is not None and rating.year == year:
+            output.append("\t\t" + str(i) + ". RATING: " + rating.avg_rating + ", VOTES: " + rating.num_votes +
+                          ", MOVIE: " + render.movie_line(rating.movie, cache) + "\n")
+            i += 1
+            rating = next(rows, None)
+        metrics.count("top.rows_emitted", i - 1)
+        if i == 1:
+            output.append("\t\tNo match found!\n")
+    with metrics.span("top.write"):
+        render.write_output(output, out)
 
-    j = 0  # Used to increment start_year_int up until it is equal to end year - covers range from start_year - end_year
 
-    i = 1  # Used for displaying what output number we are at i <= top_num
+def iter_stats(title_type: str, start_year: str, end_year: str, genre: str, movies: dict, ratings: dict,
+               index: dict = None, limit: int = None, offset: int = 0):
+    """
+    :param title_type: type of movie - examples are short, movies, tv episode or tv series
+    :param start_year: start of range - evaluated as an int
+    :param end_year: end of range - evaluated as an int
+    :param genre: genre of the movies - aggregate_cube.ALL_GENRES for every genre
+    :param movies: dictionary of Movie objects
+    :param ratings: dictionary of RatedMovie objects
+    :param index: aggregate cube from aggregate_cube.build_cube - the movies are scanned and aggregated when None
+    :param limit: maximum number of rows - every row when None
+    :param offset: number of rows skipped first
+    :return: generator of (year, Aggregate object) of every year from start_year to end_year that has movies, in
+             increasing order of year
+    """
+    start_year = int(start_year)
+    end_year = int(end_year)
+    key = aggregate_cube.genre_key(genre)
+    if index is None:
+        index = dict()  # the cells of the query, aggregated from the movies it keeps
+        with metrics.span("stats.filter"):
+            for movie in scan_movies(movies, (title_type,)):
+                if title_type == movie.title_type and start_year <= int(movie.start_year) <= end_year and \
+                        (key is None or key in movie.genres.split(",")):
+                    cell_key = (title_type, int(movie.start_year), key)
+                    cell = index.get(cell_key)
+                    if cell is None:
+                        cell = index[cell_key] = aggregate_cube.Aggregate()
+                    cell.add(int(movie.runtime_minutes), ratings.get(movie.tconst))
+        metrics.count("stats.rows_scanned", len(movies))
+
+    def year_cells():
+        for year in range(start_year, end_year + 1):
+            cell = index.get((title_type, year, key))
+            if cell is not None:
+                yield year, cell
+
+    yield from page(year_cells(), limit, offset)
+
+
+def stats_line(aggregate: aggregate_cube.Aggregate) -> str:
+    """
+    :param aggregate: Aggregate object
+    :return: MOVIES: {###}, RATED: {###}, AVERAGE RATING: {#.##}, VOTES: {###}, RUNTIME P25: {###}, P50: {###}, ...
+    """
+    average = aggregate.average_rating()
+    line = "MOVIES: " + str(aggregate.movies) + ", RATED: " + str(aggregate.rated) + ", AVERAGE RATING: " + \
+           ("N/A" if average is None else format(average, ".2f")) + ", VOTES: " + str(aggregate.votes) + ", RUNTIME "
+    percentiles = list()
+    for percent, runtime in zip(aggregate_cube.PERCENTILES, aggregate.percentiles()):
+        percentiles.append("P" + str(percent) + ": " + ("N/A" if runtime is None else str(runtime)))
+    return line + ", ".join(percentiles)
+
+
+def stats(title_type: str, start_year: str, end_year: str, genre: str, movies: dict, ratings: dict,
+          index: dict = None, cache: render.LineCache = None, out=None):
+    """
+    STATS Query:
+    When looking up the statistics of the movies of a certain title type and genre (ALL for every genre) for each year
+    in a range of years, there are two possible outcomes. In the event one or more movies are found, a line is
+    displayed for every year that has movies in increasing order by year, followed by the roll-up of the whole range.
+    The average rating and total votes are those of the rated movies, the runtime percentiles (nearest rank) those of
+    the movies with a runtime.
+    processing: STATS {titleType} {startYear} {endYear} {genre}
+        YEAR: {####}, MOVIES: {###}, RATED: {###}, AVERAGE RATING: {#.##}, VOTES: {###}, RUNTIME P25: {###},
+        P50: {###}, P75: {###}, P90: {###}
+        ...
+        YEARS: {startYear}-{endYear}, MOVIES: {###}, RATED: {###}, AVERAGE RATING: {#.##}, VOTES: {###}, ...
+    elapsed time (s): {###}
+
+    If there are no movies that match the output should be:
+    processing: STATS {titleType} {startYear} {endYear} {genre}
+        No match found!
+    elapsed time (s): {###}
 
-    for y in range(int(start_year), (int(end_year) + 1)):
-        counter = 0
-        start_year_int = int(start_year) + j
-        print("\tYEAR: " + str(start_year_int))
-        for movie in final_movies:
-            if int(movie[0].start_year) == start_year_int:
-                if num == int(top_num):
-                    continue
-                else:
-                    print("\t\t" + str(i) + ". RATING: " + movie[1].avg_rating + ", VOTES: " + movie[1].num_votes +
-                          ", MOVIE: Identifier: " + movie[0].tconst + ", Title: "
-                          + movie[0].primary_title + ", Type: " + movie[0].title_type + ", Year: " + movie[0].start_year
-                          + ", Runtime: " + movie[0].runtime_minutes + ", Genres: " + movie[0].genres.replace(",",
-                                                                                                              ", "))
-                    num += 1
-                    i += 1
-                    counter += 1
-        j += 1
-        num = 0  # set num equal to zero again for every year within the range of start_year and end_year to print
-        # max amount of output
-        i = 1
-        if counter == 0:
-            print("\t\tNo match found!")
+    :param title_type: type of movie - examples are short, movies, tv episode or tv series
+    :param start_year: start of range - evaluated as an int
+    :param end_year: end of range - evaluated as an int
+    :param genre: genre of the movies - aggregate_cube.ALL_GENRES for every genre
+    :param movies: dictionary of Movie objects
+    :param ratings: dictionary of Rating objects
+    :param index: aggregate cube from aggregate_cube.build_cube - the movies are scanned and aggregated when None
+    :param cache: not used - STATS displays no movie lines
+    :param out: text file the output is written to (with a single write) - sys.stdout when None
+    :return: None
+    """
+    output = list()
+    rows = list(iter_stats(title_type, start_year, end_year, genre, movies, ratings, index))
+    for year, cell in rows:
+        output.append("\tYEAR: " + str(year) + ", " + stats_line(cell) + "\n")
+    metrics.count("stats.rows_emitted", len(rows))
+    if len(rows) == 0:
+        output.append("\tNo match found!\n")
+    else:
+        output.append("\tYEARS: " + str(int(start_year)) + "-" + str(int(end_year)) + ", " +
+                      stats_line(aggregate_cube.rollup(rows)) + "\n")
+    with metrics.span("stats.write"):
+        render.write_output(output, out)
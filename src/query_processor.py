@@ -0,0 +1,191 @@
+"""
+CSAPX Project 1: Movie
+
+In this project we worked with datasets from the IMDB website. We got
+experience reading in the data and using various structures and collections in Python to
+store, organize and efficiently query for different kinds of information relating to the movies
+and their ratings.
+
+***                                                                                                                 ***
+    This module contains the functions that turn a query line into a call of the matching query function and
+    print its "processing:" and "elapsed time (s):" lines.
+***                                                                                                                 ***
+
+author: Miguel Reyes
+date: 09/26/21
+"""
+import io
+import sys
+import metrics
+import numpy_backend
+import partitioned_scan
+import queries
+import result_cache
+import sqlite_store
+from timeit import default_timer as timer
+
+"""
+ARGUMENTS:
+    query type -> number of values of the query line (including the query type) shown in its "processing:" line,
+    CONTAINS shows all of its words (and needs a title type and at least one word)
+"""
+ARGUMENTS = {"LOOKUP": 2, "CONTAINS": None, "YEAR_AND_GENRE": 4, "RUNTIME": 4, "MOST_VOTES": 3, "TOP": 5,
+             "STATS": 5}
+
+
+def parse_query(line: str) -> tuple:
+    """
+    Function to split a query line into its values - the CONTAINS words are joined back into a single value.
+
+    :param line: query line - e.g. "CONTAINS movie The Big Lebowski"
+    :return: tuple of the query values - e.g. ("CONTAINS", "movie", "The Big Lebowski") or None for a line that is
+             not a query
+    :raises ValueError: if the query line has fewer values than its query type needs - e.g. "CONTAINS movie"
+    """
+    values = line.split()
+    if len(values) == 0 or values[0] not in ARGUMENTS:
+        return None
+    needed = 3 if ARGUMENTS[values[0]] is None else ARGUMENTS[values[0]]
+    if len(values) < needed:
+        raise ValueError(values[0] + " needs " + str(needed - 1) + " values after the query type, got " +
+                         str(len(values) - 1))
+    if values[0] == "CONTAINS":
+        empty_string = " "
+        return values[0], values[1], empty_string.join(values[2:])
+    return tuple(values[:ARGUMENTS[values[0]]])
+
+
+def describe(query: tuple) -> str:
+    """
+    :param query: tuple of the query values - returned from the parse_query function
+    :return: the "processing:" line of the query
+    """
+    return "processing: " + " ".join(query)
+
+
+def run_query(query: tuple, movies: dict, ratings: dict, movie_indexes, out=None) -> None:
+    """
+    Function to call the query function of the query type with the query values. Its duration is kept in the
+    "query.{query type}" latency histogram and it runs under cProfile when its query type is being profiled.
+
+    :param query: tuple of the query values - returned from the parse_query function
+    :param movies: dictionary of Movie objects
+    :param ratings: dictionary of Rating objects
+    :param movie_indexes: Indexes object - queries whose index is None scan the datasets
+    :param out: text file the query output is written to - sys.stdout when None
+    :return: None
+    """
+    with metrics.span("query." + query[0]):
+        profile = metrics.REGISTRY.profile(query[0])
+        if profile is None:
+            dispatch_query(query, movies, ratings, movie_indexes, out)
+        else:
+            profile.runcall(dispatch_query, query, movies, ratings, movie_indexes, out)
+
+
+def dispatch_query(query: tuple, movies: dict, ratings: dict, movie_indexes, out=None) -> None:
+    """
+    :param query: tuple of the query values - returned from the parse_query function
+    :param movies: dictionary of Movie objects
+    :param ratings: dictionary of Rating objects
+    :param movie_indexes: Indexes object - queries whose index is None scan the datasets, the numpy backend answers
+                          its query types when the Indexes object has columns and scans run on the scan pool of
+                          the Indexes object when it has one - queries of the SQLite store run as SQL queries
+    :param out: text file the query output is written to - sys.stdout when None
+    :return: None
+    """
+    query_type = query[0]
+    cache = movie_indexes.lines
+    if isinstance(movies, sqlite_store.SqliteMovies):
+        sqlite_store.run_query(query, movies, cache, out)
+    elif movie_indexes.columns is not None and query_type in numpy_backend.QUERY_TYPES:
+        numpy_backend.run_query(query, movies, ratings, movie_indexes.columns, cache, out)
+    elif partitioned_scan.answers(query, movie_indexes):
+        partitioned_scan.run_query(query, movies, movie_indexes.scan_pool, cache, out)
+    elif query_type == "LOOKUP":
+        queries.lookup(query[1], movies, ratings, cache, out)
+    elif query_type == "CONTAINS":
+        queries.contains(query[1], query[2], movies, movie_indexes.contains, cache, out)
+    elif query_type == "YEAR_AND_GENRE":
+        queries.year_and_genre(query[1], query[2], query[3], movies, movie_indexes.year_and_genre, cache, out)
+    elif query_type == "RUNTIME":
+        queries.runtime(query[1], query[2], query[3], movies, movie_indexes.runtime, cache, out)
+    elif query_type == "MOST_VOTES":
+        queries.most_votes(query[1], query[2], movies, ratings, movie_indexes.most_votes, cache, out)
+    elif query_type == "TOP":
+        queries.top(query[1], query[2], query[3], query[4], movies, ratings, movie_indexes.top, cache, out)
+    elif query_type == "STATS":
+        queries.stats(query[1], query[2], query[3], query[4], movies, ratings, movie_indexes.stats, cache, out)
+
+
+def execute_query(query: tuple, movies: dict, ratings: dict, movie_indexes,
+                  cache: result_cache.ResultCache = None, out=None) -> None:
+    """
+    Function to write the output of a query - from the result cache when the same query was answered recently,
+    otherwise by running it (and keeping its output in the cache).
+
+    :param query: tuple of the query values - returned from the parse_query function
+    :param movies: dictionary of Movie objects
+    :param ratings: dictionary of Rating objects
+    :param movie_indexes: Indexes object
+    :param cache: ResultCache object - every query runs when None
+    :param out: text file the query output is written to - sys.stdout when None
+    :return: None
+    """
+    if cache is None:
+        run_query(query, movies, ratings, movie_indexes, out)
+        return
+    cache.validate(movies, ratings)
+    key = result_cache.normalize(query)
+    output = cache.get(key)
+    if output is None:
+        buffer = io.StringIO()
+        run_query(query, movies, ratings, movie_indexes, buffer)
+        output = buffer.getvalue()
+        cache.put(key, output)
+    (sys.stdout if out is None else out).write(output)
+
+
+def answer_query(query: tuple, movies: dict, ratings: dict, movie_indexes,
+                 cache: result_cache.ResultCache = None) -> str:
+    """
+    Function to answer a query with the same text the command line prints for it.
+
+    :param query: tuple of the query values - returned from the parse_query function
+    :param movies: dictionary of Movie objects
+    :param ratings: dictionary of Rating objects
+    :param movie_indexes: Indexes object
+    :param cache: ResultCache object - every query runs when None
+    :return: the "processing:" line, the query output and the "elapsed time (s):" line of the query
+    """
+    out = io.StringIO()
+    out.write(describe(query) + "\n")
+    start = timer()
+    execute_query(query, movies, ratings, movie_indexes, cache, out)
+    elapsed = timer() - start
+    out.write("elapsed time (s): " + str(elapsed) + " \n\n")
+    return out.getvalue()
+
+
+def process_query(line: str, movies: dict, ratings: dict, movie_indexes,
+                  cache: result_cache.ResultCache = None) -> None:
+    """
+    Function to process a query line - prints the "processing:" line, the query output and the elapsed time of the
+    query, then flushes standard output once. Lines that are not queries are ignored.
+
+    :param line: query line
+    :param movies: dictionary of Movie objects
+    :param ratings: dictionary of Rating objects
+    :param movie_indexes: Indexes object
+    :param cache: ResultCache object - every query runs when None
+    :return: None
+    """
+    query = parse_query(line)
+    if query is None:
+        return
+    print(describe(query))
+    start = timer()
+    execute_query(query, movies, ratings, movie_indexes, cache)
+    elapsed = timer() - start
+    print("elapsed time (s):", elapsed, "\n")
+    sys.stdout.flush()
@@ -0,0 +1,252 @@
+"""
+CSAPX Project 1: Movie
+
+In this project we worked with datasets from the IMDB website. We got
+experience reading in the data and using various structures and collections in Python to
+store, organize and efficiently query for different kinds of information relating to the movies
+and their ratings.
+
+***                                                                                                                 ***
+    This module refreshes loaded datasets from new copies of the dataset files (IMDB publishes them daily and only a
+    small fraction of the rows change). The new files are compared with the loaded movies and ratings and only the
+    inserted, updated and deleted rows are applied - to the movies and ratings, the indexes, the formatted movie lines
+    and the result cache - instead of loading everything again.
+
+    Afterwards the movies and ratings are in the order of the new files, exactly as if they had been loaded again.
+    The IMDB datasets are sorted by tconst and new titles get new tconsts, so usually inserted movies just come last
+    and only the ratings after the first newly rated title have to move.
+***                                                                                                                 ***
+
+author: Miguel Reyes
+date: 09/26/21
+"""
+from array import array
+from dataclasses import dataclass, field
+import columnar
+import indexes
+import metrics
+import numpy_backend
+import result_cache
+from movies_and_ratings import Movie, join_rating, open_dataset, parse_movie_line, parse_rating_line
+
+"""
+Changes:
+    movies(list): tuples of the Movie field variables of every inserted or updated movie, in dataset order
+    deleted_movies(list): tconsts of the deleted movies
+    ratings(list): tuples of the Rating field variables of every inserted or updated rating, in dataset order
+    deleted_ratings(list): tconsts of the deleted ratings
+    movie_order(list): tconsts of every movie in the order of the new movies dataset
+    rating_order(list): tconsts of every rating in the order of the new ratings dataset
+"""
+
+
+@dataclass
+class Changes:
+    """A dataclass to hold the differences between the loaded datasets and the new dataset files."""
+    movies: list = field(default_factory=list)
+    deleted_movies: list = field(default_factory=list)
+    ratings: list = field(default_factory=list)
+    deleted_ratings: list = field(default_factory=list)
+    movie_order: list = field(default_factory=list)
+    rating_order: list = field(default_factory=list)
+
+
+def diff_movies(filename: str, movies: dict, changes: Changes) -> None:
+    """
+    Function to compare the movies dataset file with the loaded movies - same rules as
+    movies_and_ratings.read_movie_dataset.
+
+    :param filename: The file name of the new movies dataset
+    :param movies: dictionary of the loaded Movie objects
+    :param changes: Changes object the inserted, updated and deleted movies are added to
+    :return: None
+    """
+    seen = set()
+    with open_dataset(filename) as f:
+        next(f)  # skips header line
+        for line in f:
+            data_fields = parse_movie_line(line)
+            if data_fields is None:
+                continue
+            movie = movies.get(data_fields[0])
+            if movie is None:
+                changes.movies.append(data_fields)
+                changes.movie_order.append(data_fields[0])
+                continue
+            seen.add(movie.tconst)  # the loaded tconst string, so seen doesn't keep a second copy alive
+            changes.movie_order.append(movie.tconst)
+            if (movie.tconst, movie.title_type, movie.primary_title, movie.start_year, movie.runtime_minutes,
+                    movie.genres) != data_fields:
+                changes.movies.append(data_fields)
+    changes.deleted_movies.extend(tconst for tconst in movies if tconst not in seen)
+
+
+def diff_ratings(filename: str, movies: dict, ratings: dict, changes: Changes) -> None:
+    """
+    Function to compare the ratings dataset file with the loaded ratings, keeping the ratings of the movies there will
+    be once the movie changes are made - same rules as movies_and_ratings.read_rating_dataset.
+
+    :param filename: The file name of the new ratings dataset
+    :param movies: dictionary of the loaded Movie objects
+    :param ratings: dictionary of the loaded Rating objects
+    :param changes: Changes object with the movie changes, the inserted, updated and deleted ratings are added to it
+    :return: None
+    """
+    inserted = {data_fields[0] for data_fields in changes.movies if data_fields[0] not in movies}
+    deleted = set(changes.deleted_movies)
+    seen = set()
+    with open_dataset(filename) as f:
+        next(f)  # skips header line
+        for line in f:
+            data_fields = parse_rating_line(line)
+            tconst = data_fields[0]
+            if tconst in inserted:
+                changes.ratings.append(data_fields)
+                changes.rating_order.append(tconst)
+                continue
+            if tconst not in movies or tconst in deleted:
+                continue
+            rating = ratings.get(tconst)
+            if rating is None:
+                changes.ratings.append(data_fields)
+                changes.rating_order.append(tconst)
+                continue
+            seen.add(rating.tconst)
+            changes.rating_order.append(rating.tconst)
+            if (rating.avg_rating, rating.num_votes) != data_fields[1:]:
+                changes.ratings.append(data_fields)
+    changes.deleted_ratings.extend(tconst for tconst in ratings if tconst not in seen)
+
+
+def keeps_order(loaded, order: list, deleted: set, inserted: set) -> bool:
+    """
+    :param loaded: tconsts in the loaded order
+    :param order: tconsts in the new order
+    :param deleted: tconsts of loaded that are not in order
+    :param inserted: tconsts of order that are not in loaded
+    :return: True if the tconsts of both loaded and order are in the same order in both
+    """
+    return all(old == new for old, new in zip((tconst for tconst in loaded if tconst not in deleted),
+                                              (tconst for tconst in order if tconst not in inserted)))
+
+
+def move_to_order(d: dict, order: list) -> None:
+    """
+    Function to put the keys of a dictionary in the order of order - every key from the first one out of place is
+    moved to the end, so keys that are already in place don't move.
+
+    :param d: dictionary whose keys are the tconsts of order
+    :param order: tconsts in the new order
+    :return: None
+    """
+    start = next((i for i, (key, tconst) in enumerate(zip(d, order)) if key != tconst), len(order))
+    for tconst in order[start:]:
+        d[tconst] = d.pop(tconst)
+
+
+def apply_changes(changes: Changes, movies: dict, ratings: dict) -> tuple:
+    """
+    Function to insert, update and delete the changed movies and ratings and put them in the order of the new
+    datasets.
+
+    :param changes: Changes object
+    :param movies: dictionary of Movie objects (or columnar.ColumnarMovies)
+    :param ratings: dictionary of Rating objects (or columnar.ColumnarRatings)
+    :return: tuple(dictionary of tconst -> Movie object before the change (None if inserted) of every changed movie,
+             dictionary of tconst -> Rating object before the change (None if not rated) of every changed rating and
+             of every rated movie that changed) - see indexes.update_indexes
+    """
+    old_movies = dict()
+    for data_fields in changes.movies:
+        old_movies[data_fields[0]] = movies.get(data_fields[0])
+    for tconst in changes.deleted_movies:
+        old_movies[tconst] = movies[tconst]
+    old_ratings = dict()
+    for data_fields in changes.ratings:
+        old_ratings[data_fields[0]] = ratings.get(data_fields[0])
+    for tconst in changes.deleted_ratings:
+        old_ratings[tconst] = ratings[tconst]
+    for tconst in old_movies:
+        if tconst not in old_ratings and tconst in ratings:
+            old_ratings[tconst] = ratings[tconst]
+
+    if isinstance(movies, columnar.ColumnarMovies):
+        store = movies.store
+        for data_fields in changes.movies:
+            store.add_movie(*data_fields)
+        for tconst, avg_rating, num_votes in changes.ratings:
+            store.add_rating(store.rows[tconst], avg_rating, num_votes)
+        store.remove_ratings({store.rows[tconst] for tconst in changes.deleted_ratings})
+        if len(changes.deleted_movies) > 0 or any(tconst != new_tconst for tconst, new_tconst in
+                                                   zip(store.tconsts, changes.movie_order)):
+            store.select_rows([store.rows[tconst] for tconst in changes.movie_order])
+        if any(store.tconsts[row] != tconst for row, tconst in zip(store.rating_rows, changes.rating_order)):
+            store.rating_rows = array("I", (store.rows[tconst] for tconst in changes.rating_order))
+    else:
+        for data_fields in changes.movies:
+            movies[data_fields[0]] = Movie(*data_fields)
+        for data_fields in changes.ratings:
+            ratings[data_fields[0]] = join_rating(movies[data_fields[0]], data_fields[1], data_fields[2])
+        for tconst in old_movies:  # unchanged ratings of updated movies are joined with the updated movie
+            rating = ratings.get(tconst)
+            if rating is not None and tconst in movies and rating.movie is not movies[tconst]:
+                ratings[tconst] = join_rating(movies[tconst], rating.avg_rating, rating.num_votes)
+        for tconst in changes.deleted_ratings:
+            del ratings[tconst]
+        for tconst in changes.deleted_movies:
+            del movies[tconst]
+        move_to_order(movies, changes.movie_order)
+        move_to_order(ratings, changes.rating_order)
+
+    return old_movies, old_ratings
+
+
+def refresh_datasets(basics_filename: str, ratings_filename: str, movies: dict, ratings: dict,
+                     movie_indexes: indexes.Indexes, cache: result_cache.ResultCache = None) -> Changes:
+    """
+    Function to refresh the loaded datasets from new copies of their dataset files. The movies, ratings and indexes
+    are changed in place, the formatted lines of the changed movies are discarded and the result cache is cleared.
+
+    :param basics_filename: file name of the movies dataset
+    :param ratings_filename: file name of the ratings dataset
+    :param movies: dictionary of Movie objects
+    :param ratings: dictionary of Rating objects
+    :param movie_indexes: Indexes object
+    :param cache: ResultCache object or None
+    :return: Changes object of the changes that were made
+    """
+    changes = Changes()
+    with metrics.span("refresh.diff"):
+        diff_movies(basics_filename, movies, changes)
+        diff_ratings(ratings_filename, movies, ratings, changes)
+    inserted_movies = {data_fields[0] for data_fields in changes.movies if data_fields[0] not in movies}
+    inserted_ratings = {data_fields[0] for data_fields in changes.ratings if data_fields[0] not in ratings}
+    in_order = keeps_order(movies, changes.movie_order, set(changes.deleted_movies), inserted_movies) and \
+        keeps_order(ratings, changes.rating_order, set(changes.deleted_ratings), inserted_ratings)
+    inserted_last = set(changes.movie_order[len(changes.movie_order) - len(inserted_movies):]) == inserted_movies
+    with metrics.span("refresh.apply"):
+        old_movies, old_ratings = apply_changes(changes, movies, ratings)
+    with metrics.span("refresh.indexes"):
+        if in_order:
+            indexes.update_indexes(movie_indexes, movies, ratings, old_movies, old_ratings, inserted_last)
+        else:  # rows that were already loaded changed their order, the indexes are built again
+            indexes.rebuild_indexes(movie_indexes, movies, ratings)
+        if movie_indexes.columns is not None:  # row ids change with every insert or delete
+            movie_indexes.columns = numpy_backend.build_columns(movies, ratings)
+        if movie_indexes.scan_pool is not None:  # the workers have the movies from before the refresh
+            movie_indexes.scan_pool.reload(movies)
+    for tconst in old_movies:
+        movie_indexes.lines.discard(tconst)
+    if cache is not None:
+        cache.clear()
+    return changes
+
+
+def describe_changes(changes: Changes) -> str:
+    """
+    :param changes: Changes object
+    :return: one line summary of the changes
+    """
+    return ("refreshed: " + str(len(changes.movies)) + " movies inserted or updated, " +
+            str(len(changes.deleted_movies)) + " deleted, " + str(len(changes.ratings)) +
+            " ratings inserted or updated, " + str(len(changes.deleted_ratings)) + " deleted")
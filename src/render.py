@@ -0,0 +1,94 @@
+"""
+CSAPX Project 1: Movie
+
+In this project we worked with datasets from the IMDB website. We got
+experience reading in the data and using various structures and collections in Python to
+store, organize and efficiently query for different kinds of information relating to the movies
+and their ratings.
+
+***                                                                                                                 ***
+    This module contains the rendering of query output. Every query displays a movie with the same
+    "Identifier: ..., Title: ..., Genres: ..." line, so the line of a movie is formatted once and kept in a LineCache
+    for the next queries that display it (the least recently displayed lines are evicted once it holds too many).
+***                                                                                                                 ***
+
+author: Miguel Reyes
+date: 09/26/21
+"""
+import sys
+from collections import OrderedDict
+from movies_and_ratings import Movie
+
+
+def format_movie(movie: Movie) -> str:
+    """
+    :param movie: Movie object
+    :return: Identifier: {tconst}, Title: {primaryTitle}, Type: {titleType}, Year: {startYear}, Runtime: {runTime},
+             Genres: {genres}
+    """
+    return ("Identifier: " + movie.tconst + ", Title: " + movie.primary_title + ", Type: " + movie.title_type +
+            ", Year: " + movie.start_year + ", Runtime: " + movie.runtime_minutes + ", Genres: " +
+            movie.genres.replace(",", ", "))
+
+
+class LineCache:
+    """
+    Least recently used cache of formatted movie lines by tconst - a line is formatted the first time its movie is
+    displayed. The lines of movies that change must be discarded.
+
+    max_entries(int): maximum number of lines kept
+    """
+
+    def __init__(self, max_entries: int = 100000):
+        self.max_entries = max_entries
+        self.lines = OrderedDict()  # tconst -> line, least recently used first
+
+    def __len__(self) -> int:
+        return len(self.lines)
+
+    def movie_line(self, movie: Movie) -> str:
+        """
+        :param movie: Movie object
+        :return: formatted line of the movie (see format_movie)
+        """
+        line = self.lines.get(movie.tconst)
+        if line is not None:
+            self.lines.move_to_end(movie.tconst)
+            return line
+        line = format_movie(movie)
+        if self.max_entries < 1:
+            return line
+        while len(self.lines) >= self.max_entries:
+            self.lines.popitem(last=False)
+        self.lines[movie.tconst] = line
+        return line
+
+    def discard(self, tconst: str) -> None:
+        self.lines.pop(tconst, None)
+
+    def clear(self) -> None:
+        self.lines.clear()
+
+
+def movie_line(movie: Movie, cache: LineCache = None) -> str:
+    """
+    :param movie: Movie object
+    :param cache: LineCache object - the line is formatted every time when None
+    :return: formatted line of the movie (see format_movie)
+    """
+    if cache is None:
+        return format_movie(movie)
+    return cache.movie_line(movie)
+
+
+def write_output(output: list, out=None) -> None:
+    """
+    Function to write the output lines of a query with a single write instead of one print per line.
+
+    :param output: list of output lines (each ending with a line break)
+    :param out: text file to write to - sys.stdout when None
+    :return: None
+    """
+    if out is None:
+        out = sys.stdout
+    out.write("".join(output))
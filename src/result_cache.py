@@ -0,0 +1,116 @@
+"""
+CSAPX Project 1: Movie
+
+In this project we worked with datasets from the IMDB website. We got
+experience reading in the data and using various structures and collections in Python to
+store, organize and efficiently query for different kinds of information relating to the movies
+and their ratings.
+
+***                                                                                                                 ***
+    This module contains the query result cache - the output of recent queries is kept by their normalized query so
+    a repeated query is answered without running it again. The least recently used results are evicted once the
+    cache holds too many results or too many bytes of output, and the whole cache is invalidated when the movies or
+    ratings it was filled from are replaced.
+***                                                                                                                 ***
+
+author: Miguel Reyes
+date: 09/26/21
+"""
+from collections import OrderedDict
+
+"""
+NUMERIC_ARGUMENTS:
+    query type -> positions of the query values that are evaluated as an int (so "05" and "5" are the same query)
+"""
+NUMERIC_ARGUMENTS = {"RUNTIME": (2, 3), "MOST_VOTES": (2,), "TOP": (2, 3, 4), "STATS": (2, 3)}
+
+
+def normalize(query: tuple) -> tuple:
+    """
+    :param query: tuple of the query values - returned from query_processor.parse_query
+    :return: the query with its numeric values evaluated as an int - the key of its result
+    """
+    positions = NUMERIC_ARGUMENTS.get(query[0], ())
+    return tuple(int(value) if i in positions else value for i, value in enumerate(query))
+
+
+class ResultCache:
+    """
+    Least recently used cache of query output by normalized query.
+
+    max_entries(int): maximum number of results kept
+    max_bytes(int): maximum number of bytes of output kept - a result larger than this is never kept
+    hits(int): number of queries answered from the cache
+    misses(int): number of queries that had to run
+    """
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.results = OrderedDict()  # key -> (output, size in bytes), least recently used first
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.movies = None
+        self.ratings = None
+
+    def __len__(self) -> int:
+        return len(self.results)
+
+    def __contains__(self, key: tuple) -> bool:
+        return key in self.results
+
+    def validate(self, movies: dict, ratings: dict) -> None:
+        """
+        Function to invalidate the cache when the movies or ratings are not the ones it was filled from.
+
+        :param movies: dictionary of Movie objects the next queries run on
+        :param ratings: dictionary of Rating objects the next queries run on
+        :return: None
+        """
+        if movies is not self.movies or ratings is not self.ratings:
+            self.clear()
+            self.movies = movies
+            self.ratings = ratings
+
+    def get(self, key: tuple):
+        """
+        :param key: normalized query
+        :return: output of the query or None if it is not cached
+        """
+        result = self.results.get(key)
+        if result is None:
+            self.misses += 1
+            return None
+        self.results.move_to_end(key)
+        self.hits += 1
+        return result[0]
+
+    def put(self, key: tuple, output: str) -> None:
+        """
+        Function to keep the output of a query, evicting the least recently used results until it fits.
+
+        :param key: normalized query
+        :param output: output of the query
+        :return: None
+        """
+        size = len(output.encode("utf-8"))
+        if size > self.max_bytes or self.max_entries < 1:
+            return
+        if key in self.results:
+            self.bytes -= self.results.pop(key)[1]
+        while len(self.results) >= self.max_entries or self.bytes + size > self.max_bytes:
+            self.bytes -= self.results.popitem(last=False)[1][1]
+        self.results[key] = (output, size)
+        self.bytes += size
+
+    def clear(self) -> None:
+        self.results.clear()
+        self.bytes = 0
+
+    def stats(self) -> str:
+        """
+        :return: hit/miss counters and size of the cache
+        """
+        return ("result cache: " + str(self.hits) + " hits, " + str(self.misses) + " misses, " +
+                str(len(self.results)) + " results, " + str(self.bytes) + " bytes")
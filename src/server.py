@@ -0,0 +1,149 @@
+"""
+CSAPX Project 1: Movie
+
+In this project we worked with datasets from the IMDB website. We got
+experience reading in the data and using various structures and collections in Python to
+store, organize and efficiently query for different kinds of information relating to the movies
+and their ratings.
+
+***                                                                                                                 ***
+    This module contains the query server - the datasets are loaded once and stay in memory while clients send
+    query lines over a TCP or Unix socket. Every query line gets back exactly what the command line prints for it
+    (its "processing:" line, output and "elapsed time (s):" line), a query that fails gets back a single "error:"
+    line and the connection stays open. Clients are served concurrently by an asyncio event loop and a client is done
+    when it closes its side of the connection. The queries themselves run one at a time on a single query thread, so
+    the event loop keeps accepting clients and reading their queries while a slow query (e.g. a scan without an
+    index) runs - but the queries of the other clients wait for it to finish. On SIGHUP the datasets are refreshed
+    in place from their files (see refresh.py) on the query thread, between two queries.
+***                                                                                                                 ***
+
+author: Miguel Reyes
+date: 09/26/21
+"""
+import asyncio
+import os
+import signal
+from concurrent.futures import ThreadPoolExecutor
+import query_processor
+import result_cache
+
+
+def parse_address(address: str) -> tuple:
+    """
+    :param address: "HOST:PORT" for a TCP socket or "unix:PATH" for a Unix socket
+    :return: tuple("tcp", host, port) or tuple("unix", path)
+    """
+    if address.startswith("unix:"):
+        return "unix", address[len("unix:"):]
+    host, _, port = address.rpartition(":")
+    return "tcp", host or "127.0.0.1", int(port)
+
+
+def error_reply(query: tuple, error: Exception) -> str:
+    """
+    :param query: tuple of the query values
+    :param error: exception raised by the query
+    :return: the single line sent back for a query that failed
+    """
+    return "error: " + query_processor.describe(query) + ": " + type(error).__name__ + ": " + str(error) + "\n"
+
+
+async def handle_client(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, movies: dict, ratings: dict,
+                        movie_indexes, cache: result_cache.ResultCache, executor: ThreadPoolExecutor) -> None:
+    """
+    Function to answer the query lines of a client until it closes its side of the connection. A line that is not a
+    query (e.g. "CONTAINS" or "NOPE movie") or a query that raises an exception (e.g. "TOP movie abc 2000") is
+    answered with an error line instead.
+
+    :param reader: stream of the client query lines
+    :param writer: stream of the answers to the client
+    :param movies: dictionary of Movie objects
+    :param ratings: dictionary of Rating objects
+    :param movie_indexes: Indexes object
+    :param cache: ResultCache object shared by every client - every query runs when None
+    :param executor: the single query thread every query runs on
+    :return: None
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            values = tuple(line.decode("utf-8", "replace").split())
+            if len(values) == 0:
+                continue
+            query = None
+            try:
+                query = query_processor.parse_query(line.decode("utf-8"))
+                if query is None:
+                    raise ValueError("unknown query type " + values[0])
+                answer = await loop.run_in_executor(executor, query_processor.answer_query, query, movies, ratings,
+                                                    movie_indexes, cache)
+            except Exception as error:  # only this query fails, the client keeps its connection
+                answer = error_reply(values if query is None else query, error)
+            writer.write(answer.encode("utf-8"))
+            await writer.drain()  # lets the other clients run between queries
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def run_server(address: str, movies: dict, ratings: dict, movie_indexes,
+                     cache: result_cache.ResultCache = None, refresh=None) -> None:
+    """
+    Function to serve queries on address until the server is stopped by SIGINT (Ctrl-C) or SIGTERM.
+
+    :param address: "HOST:PORT" or "unix:PATH"
+    :param movies: dictionary of Movie objects
+    :param ratings: dictionary of Rating objects
+    :param movie_indexes: Indexes object
+    :param cache: ResultCache object - every query runs when None
+    :param refresh: function called on SIGHUP to refresh the datasets in place - SIGHUP is ignored when None
+    :return: None
+    """
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="query")  # queries and refreshes never overlap
+
+    async def client_connected(reader, writer):
+        await handle_client(reader, writer, movies, ratings, movie_indexes, cache, executor)
+
+    kind, *location = parse_address(address)
+    if kind == "unix":
+        server = await asyncio.start_unix_server(client_connected, path=location[0])
+    else:
+        server = await asyncio.start_server(client_connected, host=location[0], port=location[1])
+    loop = asyncio.get_running_loop()
+    stopped = loop.create_future()
+    for signal_number in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signal_number, lambda: stopped.done() or stopped.set_result(None))
+    if refresh is not None and hasattr(signal, "SIGHUP"):
+        loop.add_signal_handler(signal.SIGHUP, loop.run_in_executor, executor, refresh)  # never during a query
+    print("serving queries on " + address + "...", flush=True)
+    try:
+        async with server:
+            await stopped
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)  # the query that is running finishes
+
+
+def serve(address: str, movies: dict, ratings: dict, movie_indexes, cache: result_cache.ResultCache = None,
+          refresh=None) -> None:
+    """
+    Function to run the query server until it is stopped.
+
+    :param address: "HOST:PORT" or "unix:PATH"
+    :param movies: dictionary of Movie objects
+    :param ratings: dictionary of Rating objects
+    :param movie_indexes: Indexes object
+    :param cache: ResultCache object - every query runs when None
+    :param refresh: function called on SIGHUP to refresh the datasets in place - SIGHUP is ignored when None
+    :return: None
+    """
+    try:
+        asyncio.run(run_server(address, movies, ratings, movie_indexes, cache, refresh))
+        print("server stopped")
+    finally:
+        kind, *location = parse_address(address)
+        if kind == "unix" and os.path.exists(location[0]):
+            os.remove(location[0])
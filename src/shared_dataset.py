@@ -0,0 +1,482 @@
+"""
+CSAPX Project 1: Movie
+
+In this project we worked with datasets from the IMDB website. We got
+experience reading in the data and using various structures and collections in Python to
+store, organize and efficiently query for different kinds of information relating to the movies
+and their ratings.
+
+***                                                                                                                 ***
+    This module contains the shared dataset - the loaded movies, ratings and indexes are published once into a read
+    only file laid out as flat arrays (the columns of columnar.py, strings as an offsets array plus their utf-8
+    bytes, and every index as sorted keys with the row ids of their postings). Any number of processes attach to it
+    with one mmap and query it in place through read only views, nothing is copied so the operating system shares
+    the pages of the file between all of them. process_queries answers queries with a pool of such processes.
+***                                                                                                                 ***
+
+author: Miguel Reyes
+date: 09/26/21
+"""
+import mmap
+import multiprocessing
+import os
+import pickle
+import struct
+import sys
+from array import array
+from collections.abc import Mapping, Sequence
+from concurrent.futures import ProcessPoolExecutor
+import columnar
+import indexes
+import query_processor
+from snapshot import source_stamps
+
+MAGIC = b"MOVIESHM"  # first bytes of every shared dataset file
+VERSION = 2  # increase when the layout changes, older files are then published again
+HEADER = struct.Struct("<8sQ")  # MAGIC and the offset of the pickled directory of sections
+ALIGNMENT = 8  # every section starts at a multiple of ALIGNMENT bytes
+NO_ROW = 0xFFFFFFFF  # row id stored for a deleted (None) entry of a CONTAINS index
+
+
+def shared_path(basics_filename: str) -> str:
+    """
+    :param basics_filename: file name of the movies dataset - e.g. "small.basics"
+    :return: path of the shared dataset file of the dataset
+    """
+    return "data/" + basics_filename + ".shared"
+
+
+def encode_key(key) -> bytes:
+    """
+    :param key: index key - a string or a tuple of strings and ints
+    :return: the key as it is stored in a shared table
+    """
+    if isinstance(key, tuple):
+        return "\t".join(map(str, key)).encode("utf-8")
+    return str(key).encode("utf-8")
+
+
+class Writer:
+    """
+    Writes the sections of a shared dataset file.
+
+    f(file): file opened for binary writing
+    sections(dict): section name -> (offset, typecode, number of items)
+    """
+
+    def __init__(self, f):
+        self.f = f
+        self.sections = dict()
+
+    def add(self, name: str, values) -> None:
+        """
+        :param name: name of the section
+        :param values: array, or bytes for a section of bytes
+        :return: None
+        """
+        self.f.write(b"\0" * (-self.f.tell() % ALIGNMENT))
+        typecode = values.typecode if isinstance(values, array) else "B"
+        self.sections[name] = (self.f.tell(), typecode, len(values))
+        self.f.write(values.tobytes() if isinstance(values, array) else values)
+
+    def add_strings(self, name: str, strings) -> None:
+        """
+        Function to write strings as a section of their utf-8 bytes and a section of the offset of every string.
+
+        :param name: name of the sections
+        :param strings: iterable of strings (or bytes)
+        :return: None
+        """
+        offsets = array("Q", [0])
+        data = bytearray()
+        for string in strings:
+            data += string if isinstance(string, bytes) else string.encode("utf-8")
+            offsets.append(len(data))
+        self.add(name + ".offsets", offsets)
+        self.add(name + ".data", bytes(data))
+
+    def add_table(self, name: str, entries: dict, typecodes: tuple) -> None:
+        """
+        Function to write an index as its sorted keys, the start of the postings of every key and the postings.
+
+        :param name: name of the sections
+        :param entries: dictionary of key -> tuple of sequences (the postings, one sequence for each typecode)
+        :param typecodes: array typecode of every posting sequence
+        :return: None
+        """
+        items = sorted((encode_key(key), values) for key, values in entries.items())
+        self.add_strings(name + ".keys", (key for key, values in items))
+        starts = array("Q", [0])
+        for key, values in items:
+            starts.append(starts[-1] + len(values[0]))
+        self.add(name + ".starts", starts)
+        for i, typecode in enumerate(typecodes):
+            column = array(typecode)
+            for key, values in items:
+                column.extend(values[i])
+            self.add(name + ".values" + str(i), column)
+
+
+def to_column_store(movies: dict, ratings: dict) -> columnar.ColumnStore:
+    """
+    :param movies: dictionary of Movie objects (or columnar.ColumnarMovies)
+    :param ratings: dictionary of Rating objects (or columnar.ColumnarRatings)
+    :return: ColumnStore of the movies and ratings
+    """
+    if isinstance(movies, columnar.ColumnarMovies):
+        return movies.store
+    store = columnar.ColumnStore()
+    for movie in movies.values():
+        store.add_movie(movie.tconst, movie.title_type, movie.primary_title, movie.start_year,
+                        movie.runtime_minutes, movie.genres)
+    for rating in ratings.values():
+        store.add_rating(store.rows[rating.tconst], rating.avg_rating, rating.num_votes)
+    return store
+
+
+def publish(path: str, sources: list, options: dict, movies: dict, ratings: dict,
+            movie_indexes: indexes.Indexes) -> None:
+    """
+    Function to write the shared dataset file. The file is written next to its final path and then renamed, so
+    processes that are attached to an older file keep their (unlinked) copy.
+
+    :param path: path of the shared dataset file
+    :param sources: paths of the source datasets the movies and ratings were read from
+    :param options: options the datasets were loaded with - a shared dataset is only used with the same options
+    :param movies: dictionary of Movie objects
+    :param ratings: dictionary of Rating objects
+    :param movie_indexes: Indexes object
+    :return: None
+    """
+    store = to_column_store(movies, ratings)
+    rows = store.rows
+
+    def row_ids(tconsts) -> array:
+        return array("I", (NO_ROW if tconst is None else rows[tconst] for tconst in tconsts))
+
+    temporary_path = path + ".tmp"
+    with open(temporary_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, 0))
+        writer = Writer(f)
+        writer.add_strings("tconsts", store.tconsts)
+        writer.add("tconst_order", array("I", sorted(range(len(store.tconsts)), key=store.tconsts.__getitem__)))
+        writer.add("title_type_codes", store.title_type_codes)
+        writer.add_strings("primary_titles", store.primary_titles)
+        writer.add("start_years", store.start_years)
+        writer.add("runtime_minutes", store.runtime_minutes)
+        writer.add("genre_codes", store.genre_codes)
+        writer.add("avg_ratings", store.avg_ratings)
+        writer.add("num_votes", store.num_votes)
+        writer.add("rated", bytes(store.rated))
+        writer.add("rating_rows", store.rating_rows)
+
+        if movie_indexes.year_and_genre is not None:
+            writer.add_table("year_and_genre", {key: (row_ids(tconsts),)
+                                                for key, tconsts in movie_indexes.year_and_genre.items()}, ("I",))
+        if movie_indexes.runtime is not None:
+            writer.add_table("runtime", {title_type: (row_ids(tconsts), negated_runtimes) for title_type,
+                                         (negated_runtimes, tconsts) in movie_indexes.runtime.items()}, ("I", "i"))
+        if movie_indexes.most_votes is not None:
+            writer.add_table("most_votes", {key: (row_ids(tconsts),)
+                                            for key, tconsts in movie_indexes.most_votes.items()}, ("I",))
+        if movie_indexes.top is not None:
+            writer.add_table("top", {key: (row_ids(tconsts),) for key, tconsts in movie_indexes.top.items()},
+                             ("I",))
+        if movie_indexes.contains is not None:
+            writer.add_table("contains", {title_type: (row_ids(tconsts),)
+                                          for title_type, (tconsts, postings) in movie_indexes.contains.items()},
+                             ("I",))
+            writer.add_table("contains.postings", {(title_type, trigram): (positions,)
+                                                   for title_type, (tconsts, postings) in
+                                                   movie_indexes.contains.items()
+                                                   for trigram, positions in postings.items()}, ("I",))
+
+        directory = {"version": VERSION, "sources": source_stamps(sources), "options": options,
+                     "sections": writer.sections, "title_types": store.title_types, "genres": store.genres,
+                     "stats": movie_indexes.stats}  # the aggregate cube is small, it is kept in the directory
+        offset = f.tell()
+        pickle.dump(directory, f, protocol=pickle.HIGHEST_PROTOCOL)
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, offset))
+    os.replace(temporary_path, path)
+
+
+def read_directory(path: str):
+    """
+    :param path: path of the shared dataset file
+    :return: the directory of the file or None if it is missing or not a shared dataset of this VERSION
+    """
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        magic, offset = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or offset == 0:
+            return None
+        f.seek(offset)
+        directory = pickle.load(f)
+    return directory if directory["version"] == VERSION else None
+
+
+def is_current(path: str, sources: list, options: dict) -> bool:
+    """
+    :param path: path of the shared dataset file
+    :param sources: paths of the source datasets
+    :param options: options the datasets are being loaded with
+    :return: True if the file was published from the current source datasets with the same options
+    """
+    directory = read_directory(path)
+    return directory is not None and directory["options"] == options and \
+        directory["sources"] == source_stamps(sources)
+
+
+class Strings(Sequence):
+    """Read only list of the strings of a section written by Writer.add_strings."""
+
+    def __init__(self, offsets: memoryview, data: memoryview):
+        self.offsets = offsets
+        self.data = data
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def raw(self, i: int) -> bytes:
+        return bytes(self.data[self.offsets[i]:self.offsets[i + 1]])
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        return str(self.data[self.offsets[i]:self.offsets[i + 1]], "utf-8")
+
+
+def search(strings: Strings, target: bytes, start: int, end: int, order=None) -> int:
+    """
+    :param strings: Strings in ascending order (or in the order of order)
+    :param target: string looked for
+    :param start: first position searched
+    :param end: position after the last position searched
+    :param order: positions of strings in ascending order of their string - None when strings are sorted
+    :return: first position from start to end whose string is not less than target
+    """
+    while start < end:
+        middle = (start + end) // 2
+        if strings.raw(middle if order is None else order[middle]) < target:
+            start = middle + 1
+        else:
+            end = middle
+    return start
+
+
+class Tconsts(Sequence):
+    """Read only list of the tconsts of a posting list of row ids - None for NO_ROW."""
+
+    def __init__(self, rows: memoryview, tconsts: Strings):
+        self.rows = rows
+        self.tconsts = tconsts
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [None if row == NO_ROW else self.tconsts[row] for row in self.rows[i]]
+        row = self.rows[i]
+        return None if row == NO_ROW else self.tconsts[row]
+
+
+class Rows(Mapping):
+    """Read only dictionary of tconst -> row id, found with a binary search of the tconsts in ascending order."""
+
+    def __init__(self, tconsts: Strings, order: memoryview):
+        self.tconsts = tconsts
+        self.order = order
+
+    def __getitem__(self, tconst: str) -> int:
+        target = tconst.encode("utf-8")
+        position = search(self.tconsts, target, 0, len(self.order), self.order)
+        if position == len(self.order) or self.tconsts.raw(self.order[position]) != target:
+            raise KeyError(tconst)
+        return self.order[position]
+
+    def __iter__(self):
+        return iter(self.tconsts)
+
+    def __len__(self) -> int:
+        return len(self.tconsts)
+
+
+class Table(Mapping):
+    """
+    Read only index written by Writer.add_table - key -> value of the postings of the key. A table of a prefix only
+    holds the keys (key_prefix, key), its keys are iterated in their stored form.
+
+    keys(Strings): stored keys in ascending order
+    starts(memoryview): start of the postings of every key
+    make_value(function): function(start, end) -> value of the postings from start to end
+    prefix(bytes): stored form of the prefix with its separator, b"" for the whole table
+    """
+
+    def __init__(self, keys: Strings, starts: memoryview, make_value, prefix: bytes = b""):
+        self.keys = keys
+        self.starts = starts
+        self.make_value = make_value
+        self.prefix = prefix
+        self.start = search(keys, prefix, 0, len(keys))
+        self.end = search(keys, prefix + b"\xff", self.start, len(keys)) if len(prefix) > 0 else len(keys)
+
+    def __getitem__(self, key):
+        target = self.prefix + encode_key(key)
+        position = search(self.keys, target, self.start, self.end)
+        if position == self.end or self.keys.raw(position) != target:
+            raise KeyError(key)
+        return self.make_value(self.starts[position], self.starts[position + 1])
+
+    def __iter__(self):
+        return (self.keys[position][len(self.prefix):] for position in range(self.start, self.end))
+
+    def __len__(self) -> int:
+        return self.end - self.start
+
+    def with_prefix(self, key_prefix: str):
+        return Table(self.keys, self.starts, self.make_value, self.prefix + encode_key(key_prefix) + b"\t")
+
+
+class SharedDataset:
+    """
+    A shared dataset file attached with mmap.
+
+    directory(dict): directory of the file - see publish
+    image(mmap): read only memory map of the file
+    """
+
+    def __init__(self, path: str):
+        self.directory = read_directory(path)
+        if self.directory is None:
+            raise ValueError(path + " is not a shared dataset")
+        with open(path, "rb") as f:
+            self.image = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.buffer = memoryview(self.image)
+
+    def section(self, name: str) -> memoryview:
+        offset, typecode, count = self.directory["sections"][name]
+        return self.buffer[offset:offset + count * array(typecode).itemsize].cast(typecode)
+
+    def strings(self, name: str) -> Strings:
+        return Strings(self.section(name + ".offsets"), self.section(name + ".data"))
+
+    def table(self, name: str, make_value) -> Table:
+        """
+        :param name: name of the table
+        :param make_value: function(list of posting sections, start, end) -> value of the postings from start to end
+        :return: Table or None if the table was not published
+        """
+        if name + ".starts" not in self.directory["sections"]:
+            return None
+        columns = list()
+        while name + ".values" + str(len(columns)) in self.directory["sections"]:
+            columns.append(self.section(name + ".values" + str(len(columns))))
+        return Table(self.strings(name + ".keys"), self.section(name + ".starts"),
+                     lambda start, end: make_value(columns, start, end))
+
+    def store(self) -> columnar.ColumnStore:
+        """
+        :return: ColumnStore whose columns are read only views of the file
+        """
+        store = columnar.ColumnStore()
+        store.tconsts = self.strings("tconsts")
+        store.rows = Rows(store.tconsts, self.section("tconst_order"))
+        store.title_type_codes = self.section("title_type_codes")
+        store.title_types = self.directory["title_types"]
+        store.primary_titles = self.strings("primary_titles")
+        store.start_years = self.section("start_years")
+        store.runtime_minutes = self.section("runtime_minutes")
+        store.genre_codes = self.section("genre_codes")
+        store.genres = self.directory["genres"]
+        store.avg_ratings = self.section("avg_ratings")
+        store.num_votes = self.section("num_votes")
+        store.rated = self.section("rated")
+        store.rating_rows = self.section("rating_rows")
+        return store
+
+    def indexes(self, tconsts: Strings) -> indexes.Indexes:
+        """
+        :param tconsts: tconsts of the file
+        :return: Indexes object whose indexes are read only views of the file
+        """
+        def posting(columns, start, end):
+            return Tconsts(columns[0][start:end], tconsts)
+
+        movie_indexes = indexes.Indexes()
+        movie_indexes.year_and_genre = self.table("year_and_genre", posting)
+        movie_indexes.runtime = self.table("runtime", lambda columns, start, end: (columns[1][start:end],
+                                                                                   posting(columns, start, end)))
+        movie_indexes.most_votes = self.table("most_votes", posting)
+        movie_indexes.top = self.table("top", posting)
+        contains = self.table("contains", posting)
+        if contains is not None:
+            postings = self.table("contains.postings", lambda columns, start, end: columns[0][start:end])
+            movie_indexes.contains = {title_type: (contains[title_type], postings.with_prefix(title_type))
+                                      for title_type in contains}
+        movie_indexes.stats = self.directory["stats"]
+        return movie_indexes
+
+
+def attach(path: str) -> tuple:
+    """
+    Function to attach to a shared dataset file.
+
+    :param path: path of the shared dataset file
+    :return: tuple(dictionary(view) of Movie objects, dictionary(view) of Rating objects, Indexes object)
+    """
+    dataset = SharedDataset(path)
+    store = dataset.store()
+    return columnar.ColumnarMovies(store), columnar.ColumnarRatings(store), dataset.indexes(store.tconsts)
+
+
+"""
+worker_datasets:
+    (movies, ratings, Indexes object) of the shared dataset a query worker process is attached to
+"""
+worker_datasets = None
+
+
+def attach_worker(path: str) -> None:
+    """
+    Function run once by every query worker process - attaches to the shared dataset file.
+    """
+    global worker_datasets
+    worker_datasets = attach(path)
+
+
+def answer_line(line: str) -> str:
+    """
+    Function run by the query worker processes - answers a query line.
+
+    :param line: query line
+    :return: the "processing:" line, the query output and the "elapsed time (s):" line of the query - "" for a line
+             that is not a query
+    """
+    query = query_processor.parse_query(line)
+    if query is None:
+        return ""
+    movies, ratings, movie_indexes = worker_datasets
+    return query_processor.answer_query(query, movies, ratings, movie_indexes)
+
+
+def process_queries(path: str, lines: list, workers: int) -> None:
+    """
+    Function to answer query lines with a pool of worker processes attached to a shared dataset file. The queries
+    run at the same time and their output is printed in the order of the lines.
+
+    :param path: path of the shared dataset file
+    :param lines: query lines
+    :param workers: number of worker processes
+    :return: None
+    """
+    context = multiprocessing.get_context("spawn")  # new processes, they don't inherit the loaded datasets
+    with ProcessPoolExecutor(workers, mp_context=context, initializer=attach_worker,
+                             initargs=(path,)) as executor:
+        for output in executor.map(answer_line, lines):
+            sys.stdout.write(output)
+            sys.stdout.flush()
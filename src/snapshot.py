@@ -0,0 +1,91 @@
+"""
+CSAPX Project 1: Movie
+
+In this project we worked with datasets from the IMDB website. We got
+experience reading in the data and using various structures and collections in Python to
+store, organize and efficiently query for different kinds of information relating to the movies
+and their ratings.
+
+***                                                                                                                 ***
+    This module contains the snapshot functions - a binary image of the parsed movies, ratings and indexes is written
+    next to the datasets so the next run can load it with one mmap instead of parsing the .tsv files again. A
+    snapshot records the size and modification time of every source dataset and is ignored once any of them change.
+***                                                                                                                 ***
+
+author: Miguel Reyes
+date: 09/26/21
+"""
+import gc
+import mmap
+import os
+import pickle
+
+MAGIC = b"MOVIESNAP"  # first bytes of every snapshot file
+VERSION = 5  # increase when the layout of the pickled objects changes, older snapshots are then ignored
+
+
+def snapshot_path(basics_filename: str) -> str:
+    """
+    :param basics_filename: file name of the movies dataset - e.g. "small.basics"
+    :return: path of the snapshot file of the dataset
+    """
+    return "data/" + basics_filename + ".snapshot"
+
+
+def source_stamps(paths: list) -> list:
+    """
+    :param paths: paths of the source datasets
+    :return: list of (path, size, modification time in ns) of every source dataset
+    """
+    stamps = list()
+    for path in paths:
+        stat = os.stat(path)
+        stamps.append((path, stat.st_size, stat.st_mtime_ns))
+    return stamps
+
+
+def write_snapshot(path: str, sources: list, options: dict, movies: dict, ratings: dict, indexes) -> None:
+    """
+    Function to write the snapshot file. The file is written next to its final path and then renamed so a reader
+    never sees a partially written snapshot.
+
+    :param path: path of the snapshot file
+    :param sources: paths of the source datasets the movies and ratings were read from
+    :param options: options the datasets were loaded with - a snapshot is only used with the same options
+    :param movies: dictionary of Movie objects
+    :param ratings: dictionary of Rating objects
+    :param indexes: Indexes object
+    :return: None
+    """
+    header = {"version": VERSION, "sources": source_stamps(sources), "options": options}
+    temporary_path = path + ".tmp"
+    with open(temporary_path, "wb") as f:
+        f.write(MAGIC)
+        pickle.dump(header, f, protocol=pickle.HIGHEST_PROTOCOL)
+        pickle.dump((movies, ratings, indexes), f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporary_path, path)
+
+
+def read_snapshot(path: str, sources: list, options: dict):
+    """
+    Function to read the snapshot file.
+
+    :param path: path of the snapshot file
+    :param sources: paths of the source datasets
+    :param options: options the datasets are being loaded with
+    :return: tuple(movies, ratings, indexes) or None if there is no snapshot or it is out of date
+    """
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as image:
+        if image.read(len(MAGIC)) != MAGIC:
+            return None
+        header = pickle.load(image)
+        if header["version"] != VERSION or header["options"] != options or \
+                header["sources"] != source_stamps(sources):
+            return None
+        gc.disable()  # unpickling millions of objects is much faster without the garbage collector running
+        try:
+            return pickle.load(image)
+        finally:
+            gc.enable()
@@ -0,0 +1,319 @@
+"""
+CSAPX Project 1: Movie
+
+In this project we worked with datasets from the IMDB website. We got
+experience reading in the data and using various structures and collections in Python to
+store, organize and efficiently query for different kinds of information relating to the movies
+and their ratings.
+
+***                                                                                                                 ***
+    This module contains the SQLite store - an alternative to keeping the datasets in memory. The datasets are bulk
+    imported (batched inserts in a single transaction) into a local SQLite file with indexes matching the filter and
+    sort keys of the queries, and every query runs as one indexed SQL query that returns its result rows already in
+    output order. Only the rows a query displays are ever in memory, so memory stays flat however large the datasets
+    are. The movies and ratings are also available as read only dictionaries(views) of Movie and RatedMovie objects.
+***                                                                                                                 ***
+
+author: Miguel Reyes
+date: 09/26/21
+"""
+import json
+import os
+import sqlite3
+from collections.abc import Mapping
+import aggregate_cube
+import queries
+from movies_and_ratings import BUFFER_SIZE, Movie, RatedMovie, open_dataset, parse_movie_line, parse_rating_line
+from snapshot import source_stamps
+
+VERSION = 1  # increase when the schema changes, older databases are then imported again
+
+"""
+SCHEMA:
+    movies keep their dataset order in row, ratings keep their ratings dataset order in row. The text columns hold
+    the field variables exactly as read, year and runtime are start_year and runtime_minutes as ints. Ratings also
+    hold the title_type and year of their movie so the rating indexes cover the filters of MOST_VOTES and TOP.
+"""
+SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE movies (
+    row INTEGER PRIMARY KEY,
+    tconst TEXT NOT NULL UNIQUE,
+    title_type TEXT NOT NULL,
+    primary_title TEXT NOT NULL,
+    start_year TEXT NOT NULL,
+    runtime_minutes TEXT NOT NULL,
+    genres TEXT NOT NULL,
+    year INTEGER NOT NULL,
+    runtime INTEGER NOT NULL
+);
+CREATE TABLE ratings (
+    row INTEGER PRIMARY KEY,
+    tconst TEXT NOT NULL UNIQUE,
+    avg_rating TEXT NOT NULL,
+    num_votes TEXT NOT NULL,
+    average REAL NOT NULL,
+    votes INTEGER NOT NULL,
+    title_type TEXT NOT NULL,
+    year INTEGER NOT NULL
+);
+"""
+
+"""
+INDEXES:
+    created once the rows are imported - YEAR_AND_GENRE and CONTAINS use movies_year, RUNTIME movies_runtime,
+    MOST_VOTES ratings_votes and TOP ratings_year
+"""
+INDEXES = """
+CREATE INDEX movies_year ON movies (title_type, start_year);
+CREATE INDEX movies_runtime ON movies (title_type, runtime);
+CREATE INDEX ratings_votes ON ratings (title_type, votes);
+CREATE INDEX ratings_year ON ratings (title_type, year);
+"""
+
+INSERT_MOVIE = """
+INSERT INTO movies (tconst, title_type, primary_title, start_year, runtime_minutes, genres, year, runtime)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (tconst) DO UPDATE SET title_type = excluded.title_type, primary_title = excluded.primary_title,
+    start_year = excluded.start_year, runtime_minutes = excluded.runtime_minutes, genres = excluded.genres,
+    year = excluded.year, runtime = excluded.runtime
+"""
+
+INSERT_RATING = """
+INSERT INTO ratings (tconst, avg_rating, num_votes, average, votes, title_type, year)
+SELECT ?, ?, ?, ?, ?, title_type, year FROM movies WHERE tconst = ?
+ON CONFLICT (tconst) DO UPDATE SET avg_rating = excluded.avg_rating, num_votes = excluded.num_votes,
+    average = excluded.average, votes = excluded.votes
+"""
+
+MOVIE_COLUMNS = "m.tconst, m.title_type, m.primary_title, m.start_year, m.runtime_minutes, m.genres"
+RATING_COLUMNS = "r.tconst, r.avg_rating, r.num_votes, " + MOVIE_COLUMNS + ", r.average, r.votes, r.year"
+RATINGS_JOIN = " FROM ratings r JOIN movies m ON m.tconst = r.tconst"
+
+
+def database_path(basics_filename: str) -> str:
+    """
+    :param basics_filename: file name of the movies dataset - e.g. "small.basics"
+    :return: path of the SQLite file of the dataset
+    """
+    return "data/" + basics_filename + ".sqlite"
+
+
+def execute_script(connection: sqlite3.Connection, script: str) -> None:
+    """
+    Function to run the statements of a script inside the open transaction (executescript would commit it first).
+    """
+    for statement in script.split(";"):
+        if statement.strip():
+            connection.execute(statement)
+
+
+def import_datasets(path: str, sources: list, basics_filename: str, ratings_filename: str) -> None:
+    """
+    Function to import both datasets into a new SQLite file - same rules as movies_and_ratings.read_movie_dataset
+    and read_rating_dataset. The file is written next to its final path and then renamed, a crash never leaves a
+    partially imported file behind.
+
+    :param path: path of the SQLite file
+    :param sources: paths of the source datasets
+    :param basics_filename: file name of the movies dataset
+    :param ratings_filename: file name of the ratings dataset
+    :return: None
+    """
+    temporary_path = path + ".tmp"
+    if os.path.exists(temporary_path):
+        os.remove(temporary_path)
+    connection = sqlite3.connect(temporary_path, isolation_level=None)
+    try:
+        connection.execute("PRAGMA journal_mode = OFF")  # the file is thrown away if the import fails
+        connection.execute("PRAGMA synchronous = OFF")
+        connection.execute("BEGIN")
+        execute_script(connection, SCHEMA)
+        with open_dataset(basics_filename) as f:
+            next(f)  # skips header line
+            while True:
+                lines = f.readlines(BUFFER_SIZE)
+                if not lines:
+                    break
+                connection.executemany(INSERT_MOVIE, [data_fields + (int(data_fields[3]), int(data_fields[4]))
+                                                      for data_fields in map(parse_movie_line, lines)
+                                                      if data_fields is not None])
+        with open_dataset(ratings_filename) as f:
+            next(f)  # skips header line
+            while True:
+                lines = f.readlines(BUFFER_SIZE)
+                if not lines:
+                    break
+                # ratings of movies we don't have select no row and are not inserted
+                connection.executemany(INSERT_RATING, [(tconst, avg_rating, num_votes, float(avg_rating),
+                                                        int(num_votes), tconst)
+                                                       for tconst, avg_rating, num_votes in
+                                                       map(parse_rating_line, lines)])
+        execute_script(connection, INDEXES)
+        connection.execute("INSERT INTO meta VALUES ('header', ?)",
+                           (json.dumps({"version": VERSION, "sources": source_stamps(sources)}),))
+        connection.execute("COMMIT")
+        connection.execute("ANALYZE")
+    finally:
+        connection.close()
+    os.replace(temporary_path, path)
+
+
+def is_current(path: str, sources: list) -> bool:
+    """
+    :param path: path of the SQLite file
+    :param sources: paths of the source datasets
+    :return: True if the file was imported from the current source datasets by this VERSION
+    """
+    if not os.path.exists(path):
+        return False
+    connection = sqlite3.connect("file:" + path + "?mode=ro", uri=True)
+    try:
+        row = connection.execute("SELECT value FROM meta WHERE key = 'header'").fetchone()
+    except sqlite3.DatabaseError:
+        return False
+    finally:
+        connection.close()
+    if row is None:
+        return False
+    header = json.loads(row[0])
+    return header["version"] == VERSION and header["sources"] == [list(stamp) for stamp in source_stamps(sources)]
+
+
+def make_rating(row: tuple) -> RatedMovie:
+    """
+    :param row: row of RATING_COLUMNS
+    :return: RatedMovie object of the row
+    """
+    return RatedMovie(row[0], row[1], row[2], Movie(*row[3:9]), row[9], row[10], row[11])
+
+
+class SqliteMovies(Mapping):
+    """A read only dictionary of tconst -> Movie object backed by the movies table, in dataset order."""
+
+    def __init__(self, connection: sqlite3.Connection):
+        self.connection = connection
+
+    def __getitem__(self, tconst: str) -> Movie:
+        row = self.connection.execute("SELECT " + MOVIE_COLUMNS + " FROM movies m WHERE m.tconst = ?",
+                                      (tconst,)).fetchone()
+        if row is None:
+            raise KeyError(tconst)
+        return Movie(*row)
+
+    def __contains__(self, tconst) -> bool:
+        return self.connection.execute("SELECT 1 FROM movies WHERE tconst = ?", (tconst,)).fetchone() is not None
+
+    def __iter__(self):
+        return (row[0] for row in self.connection.execute("SELECT tconst FROM movies ORDER BY row"))
+
+    def __len__(self) -> int:
+        return self.connection.execute("SELECT count(*) FROM movies").fetchone()[0]
+
+    def values(self):
+        return (Movie(*row) for row in self.connection.execute("SELECT " + MOVIE_COLUMNS + " FROM movies m "
+                                                               "ORDER BY m.row"))
+
+
+class SqliteRatings(Mapping):
+    """A read only dictionary of tconst -> RatedMovie object backed by the ratings table, in ratings dataset order."""
+
+    def __init__(self, connection: sqlite3.Connection):
+        self.connection = connection
+
+    def __getitem__(self, tconst: str) -> RatedMovie:
+        row = self.connection.execute("SELECT " + RATING_COLUMNS + RATINGS_JOIN + " WHERE r.tconst = ?",
+                                      (tconst,)).fetchone()
+        if row is None:
+            raise KeyError(tconst)
+        return make_rating(row)
+
+    def __contains__(self, tconst) -> bool:
+        return self.connection.execute("SELECT 1 FROM ratings WHERE tconst = ?", (tconst,)).fetchone() is not None
+
+    def __iter__(self):
+        return (row[0] for row in self.connection.execute("SELECT tconst FROM ratings ORDER BY row"))
+
+    def __len__(self) -> int:
+        return self.connection.execute("SELECT count(*) FROM ratings").fetchone()[0]
+
+    def values(self):
+        return map(make_rating, self.connection.execute("SELECT " + RATING_COLUMNS + RATINGS_JOIN + " ORDER BY r.row"))
+
+
+def open_store(path: str) -> tuple:
+    """
+    :param path: path of the SQLite file
+    :return: tuple(dictionary(view) of Movie objects, dictionary(view) of RatedMovie objects)
+    """
+    connection = sqlite3.connect("file:" + path + "?mode=ro", uri=True)
+    return SqliteMovies(connection), SqliteRatings(connection)
+
+
+def run_query(query: tuple, movies: SqliteMovies, cache=None, out=None) -> None:
+    """
+    Function to answer a query with one SQL query - the rows it returns, already in output order, are printed by the
+    query function of queries.py (handed to it as a one key index with a dictionary of the rows found).
+
+    :param query: tuple of the query values
+    :param movies: SqliteMovies object
+    :param cache: LineCache object of formatted movie lines
+    :param out: text file the query output is written to - sys.stdout when None
+    :return: None
+    """
+    connection = movies.connection
+    query_type, title_type = query[0], query[1]
+    if query_type == "LOOKUP":
+        ratings = {row[0]: make_rating(row) for row in
+                   connection.execute("SELECT " + RATING_COLUMNS + RATINGS_JOIN + " WHERE r.tconst = ?", (title_type,))}
+        queries.lookup(title_type, {tconst: rating.movie for tconst, rating in ratings.items()}, ratings, cache, out)
+    elif query_type == "CONTAINS":
+        found = {row[0]: Movie(*row) for row in
+                 connection.execute("SELECT " + MOVIE_COLUMNS + " FROM movies m WHERE m.title_type = ? AND "
+                                    "instr(m.primary_title, ?) > 0 ORDER BY m.row", (title_type, query[2]))}
+        queries.contains(title_type, query[2], found, None, cache, out)  # scans only the movies found
+    elif query_type == "YEAR_AND_GENRE":
+        year, genre = query[2], query[3]
+        rows = list()
+        if "," not in genre:  # genres are matched as whole words of the comma separated genres
+            rows = connection.execute("SELECT " + MOVIE_COLUMNS + " FROM movies m WHERE m.title_type = ? AND "
+                                      "m.start_year = ? AND instr(',' || m.genres || ',', ',' || ? || ',') > 0 "
+                                      "ORDER BY m.primary_title, m.row", (title_type, year, genre)).fetchall()
+        found = {row[0]: Movie(*row) for row in rows}
+        queries.year_and_genre(title_type, year, genre, found, {(title_type, year, genre): list(found)}, cache, out)
+    elif query_type == "RUNTIME":
+        rows = connection.execute("SELECT " + MOVIE_COLUMNS + ", m.runtime FROM movies m WHERE m.title_type = ? AND "
+                                  "m.runtime BETWEEN ? AND ? ORDER BY m.runtime DESC, m.primary_title, m.row",
+                                  (title_type, int(query[2]), int(query[3]))).fetchall()
+        found = {row[0]: Movie(*row[:6]) for row in rows}
+        index = {title_type: ([-row[6] for row in rows], list(found))}
+        queries.runtime(title_type, query[2], query[3], found, index, cache, out)
+    elif query_type == "MOST_VOTES":
+        found = {row[0]: make_rating(row) for row in
+                 connection.execute("SELECT " + RATING_COLUMNS + RATINGS_JOIN + " WHERE r.title_type = ? "
+                                    "ORDER BY r.votes DESC, m.primary_title, r.row LIMIT ?",
+                                    (title_type, int(query[2])))}  # a negative LIMIT keeps every row
+        queries.most_votes(title_type, query[2], None, found, {title_type: list(found)}, cache, out)
+    elif query_type == "TOP":
+        index = dict()
+        found = dict()
+        for row in connection.execute("SELECT * FROM (SELECT " + RATING_COLUMNS + ", row_number() OVER (PARTITION BY "
+                                      "r.year ORDER BY r.average DESC, r.votes DESC, m.primary_title, r.row) AS rank" +
+                                      RATINGS_JOIN + " WHERE r.title_type = ? AND r.year BETWEEN ? AND ? AND "
+                                      "r.votes >= 1000) WHERE ? < 0 OR rank <= ? ORDER BY year, rank",
+                                      (title_type, int(query[3]), int(query[4]), int(query[2]), int(query[2]))):
+            rating = found[row[0]] = make_rating(row)
+            index.setdefault((title_type, rating.year), list()).append(rating.tconst)
+        queries.top(title_type, query[2], query[3], query[4], None, found, index, cache, out)
+    elif query_type == "STATS":
+        genre = aggregate_cube.genre_key(query[4])
+        rows = list()
+        if genre is None or "," not in genre:
+            rows = connection.execute("SELECT r.tconst, r.avg_rating, r.num_votes, " + MOVIE_COLUMNS + ", r.average, "
+                                      "r.votes, r.year FROM movies m LEFT JOIN ratings r ON r.tconst = m.tconst "
+                                      "WHERE m.title_type = ? AND m.year BETWEEN ? AND ? AND (? IS NULL OR "
+                                      "instr(',' || m.genres || ',', ',' || ? || ',') > 0) ORDER BY m.row",
+                                      (title_type, int(query[2]), int(query[3]), genre, genre)).fetchall()
+        found = {row[3]: Movie(*row[3:9]) for row in rows}
+        ratings = {row[0]: make_rating(row) for row in rows if row[0] is not None}
+        queries.stats(title_type, query[2], query[3], query[4], found, ratings, None, cache, out)  # aggregates them
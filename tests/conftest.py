@@ -0,0 +1,111 @@
+import os
+import subprocess
+import sys
+import pytest
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+sys.path.insert(0, SRC)
+
+BASICS_HEADER = "tconst\ttitleType\tprimaryTitle\toriginalTitle\tisAdult\tstartYear\tendYear\truntimeMinutes\tgenres\n"
+BASICS_ROWS = [
+    "tt0000001\tmovie\tThe Big Sleep\tThe Big Sleep\t0\t1994\t\\N\t120\tDrama,Comedy\n",
+    "tt0000002\tmovie\tBig Night\tBig Night\t0\t1994\t\\N\t95\tComedy\n",
+    "tt0000003\tshort\tBig\tBig\t0\t1994\t\\N\t12\tComedy,Music\n",
+    "tt0000004\tmovie\tMusical Big\tMusical Big\t0\t1995\t\\N\t\\N\tMusical\n",
+    "tt0000005\tmovie\tAdult Big\tAdult Big\t1\t1994\t\\N\t90\tDrama\n",
+    "tt0000006\tmovie\tAnother Movie\tAnother Movie\t0\t\\N\t\\N\t100\t\\N\n",
+    "tt0000007\ttvSeries\tBig Show\tBig Show\t0\t1994\t1999\t30\tComedy\n",
+    "tt0000008\tmovie\tAlpha\tAlpha\t0\t1995\t\\N\t120\tDrama\n",
+    "tt0000009\tmovie\tAlpha\tAlpha\t0\t1995\t\\N\t120\tDrama\n",
+    "tt0000011\tmovie\tZeta Big\tZeta Big\t0\t1994\t\\N\t95\tMusic,Drama\n",
+    "tt0000010\tmovie\tOut of Order\tOut of Order\t0\t1996\t\\N\t88\tDrama\n",
+    "tt0000012\tshort\tAb\tAb\t0\t1995\t\\N\t5\tMusic\n",
+    "tt0000013\tmovie\tBig Alpha\tBig Alpha\t0\t1996\t\\N\t95\tComedy\n",
+]
+RATINGS_HEADER = "tconst\taverageRating\tnumVotes\n"
+RATINGS_ROWS = [
+    "tt0000001\t8.1\t1500\n",
+    "tt0000002\t8.1\t1500\n",
+    "tt0000003\t6.0\t2000\n",
+    "tt0000004\t7.3\t1000\n",
+    "tt0000005\t9.9\t99999\n",
+    "tt0000007\t7.0\t300\n",
+    "tt0000008\t5.5\t1200\n",
+    "tt0000009\t5.5\t1200\n",
+    "tt0000011\t8.1\t1800\n",
+    "tt0000010\t6.6\t10\n",
+    "tt0000012\t9.0\t5\n",
+]
+
+QUERIES = [
+    "LOOKUP tt0000001", "LOOKUP tt0000006", "LOOKUP tt0000005", "LOOKUP tt9999999",
+    "CONTAINS movie Big", "CONTAINS movie Alpha", "CONTAINS short Ab", "CONTAINS movie g N",
+    "CONTAINS tvSeries Nothing Here",
+    "YEAR_AND_GENRE movie 1994 Comedy", "YEAR_AND_GENRE movie 1994 Music", "YEAR_AND_GENRE movie 1995 Drama",
+    "YEAR_AND_GENRE movie 0 None", "YEAR_AND_GENRE tvSeries 2000 Drama",
+    "RUNTIME movie 90 120", "RUNTIME movie 0 0", "RUNTIME short 1 20", "RUNTIME movie 500 600",
+    "MOST_VOTES movie 3", "MOST_VOTES movie 20", "MOST_VOTES short 5", "MOST_VOTES nope 2", "MOST_VOTES movie -2",
+    "TOP movie 2 1994 1995", "TOP movie 10 1990 2000", "TOP short 1 1994 1994", "TOP movie 0 1994 1995",
+    "TOP movie -1 1994 1996",  # a negative count keeps every movie, like the original display loop
+    "STATS movie 1994 1996 ALL", "STATS movie 1994 1995 Drama", "STATS short 1990 1999 Music",
+    "STATS movie 0 0 None", "STATS nope 2000 2001 ALL",
+    "RUNTIME movie 090 120", "CONTAINS movie Big",  # answered again (from the result cache when it is on)
+]
+
+
+def write_small_datasets(path, basics_rows=BASICS_ROWS, ratings_rows=RATINGS_ROWS):
+    """
+    Function to write the tiny datasets as data/small.basics.tsv and data/small.ratings.tsv under path.
+    """
+    os.makedirs(os.path.join(path, "data"), exist_ok=True)
+    with open(os.path.join(path, "data", "small.basics.tsv"), "w", encoding="utf-8") as f:
+        f.write(BASICS_HEADER + "".join(basics_rows))
+    with open(os.path.join(path, "data", "small.ratings.tsv"), "w", encoding="utf-8") as f:
+        f.write(RATINGS_HEADER + "".join(ratings_rows))
+
+
+def answers(output: str) -> list:
+    """
+    :param output: output of movies_main.py or of query_processor.answer_query
+    :return: lines of the query output - from the first "processing:" line on, without elapsed times or blank lines
+    """
+    lines = output.split("\n")
+    start = next((i for i, line in enumerate(lines) if line.startswith("processing:")), len(lines))
+    return [line for line in lines[start:] if line != "" and not line.startswith("elapsed time")]
+
+
+def run_main(path, options: list, lines: list = QUERIES) -> list:
+    """
+    Function to run movies_main.py on the small datasets under path.
+
+    :param path: directory of the data directory
+    :param options: command line options
+    :param lines: lines of standard input
+    :return: answers of the output
+    """
+    completed = subprocess.run([sys.executable, os.path.join(SRC, "movies_main.py"), "small"] + options,
+                               input="".join(line + "\n" for line in lines), capture_output=True, text=True,
+                               cwd=path, check=True)
+    return answers(completed.stdout)
+
+
+@pytest.fixture(scope="session")
+def small_datasets(tmp_path_factory):
+    """directory with the tiny datasets, shared by the tests that only read them"""
+    path = tmp_path_factory.mktemp("small")
+    write_small_datasets(path)
+    return path
+
+
+@pytest.fixture(scope="session")
+def expected_answers(small_datasets):
+    """answers of the plain dictionaries without indexes - what every other path has to print"""
+    return run_main(small_datasets, ["--no-indexes"])
+
+
+@pytest.fixture
+def datasets_dir(tmp_path, monkeypatch):
+    """working directory with its own copy of the tiny datasets"""
+    write_small_datasets(tmp_path)
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
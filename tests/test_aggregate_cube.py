@@ -0,0 +1,50 @@
+from decimal import Decimal
+import aggregate_cube
+import movies_and_ratings
+
+
+def cells(cube: dict) -> dict:
+    return {key: (cell.movies, cell.rated, cell.rating_total, cell.votes, cell.runtimes) for key, cell in cube.items()}
+
+
+def load() -> tuple:
+    movies = movies_and_ratings.read_movie_dataset("small.basics")
+    return movies, movies_and_ratings.read_rating_dataset("small.ratings", movies)
+
+
+def test_percentiles_use_the_nearest_rank():
+    aggregate = aggregate_cube.Aggregate()
+    assert aggregate.percentiles() == [None, None, None, None]
+    for runtime in (30, 10, 20, 0, 20):  # movies without a runtime are left out
+        aggregate.add(runtime, None)
+    assert aggregate.movies == 5
+    assert aggregate.percentiles() == [10, 20, 20, 30]
+    assert aggregate.percentiles((0, 100)) == [10, 30]
+    aggregate.add(20, None, -1)
+    aggregate.add(20, None, -1)
+    assert aggregate.runtimes == {10: 1, 30: 1}
+    assert aggregate.percentiles((50,)) == [10]
+
+
+def test_subtracted_movies_leave_the_cube_of_the_others(datasets_dir):
+    movies, ratings = load()
+    cube = aggregate_cube.build_cube(movies, ratings)
+    for tconst in ("tt0000011", "tt0000006"):
+        aggregate_cube.add_movie(cube, movies[tconst], ratings.get(tconst), -1)
+        del movies[tconst]
+        ratings.pop(tconst, None)
+    assert cells(cube) == cells(aggregate_cube.build_cube(movies, ratings))
+
+
+def test_rollup_adds_up_the_years(datasets_dir):
+    movies, ratings = load()
+    cube = aggregate_cube.build_cube(movies, ratings)
+    total = aggregate_cube.rollup((year, cube[("movie", year, None)]) for year in (1994, 1995, 1996))
+    expected = aggregate_cube.Aggregate()
+    for movie in movies.values():
+        if movie.title_type == "movie" and 1994 <= int(movie.start_year) <= 1996:
+            expected.add(int(movie.runtime_minutes), ratings.get(movie.tconst))
+    assert cells({"total": total}) == cells({"total": expected})
+    assert total.average_rating() == expected.rating_total / expected.rated
+    assert aggregate_cube.Aggregate().average_rating() is None
+    assert cube[("movie", 1994, "Drama")].rating_total == Decimal("16.2")
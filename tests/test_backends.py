@@ -0,0 +1,64 @@
+import pytest
+from conftest import QUERIES, run_main, write_small_datasets
+import columnar
+import lazy_loader
+import movies_and_ratings
+
+OPTIONS = [
+    ["--columnar"],
+    ["--columnar", "--no-indexes"],
+    [],
+    ["--workers", "2"],
+    ["--workers", "2", "--columnar"],
+    ["--batch"],
+    ["--batch", "--no-indexes"],
+    ["--batch", "--columnar", "--no-indexes"],
+    ["--line-cache-entries", "1"],
+    ["--cache-entries", "4"],
+    ["--cache-entries", "4", "--cache-bytes", "200", "--no-indexes"],
+    ["--backend", "numpy"],
+    ["--backend", "numpy", "--columnar"],
+    ["--query-workers", "2"],
+    ["--query-workers", "2", "--no-indexes"],
+    ["--lazy"],
+    ["--lazy", "--no-indexes"],
+    ["--lazy", "--columnar", "--no-indexes"],
+    ["--batch", "--lazy", "--no-indexes"],
+    ["--scan-workers", "2", "--no-indexes"],
+    ["--scan-workers", "2", "--columnar", "--no-indexes"],
+    ["--scan-workers", "2", "--lazy", "--no-indexes"],
+    ["--scan-workers", "2", "--batch", "--no-indexes"],
+    ["--sqlite"],
+]
+
+
+@pytest.mark.parametrize("options", OPTIONS, ids=" ".join)
+def test_same_answers_as_plain_dictionaries(small_datasets, expected_answers, options):
+    if "numpy" in options:
+        pytest.importorskip("numpy")
+    assert run_main(small_datasets, options) == expected_answers
+
+
+@pytest.mark.parametrize("options", [[], ["--columnar"], ["--no-indexes"]], ids=" ".join)
+def test_snapshot_answers_the_same_once_written(tmp_path, expected_answers, options):
+    write_small_datasets(tmp_path)
+    assert run_main(tmp_path, ["--snapshot"] + options) == expected_answers  # writes the snapshot
+    assert (tmp_path / "data" / "small.basics.snapshot").exists()
+    assert run_main(tmp_path, ["--snapshot"] + options) == expected_answers  # reads it
+
+
+@pytest.mark.parametrize("options", [[], ["--columnar"], ["--sqlite"]], ids=" ".join)
+def test_bulk_lookup_prints_the_lookup_lines(small_datasets, options):
+    lookups = [line for line in QUERIES if line.startswith("LOOKUP")]
+    tconsts = [line.split()[1] for line in lookups]
+    assert run_main(small_datasets, ["--lookup", "-"] + options, tconsts) == \
+        run_main(small_datasets, ["--no-indexes"], lookups)
+
+
+@pytest.mark.parametrize("start, end", [(0, None), (2, 9), (5, 5), (9, 12)])
+def test_values_of_types_reads_only_the_row_range(datasets_dir, start, end):
+    expected = list(movies_and_ratings.read_movie_dataset("small.basics").values())[start:end]
+    expected = [movie for movie in expected if movie.title_type in ("movie", "short")]
+    for movies in (columnar.read_columnar_movie_dataset("small.basics"),
+                   lazy_loader.read_lazy_movie_dataset("small.basics")):
+        assert list(movies.values_of_types({"movie", "short"}, start, end)) == expected
@@ -0,0 +1,60 @@
+import json
+import os
+import subprocess
+import sys
+from conftest import QUERIES, SRC
+import generate_dataset
+import movies_and_ratings
+
+
+def test_generate_is_repeatable(tmp_path):
+    paths = list()
+    for name, seed in (("a", 7), ("b", 7), ("c", 8)):
+        basics_path, ratings_path = str(tmp_path / (name + ".basics.tsv")), str(tmp_path / (name + ".ratings.tsv"))
+        generate_dataset.generate(500, basics_path, ratings_path, seed)
+        with open(basics_path, "rb") as basics, open(ratings_path, "rb") as ratings:
+            paths.append((basics.read(), ratings.read()))
+    assert paths[0] == paths[1]
+    assert paths[0] != paths[2]
+    assert paths[0][0].count(b"\n") == 501
+
+
+def test_generated_datasets_load(tmp_path, monkeypatch):
+    (tmp_path / "data").mkdir()
+    monkeypatch.chdir(tmp_path)
+    generate_dataset.generate(500, "data/g.basics.tsv", "data/g.ratings.tsv")
+    movies = movies_and_ratings.read_movie_dataset("g.basics")
+    ratings = movies_and_ratings.read_rating_dataset("g.ratings", movies)
+    assert 0 < len(ratings) < len(movies) <= 500
+
+
+def run_benchmark(path):
+    return subprocess.run([sys.executable, os.path.join(SRC, "benchmark.py"), "small", "--repeat", "2",
+                           "--json", "results.json"], capture_output=True, text=True, cwd=path)
+
+
+def test_benchmark_checks_the_reference_output(datasets_dir):
+    (datasets_dir / "input").mkdir()
+    (datasets_dir / "input" / "all.txt").write_text("".join(line + "\n" for line in QUERIES), encoding="utf-8")
+    reference = subprocess.run([sys.executable, os.path.join(SRC, "movies_main.py"), "small"],
+                               input="".join(line + "\n" for line in QUERIES), capture_output=True, text=True,
+                               cwd=datasets_dir, check=True).stdout
+    (datasets_dir / "output" / "small").mkdir(parents=True)
+    reference_path = datasets_dir / "output" / "small" / "all-small-out.txt"
+    reference_path.write_text(reference, encoding="utf-8")
+
+    completed = run_benchmark(datasets_dir)
+    assert completed.returncode == 0, completed.stdout + completed.stderr
+    results = json.loads((datasets_dir / "results.json").read_text(encoding="utf-8"))
+    assert results["checked"] == len(QUERIES)
+    assert results["mismatches"] == []
+    assert results["queries"]["LOOKUP"]["count"] == 2 * sum(line.startswith("LOOKUP") for line in QUERIES)
+    assert "queries match" in completed.stdout
+
+    reference_path.write_text(reference.replace("Big Night", "Small Night"), encoding="utf-8")
+    completed = run_benchmark(datasets_dir)
+    assert completed.returncode == 1
+    results = json.loads((datasets_dir / "results.json").read_text(encoding="utf-8"))
+    assert "all: processing: CONTAINS movie Big" in results["mismatches"]
+    assert "all: processing: LOOKUP tt0000001" not in results["mismatches"]
+    assert "queries DIFFER" in completed.stdout
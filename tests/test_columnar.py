@@ -0,0 +1,28 @@
+import random
+import columnar
+
+
+def test_tconst_keys_keep_every_tconst():
+    tconsts = ["tt0000001", "tt9999999", "tt12345678", "x12", "tt01", "tt0000002"]
+    assert list(columnar.TconstKeys(tconsts)) == tconsts
+
+
+def test_tconst_rows_merges_keys_added_out_of_order(monkeypatch):
+    monkeypatch.setattr(columnar, "MERGE_SIZE", 4)
+    tconsts = ["tt%07d" % number for number in random.Random(7).sample(range(1, 500), 200)] + ["x12", "tt01"]
+    rows = columnar.TconstRows()
+    merged = 0
+    for row, tconst in enumerate(tconsts):
+        pending = len(rows.pending)
+        rows.add(tconst, row)
+        merged += len(rows.pending) < pending
+    expected = {tconst: row for row, tconst in enumerate(tconsts)}
+
+    assert merged > 0
+    assert list(rows.keys) == sorted(rows.keys)
+    assert dict(rows.items()) == expected
+    assert rows.find_all(tconsts + ["tt0000000", "tt0000500", "nope"]) == list(range(len(tconsts))) + [None] * 3
+    rows.merge()
+    assert len(rows.pending) == 0
+    assert dict(rows.items()) == expected
+    assert "tt0000000" not in rows and rows.get("tt0000000", -1) == -1
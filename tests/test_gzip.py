@@ -0,0 +1,42 @@
+import gzip
+import os
+import pytest
+import columnar
+import movies_and_ratings
+import parallel_loader
+
+
+def gzip_datasets(path):
+    """
+    Function to replace data/small.basics.tsv and data/small.ratings.tsv under path with gzipped copies.
+    """
+    for name in ("small.basics.tsv", "small.ratings.tsv"):
+        plain = os.path.join(path, "data", name)
+        with open(plain, "rb") as f, gzip.open(plain + ".gz", "wb") as out:
+            out.write(f.read())
+        os.remove(plain)
+
+
+def plain_datasets():
+    movies = movies_and_ratings.read_movie_dataset("small.basics")
+    return movies, movies_and_ratings.read_rating_dataset("small.ratings", movies)
+
+
+def test_sequential_loader_reads_gzipped_datasets(datasets_dir):
+    expected_movies, expected_ratings = plain_datasets()
+    gzip_datasets(datasets_dir)
+    assert movies_and_ratings.dataset_path("small.basics").endswith(".tsv.gz")
+    movies, ratings = plain_datasets()
+    assert list(movies.items()) == list(expected_movies.items())
+    assert list(ratings.items()) == list(expected_ratings.items())
+    movies = columnar.read_columnar_movie_dataset("small.basics")
+    assert list(movies.values()) == list(expected_movies.values())
+
+
+@pytest.mark.parametrize("use_columnar", [False, True])
+def test_parallel_loader_reads_gzipped_datasets(datasets_dir, use_columnar):
+    expected_movies, expected_ratings = plain_datasets()
+    gzip_datasets(datasets_dir)
+    movies, ratings = parallel_loader.read_datasets_parallel("small.basics", "small.ratings", 2, use_columnar)
+    assert list(movies.items()) == list(expected_movies.items())
+    assert list(ratings.items()) == list(expected_ratings.items())
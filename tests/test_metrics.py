@@ -0,0 +1,79 @@
+import json
+import os
+import subprocess
+import sys
+import pytest
+from conftest import SRC, run_main
+import metrics
+
+
+def test_histogram_buckets_and_quantiles():
+    histogram = metrics.Histogram()
+    for seconds in (metrics.BUCKETS[0] / 2, metrics.BUCKETS[0] / 2, metrics.BUCKETS[-1] * 2):
+        histogram.observe(seconds)
+    assert histogram.count == 3
+    assert histogram.counts[0] == 2 and histogram.counts[-1] == 1
+    assert histogram.quantile(0.5) == metrics.BUCKETS[0]
+    assert histogram.quantile(0.99) == histogram.maximum == metrics.BUCKETS[-1] * 2
+
+
+def test_disabled_registry_records_nothing():
+    registry = metrics.Metrics()
+    with registry.span("query.LOOKUP"):
+        pass
+    registry.count("lookup.rows_scanned")
+    registry.snapshot_memory("loaded")
+    assert registry.to_dict() == {"spans": {}, "counters": {}, "memory": []}
+
+
+def test_json_and_prometheus_export():
+    registry = metrics.Metrics()
+    registry.enabled = True
+    registry.observe("query.TOP", metrics.BUCKETS[0] / 2)
+    registry.observe("query.TOP", metrics.BUCKETS[-1] * 2)
+    registry.count("top.rows_scanned", 7)
+    registry.count("top.rows_scanned", 3)
+    registry.memory.append(("loaded", 100, 200))
+
+    exported = json.loads(registry.to_json())
+    assert exported["counters"] == {"top.rows_scanned": 10}
+    assert exported["memory"] == [{"label": "loaded", "rss_bytes": 100, "peak_rss_bytes": 200}]
+    span = exported["spans"]["query.TOP"]
+    assert span["count"] == 2
+    assert list(span["buckets"]) == [str(bound) for bound in metrics.BUCKETS] + ["+Inf"]
+    assert sum(span["buckets"].values()) == 2
+
+    lines = registry.to_prometheus().splitlines()
+    assert lines[0] == "# TYPE movies_span_seconds histogram"
+    buckets = [line for line in lines if line.startswith('movies_span_seconds_bucket{span="query.TOP"')]
+    assert len(buckets) == len(metrics.BUCKETS) + 1
+    assert buckets[0] == 'movies_span_seconds_bucket{span="query.TOP",le="%s"} 1' % metrics.BUCKETS[0]
+    assert buckets[-1] == 'movies_span_seconds_bucket{span="query.TOP",le="+Inf"} 2'  # cumulative
+    assert 'movies_span_seconds_count{span="query.TOP"} 2' in lines
+    assert "# TYPE movies_rows_total counter" in lines
+    assert 'movies_rows_total{name="top.rows_scanned"} 10' in lines
+    assert 'movies_memory_bytes{label="loaded",kind="rss"} 100' in lines
+    assert 'movies_memory_bytes{label="loaded",kind="peak_rss"} 200' in lines
+
+
+@pytest.mark.parametrize("filename", ["metrics.json", "metrics.prom"])
+def test_main_writes_the_span_names(small_datasets, expected_answers, tmp_path, filename):
+    path = str(tmp_path / filename)
+    assert run_main(small_datasets, ["--no-indexes", "--metrics", path]) == expected_answers
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    if filename.endswith(".json"):
+        spans = json.loads(text)["spans"]
+    else:
+        spans = {line.split('"')[1] for line in text.splitlines() if line.startswith("movies_span_seconds_count")}
+    for name in ("load.movies", "load.ratings", "read_movie_dataset.parse", "query.LOOKUP", "query.CONTAINS",
+                 "query.YEAR_AND_GENRE", "query.RUNTIME", "query.MOST_VOTES", "query.TOP", "query.STATS"):
+        assert name in spans
+
+
+@pytest.mark.parametrize("options", [["--metrics", "metrics.json"], ["--profile", "TOP"]], ids=" ".join)
+def test_query_workers_reject_metrics(small_datasets, options):
+    completed = subprocess.run([sys.executable, os.path.join(SRC, "movies_main.py"), "small", "--query-workers", "2"]
+                               + options, input="", capture_output=True, text=True, cwd=small_datasets)
+    assert completed.returncode == 2
+    assert "--query-workers can't be combined with --metrics or --profile" in completed.stderr
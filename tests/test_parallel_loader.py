@@ -0,0 +1,51 @@
+import gzip
+import pytest
+import movies_and_ratings
+import parallel_loader
+
+BASICS = ("tconst\ttitleType\tprimaryTitle\toriginalTitle\tisAdult\tstartYear\tendYear\truntimeMinutes\tgenres\n"
+          "tt0000001\tmovie\tNext\x85Line\tNext\x85Line\t0\t1999\t\\N\t90\tDrama\n"
+          "tt0000002\tshort\tForm\x0cFeed   Separator\t-\t0\t2001\t\\N\t12\tComedy,Drama\n"
+          "tt0000003\tmovie\tPlain\tPlain\t0\t2001\t\\N\t\\N\t\\N\n")
+RATINGS = "tconst\taverageRating\tnumVotes\ntt0000001\t7.5\t1200\ntt0000003\t6.1\t40\n"
+
+
+def write_datasets(tmp_path):
+    (tmp_path / "data").mkdir()
+    (tmp_path / "data" / "t.basics.tsv").write_text(BASICS, encoding="utf-8")
+    (tmp_path / "data" / "t.ratings.tsv").write_text(RATINGS, encoding="utf-8")
+
+
+def test_read_lines_splits_only_on_line_breaks(tmp_path, monkeypatch):
+    write_datasets(tmp_path)
+    monkeypatch.chdir(tmp_path)
+    for columnar_store in (False, True):
+        movies, ratings = parallel_loader.read_datasets_parallel("t.basics", "t.ratings", 2, columnar_store)
+        expected_movies = movies_and_ratings.read_movie_dataset("t.basics")
+        expected_ratings = movies_and_ratings.read_rating_dataset("t.ratings", expected_movies)
+        assert list(movies.values()) == list(expected_movies.values())
+        assert list(ratings.values()) == list(expected_ratings.values())
+        assert movies["tt0000001"].primary_title == "Next\x85Line"
+
+
+@pytest.mark.parametrize("gzipped", [False, True], ids=["tsv", "gz"])
+def test_both_loaders_split_only_on_line_breaks(tmp_path, monkeypatch, gzipped):
+    basics = BASICS.replace("Plain\tPlain", "Carriage\rReturn\tCarriage\rReturn").replace("\n", "\r\n")
+    ratings = RATINGS.replace("\n", "\r\n")
+    (tmp_path / "data").mkdir()
+    for name, text in (("t.basics.tsv", basics), ("t.ratings.tsv", ratings)):
+        if gzipped:
+            with gzip.open(tmp_path / "data" / (name + ".gz"), "wb") as f:
+                f.write(text.encode("utf-8"))
+        else:
+            (tmp_path / "data" / name).write_bytes(text.encode("utf-8"))
+    monkeypatch.chdir(tmp_path)
+    expected_movies = movies_and_ratings.read_movie_dataset("t.basics")
+    expected_ratings = movies_and_ratings.read_rating_dataset("t.ratings", expected_movies)
+    assert expected_movies["tt0000003"].primary_title == "Carriage\rReturn"
+    assert expected_movies["tt0000003"].genres == "None"  # the \r of the \r\n is not part of the last field
+    assert expected_ratings["tt0000003"].num_votes == "40"
+    for columnar_store in (False, True):
+        movies, ratings = parallel_loader.read_datasets_parallel("t.basics", "t.ratings", 2, columnar_store)
+        assert list(movies.values()) == list(expected_movies.values())
+        assert list(ratings.values()) == list(expected_ratings.values())
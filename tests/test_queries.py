@@ -0,0 +1,77 @@
+import itertools
+import pytest
+import indexes
+import movies_and_ratings
+import queries
+
+
+def test_page_limits_and_offsets():
+    assert list(queries.page(range(5))) == [0, 1, 2, 3, 4]
+    assert list(queries.page(range(5), None, 2)) == [2, 3, 4]
+    assert list(queries.page(range(5), 2, 1)) == [1, 2]
+    assert list(queries.page(range(5), 0, 1)) == []
+    assert list(queries.page(range(5), 3, 4)) == [4]
+    assert list(queries.page(range(5), 3, 9)) == []
+    assert list(queries.page(itertools.count(), 3, 2)) == [2, 3, 4]  # the rows after the page are never evaluated
+    assert queries.page_end(None, 7) is None
+    assert queries.page_end(0, 7) == 7
+    assert queries.page_end(3, 2) == 5
+
+
+def comparable(rows) -> list:
+    """rows with every STATS row (year, Aggregate object) replaced by its statistics"""
+    return [(row[0], row[1].movies, row[1].rated, row[1].rating_total, row[1].votes, row[1].runtimes)
+            if isinstance(row, tuple) else row for row in rows]
+
+
+@pytest.fixture
+def datasets(datasets_dir):
+    movies = movies_and_ratings.read_movie_dataset("small.basics")
+    ratings = movies_and_ratings.read_rating_dataset("small.ratings", movies)
+    return movies, ratings, indexes.build_indexes(movies, ratings)
+
+
+def test_pages_are_slices_of_the_full_results(datasets):
+    movies, ratings, movie_indexes = datasets
+    results = [
+        (lambda index, **page: queries.iter_contains("movie", "Big", movies, index, **page), movie_indexes.contains),
+        (lambda index, **page: queries.iter_contains("movie", "Al", movies, index, **page), movie_indexes.contains),
+        (lambda index, **page: queries.iter_year_and_genre("movie", "1995", "Drama", movies, index, **page),
+         movie_indexes.year_and_genre),
+        (lambda index, **page: queries.iter_runtime("movie", "90", "120", movies, index, **page),
+         movie_indexes.runtime),
+        (lambda index, **page: queries.iter_most_votes("movie", "5", movies, ratings, index, **page),
+         movie_indexes.most_votes),
+        (lambda index, **page: queries.iter_top("movie", "2", "1990", "2000", movies, ratings, index, **page),
+         movie_indexes.top),
+        (lambda index, **page: queries.iter_stats("movie", "1990", "2000", "ALL", movies, ratings, index, **page),
+         movie_indexes.stats),
+    ]
+    for results_of, index in results:
+        full = comparable(results_of(None))
+        assert len(full) > 1
+        assert comparable(results_of(index)) == full
+        for limit, offset in itertools.product((None, 0, 1, 2, len(full) + 1), (0, 1, len(full) - 1, len(full) + 3)):
+            expected = full[offset:None if limit is None else offset + limit]
+            assert comparable(results_of(None, limit=limit, offset=offset)) == expected
+            assert comparable(results_of(index, limit=limit, offset=offset)) == expected
+
+
+def test_negative_most_votes_count_keeps_every_movie(datasets):
+    movies, ratings, movie_indexes = datasets
+    every = list(queries.iter_most_votes("movie", str(len(ratings)), movies, ratings))
+    assert len(every) > 3
+    for index in (None, movie_indexes.most_votes):
+        assert list(queries.iter_most_votes("movie", "-1", movies, ratings, index)) == every
+        assert list(queries.iter_most_votes("movie", "-7", movies, ratings, index, limit=2, offset=1)) == every[1:3]
+        assert list(queries.iter_most_votes("movie", "0", movies, ratings, index)) == []
+
+
+def test_negative_top_count_keeps_every_movie_of_every_year(datasets):
+    movies, ratings, movie_indexes = datasets
+    every = list(queries.iter_top("movie", str(len(ratings)), "1990", "2000", movies, ratings))
+    assert len(every) > 3
+    for index in (None, movie_indexes.top):
+        assert list(queries.iter_top("movie", "-1", "1990", "2000", movies, ratings, index)) == every
+        assert list(queries.iter_top("movie", "-3", "1990", "2000", movies, ratings, index, limit=2)) == every[:2]
+        assert list(queries.iter_top("movie", "0", "1990", "2000", movies, ratings, index)) == []
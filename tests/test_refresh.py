@@ -0,0 +1,66 @@
+import pytest
+from conftest import BASICS_ROWS, QUERIES, RATINGS_ROWS, answers, write_small_datasets
+import columnar
+import indexes
+import movies_and_ratings
+import query_processor
+import refresh
+import result_cache
+
+NEW_BASICS_ROWS = [row.replace("Big Night\tBig Night\t0\t1994", "Big Nights Out\tBig Night\t0\t1996")
+                   for row in BASICS_ROWS if not row.startswith("tt0000008")] + \
+                  ["tt0000014\tmovie\tBig Finish\tBig Finish\t0\t1995\t\\N\t100\tDrama\n"]
+NEW_RATINGS_ROWS = [row.replace("tt0000001\t8.1\t1500", "tt0000001\t8.4\t2500")
+                    for row in RATINGS_ROWS if not row.startswith("tt0000008")] + \
+                   ["tt0000013\t6.9\t1300\n", "tt0000014\t7.7\t4000\n"]
+
+
+def load(columnar_store: bool) -> tuple:
+    if columnar_store:
+        movies = columnar.read_columnar_movie_dataset("small.basics")
+        return movies, columnar.read_columnar_rating_dataset("small.ratings", movies)
+    movies = movies_and_ratings.read_movie_dataset("small.basics")
+    return movies, movies_and_ratings.read_rating_dataset("small.ratings", movies)
+
+
+def answer_all(movies, ratings, movie_indexes, cache=None) -> list:
+    return [answers(query_processor.answer_query(query_processor.parse_query(line), movies, ratings, movie_indexes,
+                                                 cache)) for line in QUERIES]
+
+
+@pytest.mark.parametrize("columnar_store", [False, True], ids=["dict", "columnar"])
+@pytest.mark.parametrize("reordered", [False, True], ids=["in_order", "reordered"])
+@pytest.mark.parametrize("cached", [False, True], ids=["no_cache", "cache"])
+def test_refresh_answers_like_a_fresh_load(datasets_dir, monkeypatch, columnar_store, reordered, cached):
+    movies, ratings = load(columnar_store)
+    movie_indexes = indexes.build_indexes(movies, ratings)
+    cache = result_cache.ResultCache(8) if cached else None
+    answer_all(movies, ratings, movie_indexes, cache)  # fills the line cache and the result cache
+
+    basics_rows = NEW_BASICS_ROWS[1:] + NEW_BASICS_ROWS[:1] if reordered else NEW_BASICS_ROWS
+    if not reordered:  # the indexes have to be updated in place
+        monkeypatch.setattr(indexes, "rebuild_indexes", None)
+    write_small_datasets(datasets_dir, basics_rows, NEW_RATINGS_ROWS)
+    changes = refresh.refresh_datasets("small.basics", "small.ratings", movies, ratings, movie_indexes, cache)
+    assert changes.deleted_movies == ["tt0000008"]
+
+    expected_movies, expected_ratings = load(False)
+    assert list(movies.values()) == list(expected_movies.values())
+    assert answer_all(movies, ratings, movie_indexes, cache) == \
+        answer_all(expected_movies, expected_ratings, indexes.Indexes())
+
+
+def test_deleted_contains_positions_are_compacted(datasets_dir):
+    movies = movies_and_ratings.read_movie_dataset("small.basics")
+    index = indexes.build_contains_index(movies)
+    titles = [tconst for tconst, movie in movies.items() if movie.title_type == "movie"]
+
+    old_movies = {titles[0]: movies.pop(titles[0])}  # one deleted movie is only replaced with None
+    indexes.update_contains_index(index, movies, old_movies)
+    assert index["movie"][0].count(None) == 1
+    assert indexes.contains_candidates(index, "movie", "Big") == \
+        indexes.contains_candidates(indexes.build_contains_index(movies), "movie", "Big")
+
+    old_movies = {tconst: movies.pop(tconst) for tconst in titles[1:len(titles) // 2 + 1]}
+    indexes.update_contains_index(index, movies, old_movies)
+    assert index == indexes.build_contains_index(movies)  # compacted once most positions were deleted
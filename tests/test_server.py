@@ -0,0 +1,47 @@
+import os
+import signal
+import socket
+import subprocess
+import sys
+import pytest
+from conftest import SRC
+import query_processor
+
+
+def test_parse_query_rejects_short_queries():
+    assert query_processor.parse_query("CONTAINS movie The Big") == ("CONTAINS", "movie", "The Big")
+    assert query_processor.parse_query("NOPE movie") is None
+    with pytest.raises(ValueError, match="CONTAINS needs 2 values after the query type, got 0"):
+        query_processor.parse_query("CONTAINS")
+    with pytest.raises(ValueError, match="TOP needs 4 values"):
+        query_processor.parse_query("TOP movie 3 1994")
+
+
+def test_bad_query_lines_keep_the_connection(small_datasets, tmp_path):
+    path = str(tmp_path / "server.sock")
+    server = subprocess.Popen([sys.executable, os.path.join(SRC, "movies_main.py"), "small", "--serve", "unix:" + path],
+                              cwd=small_datasets, stdout=subprocess.PIPE, text=True)
+    try:
+        for line in server.stdout:
+            if line.startswith("serving queries"):
+                break
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+            connection.connect(path)
+            connection.sendall(b"CONTAINS\nNOPE movie\n\nTOP movie abc 1994 1995\nLOOKUP tt0000001\n")
+            connection.shutdown(socket.SHUT_WR)
+            answer = b""
+            while True:
+                received = connection.recv(1 << 16)
+                if not received:
+                    break
+                answer += received
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.communicate(timeout=10)
+
+    lines = answer.decode("utf-8").split("\n")
+    assert lines[0] == "error: processing: CONTAINS: ValueError: CONTAINS needs 2 values after the query type, got 0"
+    assert lines[1] == "error: processing: NOPE movie: ValueError: unknown query type NOPE"
+    assert lines[2].startswith("error: processing: TOP movie abc 1994 1995: ValueError: ")
+    assert lines[3] == "processing: LOOKUP tt0000001"
+    assert lines[4].startswith("\tMOVIE: Identifier: tt0000001, Title: The Big Sleep")